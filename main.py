@@ -2,15 +2,36 @@ import os
 import sys
 import logging
 import json
-from typing import Dict, Any, Optional
+import uuid
+import atexit
+import hmac
+from typing import Dict, Any, Optional, TYPE_CHECKING
+import threading
+from collections import deque
+from datetime import datetime
 from threading import Thread
-from flask import Flask, send_from_directory, request, jsonify
-from flask_socketio import SocketIO
+from flask import Flask, Response, request, jsonify
+from flask_socketio import SocketIO, emit, join_room
 
 # Importações do sankhya_op_automation
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'sankhya_automation'))
-from database import OracleDatabase
-from sankhya_api import SankhyaAPI
+from backends import criar_database, criar_api
+from config import APP_CONFIG
+from metricas import renderizar_prometheus
+from conexoes import GerenciadorConexoes
+from rastreamento import rastreador
+from log_assincrono import configurar_logging
+from resiliencia import disjuntor_api
+from planejador import montar_plano, montar_plano_periodo
+from motor import MotorAutomacao, SinkProgresso
+from historico_execucoes import historico_execucoes
+from estaticos import CatalogoEstaticos
+from reconciliacao import reconciliar
+from perfilador import perfilador, snapshots_memoria, MODOS as MODOS_PERFIL
+
+if TYPE_CHECKING:
+    from database import OracleDatabase
+    from sankhya_api import SankhyaAPI
 
 # --- INICIALIZAÇÃO DO FLASK E SOCKET.IO ---
 app = Flask(__name__, static_folder='static')
@@ -18,17 +39,9 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'a-fallback-secret-key')
 # Habilita CORS para permitir conexões de qualquer origem (útil para desenvolvimento)
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        # Garante que o arquivo de log seja escrito em UTF-8
-        logging.FileHandler('unified_app.log', encoding='utf-8'),
-        # Garante que a saída do console também use UTF-8
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configuração de logging: fila assíncrona gravada por uma thread dedicada em
+# arquivo rotativo comprimido (JSON por linha) e no console.
+configurar_logging('unified_app.log', console=True)
 # Força o encoding do stdout para UTF-8 em ambientes como o Windows
 if sys.stdout.encoding != 'utf-8':
     try:
@@ -39,159 +52,209 @@ if sys.stdout.encoding != 'utf-8':
         pass
 logger = logging.getLogger(__name__)
 
-class SankhyaAutomationAPI:
+# Conexões compartilhadas do processo: aquecidas na partida e sondadas periodicamente.
+gerenciador_conexoes = GerenciadorConexoes(criar_database, criar_api)
+
+# Cada mudança de estado do disjuntor da API é enviada ao dashboard.
+disjuntor_api.adicionar_ouvinte(lambda estado: socketio.emit('disjuntor_update', estado))
+
+class SinkSocketIO(SinkProgresso):
+    """
+    Entrega o progresso do motor via WebSocket apenas aos clientes na sala do
+    job e mantém o instantâneo do job (contadores, progresso, controle,
+    telemetria e últimas linhas de log), enviado em uma única mensagem a quem entra na sala.
+    """
+    TIPOS = {'info': 'info', 'sucesso': 'success', 'aviso': 'warning', 'erro': 'error'}
+
     def __init__(self, socketio_instance):
         self.socketio = socketio_instance
-        self.db: Optional[OracleDatabase] = None
-        self.api: Optional[SankhyaAPI] = None
-        self.total_ops_criadas = 0
-        self.total_falhas = 0
-        self.ops_criadas_sucesso = []
-        self.detalhes_falhas = []
+        self.job_id: Optional[str] = None
+        self.em_andamento = False
+        self._linhas_log = deque(maxlen=APP_CONFIG['snapshot_linhas_log'])
+        self._contadores = {'ops_criadas': 0, 'ops_falhas': 0, 'rodada_atual': '-'}
+        self._progresso = {'current': 0, 'total': 0}
+        self._controle: Dict[str, Any] = {}
+        self._telemetria: Dict[str, Any] = {}
+        # Serializa emissões e entradas na sala: quem entra não perde nem repete eventos.
+        self._lock = threading.RLock()
 
-    def _emit_log(self, message, log_type='info'):
-        """Envia uma mensagem de log para o frontend via WebSocket."""
-        self.socketio.emit('log_update', {'message': message, 'type': log_type})
+    def iniciar_job(self, job_id: str):
+        with self._lock:
+            self.job_id = job_id
+            self.em_andamento = True
+            self._linhas_log.clear()
+            self._contadores = {'ops_criadas': 0, 'ops_falhas': 0, 'rodada_atual': '-'}
+            self._progresso = {'current': 0, 'total': 0}
+            self._telemetria = {}
+
+    def emitir(self, evento: str, dados: Dict[str, Any]):
+        with self._lock:
+            if evento == 'controle_update':
+                self._controle = dados
+            elif evento == 'process_finished':
+                self.em_andamento = False
+            self.socketio.emit(evento, dados, to=self.job_id)
+
+    def log_web(self, mensagem, tipo='info'):
+        """Envia uma linha de log (tipos do frontend) e a guarda no instantâneo."""
+        linha = {'message': mensagem, 'type': tipo, 'hora': datetime.now().strftime('%H:%M:%S')}
+        with self._lock:
+            self._linhas_log.append(linha)
+            self.socketio.emit('log_update', linha, to=self.job_id)
         # Também registra no log do servidor
-        if log_type == 'error':
-            logger.error(message)
+        if tipo == 'error':
+            logger.error(mensagem)
         else:
-            logger.info(message)
+            logger.info(mensagem)
+
+    def log(self, mensagem, tipo='info'):
+        self.log_web(mensagem, self.TIPOS.get(tipo, tipo))
+
+    def contadores(self, ops_criadas, falhas, rodada):
+        with self._lock:
+            self._contadores = {'ops_criadas': ops_criadas, 'ops_falhas': falhas, 'rodada_atual': rodada}
+            self.socketio.emit('counters_update', self._contadores, to=self.job_id)
+
+    def progresso(self, processados, total):
+        with self._lock:
+            self._progresso = {'current': processados, 'total': total}
+            self.socketio.emit('progress_bar_update', self._progresso, to=self.job_id)
+
+    def telemetria(self, dados):
+        # Publicada pela thread da telemetria em cadência fixa, não a cada OP.
+        with self._lock:
+            self._telemetria = dados
+            self.socketio.emit('telemetria_update', dados, to=self.job_id)
+
+    def entrar(self, job_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Coloca o cliente atual na sala do job (o atual, se não informado) e
+        retorna o instantâneo a ser enviado a ele.
+        """
+        with self._lock:
+            job_id = job_id or self.job_id
+            if not job_id or job_id != self.job_id:
+                return {'job_id': job_id, 'encontrado': False}
+            join_room(job_id)
+            return {
+                'job_id': job_id,
+                'encontrado': True,
+                'em_andamento': self.em_andamento,
+                'contadores': self._contadores,
+                'progresso': self._progresso,
+                'controle': self._controle,
+                'telemetria': self._telemetria,
+                'disjuntor': disjuntor_api.estado(),
+                'log': list(self._linhas_log),
+            }
 
-    def _emit_counters(self, rodada_atual):
-        """Envia a atualização dos contadores para o frontend."""
-        self.socketio.emit('counters_update', {
-            'ops_criadas': self.total_ops_criadas,
-            'ops_falhas': self.total_falhas,
-            'rodada_atual': rodada_atual
-        })
+
+class SankhyaAutomationAPI:
+    def __init__(self, socketio_instance):
+        self.socketio = socketio_instance
+        self.sink = SinkSocketIO(socketio_instance)
+        self.db: Optional["OracleDatabase"] = None
+        self.api: Optional["SankhyaAPI"] = None
+        # O motor (e seus totais) é reaproveitado entre execuções até o próximo /resetar.
+        self.motor = MotorAutomacao(None, None, self.sink, origem="web")
+        self.motor.controle.adicionar_ouvinte(lambda estado: self.sink.emitir('controle_update', estado))
+
+    def _emit_log(self, message, log_type='info'):
+        """Envia uma mensagem de log para os clientes do job via WebSocket."""
+        self.sink.log_web(message, log_type)
 
     def verificar_conexoes(self) -> Dict[str, Any]:
+        """
+        Retorna o estado em cache das conexões aquecidas na partida, sem novo
+        logon no Oracle nem login/logout na API a cada clique.
+        """
         try:
-            if not self.db: self.db = OracleDatabase()
-            if not self.api: self.api = SankhyaAPI()
-            
-            if not self.db.connect() or not self.db.testar_conexao():
-                return {"sucesso": False, "erro": "Falha na conexão com o banco Oracle"}
-            
-            if not self.api.testar_conexao():
-                self.db.disconnect()
-                return {"sucesso": False, "erro": "Falha na conexão com a API Sankhya"}
-            
-            return {"sucesso": True, "mensagem": "Conexões estabelecidas com sucesso"}
+            gerenciador_conexoes.iniciar()
+            estado = gerenciador_conexoes.estado()
+            if estado["sucesso"]:
+                self.db = gerenciador_conexoes.db
+                self.api = gerenciador_conexoes.api
+            estado["disjuntor"] = disjuntor_api.estado()
+            return estado
         except Exception as e:
-            logger.error(f"Erro ao verificar conexões: {e}", exc_info=True)
+            logger.error("Erro ao verificar conexões: %s", e, exc_info=True)
             return {"sucesso": False, "erro": str(e)}
 
-    def buscar_planejamentos(self, data_planejamento: str, braco: int, rodada_inicial: int, rodada_final: int) -> Dict[str, Any]:
+    def buscar_planejamentos(self, data_planejamento: str, braco: int, rodada_inicial: int, rodada_final: int,
+                             dry_run: bool = False, data_final: Optional[str] = None) -> Dict[str, Any]:
         try:
             if not self.db: return {"sucesso": False, "erro": "Conexão com banco não estabelecida"}
+            if dry_run:
+                return {"sucesso": True, **self.planejar_execucao(data_planejamento, braco, rodada_inicial, rodada_final, data_final)}
+            if data_final:
+                pendentes = self.db.contar_planejamentos_por_data_rodada(data_planejamento, data_final, braco, rodada_inicial, rodada_final)
+                por_data = {data: sum(por_rodada.values()) for data, por_rodada in pendentes.items()}
+                return {"sucesso": True, "total": sum(por_data.values()), "por_data": por_data}
             total = self.db.contar_planejamentos_pendentes(data_planejamento, braco, rodada_inicial, rodada_final)
             return {"sucesso": True, "total": total}
         except Exception as e:
-            logger.error(f"Erro ao buscar planejamentos: {e}", exc_info=True)
+            logger.error("Erro ao buscar planejamentos: %s", e, exc_info=True)
             return {"sucesso": False, "erro": str(e)}
 
-    def executar_automacao_completa(self, data_planejamento: str, braco: int, rodada_inicial: int, rodada_final: int):
+    def planejar_execucao(self, data_planejamento: str, braco: int, rodada_inicial: int, rodada_final: int,
+                          data_final: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Dry-run: monta o plano por rodada (e por data, em um período), o número de
+        chamadas à API e ao banco e o tempo estimado, sem criar nenhuma OP. A
+        estimativa usa a concorrência e a taxa atuais do controle e as vagas do
+        pool de sessões.
+        """
+        limites = dict(concorrencia=self.motor.controle.concorrencia,
+                       capacidade_sessoes=getattr(self.api, 'capacidade', None),
+                       ops_por_minuto=self.motor.controle.ops_por_minuto)
+        if data_final:
+            pendentes = self.db.contar_planejamentos_por_data_rodada(data_planejamento, data_final, braco, rodada_inicial, rodada_final)
+            plano = montar_plano_periodo(pendentes, rodada_inicial, rodada_final, **limites)
+        else:
+            pendentes = self.db.contar_planejamentos_por_rodada(data_planejamento, braco, rodada_inicial, rodada_final)
+            plano = montar_plano(pendentes, rodada_inicial, rodada_final, **limites)
+        plano["total"] = plano["total_registros"]
+        return plano
+
+    def executar_automacao_completa(self, data_planejamento: str, braco: int, rodada_inicial: int, rodada_final: int,
+                                    job_id: Optional[str] = None, data_final: Optional[str] = None):
         """
         Executa o processo completo, do início ao fim, emitindo eventos WebSocket.
         Este método é projetado para rodar em uma thread de background.
+        Cada execução é um trace (job_id) com spans por rodada e por planejamento.
+        Com `data_final`, processa o período inteiro (data_planejamento a data_final)
+        em uma única consulta e na mesma sessão, com o resumo por data.
         """
         global processo_em_andamento
+        job_id = job_id or uuid.uuid4().hex
+        data_final = data_final or data_planejamento
+        rastreador.iniciar_job(job_id)
         try:
-            # --- CORREÇÃO 1: Calcular o total de registros, não de rodadas ---
-            total_registros_a_processar = self.db.contar_planejamentos_pendentes(data_planejamento, braco, rodada_inicial, rodada_final)
-            registros_processados = 0
-            self._emit_log(f"Total de {total_registros_a_processar} planejamentos a serem processados.", 'info')
-            
-            # Inicializa a barra de progresso no frontend
-            self.socketio.emit('progress_bar_update', {'current': 0, 'total': total_registros_a_processar})
-
-            for rodada in range(rodada_inicial, rodada_final + 1):
-                self._emit_log(f"--- Iniciando processamento da Rodada: {rodada} ---", 'info')
-                self._emit_counters(rodada)
-                
-                if not self.api.autenticar():
-                    self._emit_log(f"Falha ao autenticar para a Rodada {rodada}. Abortando.", 'error')
-                    break
-
-                registros = self.db.buscar_planejamentos(data_planejamento, braco, rodada, rodada)
-                if not registros:
-                    self._emit_log(f"Nenhum planejamento pendente para a Rodada {rodada}.", 'warning')
-                    continue
-
-                idiprocs_desta_rodada = []
-                nuplans_desta_rodada = []
-
-                for reg_idx, registro in enumerate(registros, 1):
-                    self._emit_log(f"  [{reg_idx}/{len(registros)}-{rodada}] Processando NUPLAN: {registro['NUPLAN']}...", 'info')
-                    try:
-                        dados_produto_api = {"CODPRODPA": registro['CODPROD'], "IDPROC": 51, "CODPLP": 1, "TAMLOTE": registro['QTDPLAN']}
-                        sucesso, idiproc, mensagem = self.api.criar_ordem_producao(dados_produto_api)
-
-                        if sucesso and idiproc:
-                            if self.db.atualizar_idiproc(registro['NUPLAN'], idiproc):
-                                self._emit_log(f"    ✅ OP {idiproc} criada para NUPLAN {registro['NUPLAN']}.", 'success')
-                                self.total_ops_criadas += 1
-                                self.ops_criadas_sucesso.append({"nuplan": registro['NUPLAN'], "idiproc": idiproc})
-                                idiprocs_desta_rodada.append(idiproc)
-                                nuplans_desta_rodada.append(registro['NUPLAN'])
-                            else:
-                                self.total_falhas += 1
-                                erro_msg = f"OP {idiproc} criada, mas FALHA ao atualizar banco."
-                                self._emit_log(f"    ❌ {erro_msg}", 'error')
-                                self.detalhes_falhas.append({"nuplan": registro['NUPLAN'], "erro": erro_msg})
-                        else:
-                            self.total_falhas += 1
-                            erro_msg = f"Erro ao criar OP: {mensagem}"
-                            self._emit_log(f"    ❌ {erro_msg}", 'error')
-                            self.detalhes_falhas.append({"nuplan": registro['NUPLAN'], "erro": erro_msg})
-                        
-                        self._emit_counters(rodada)
-                    except Exception as e:
-                        self.total_falhas += 1
-                        erro_msg = f"Erro inesperado no NUPLAN {registro['NUPLAN']}: {e}"
-                        self._emit_log(f"    ❌ {erro_msg}", 'error')
-                        self.detalhes_falhas.append({"nuplan": registro['NUPLAN'], "erro": erro_msg})
-                    finally:
-                        # --- CORREÇÃO 2: Atualizar a barra a cada registro processado ---
-                        registros_processados += 1
-                        self.socketio.emit('progress_bar_update', {'current': registros_processados, 'total': total_registros_a_processar})
-                
-                if idiprocs_desta_rodada:
-                    nro_lote = self.db.gerar_lote_para_ops(idiprocs_desta_rodada, braco)
-                    if nro_lote:
-                        self._emit_log(f"Lote {nro_lote} gerado para a Rodada {rodada}.", 'success')
-                        if self.db.atualizar_lote_em_ad_plan(nro_lote, nuplans_desta_rodada):
-                            self._emit_log(f"AD_PLAN atualizada com o lote {nro_lote}.", 'success')
-                        else:
-                            self._emit_log(f"FALHA ao atualizar AD_PLAN com o lote.", 'error')
-                    else:
-                        self._emit_log(f"FALHA ao gerar lote para a Rodada {rodada}.", 'error')
-                
-                # --- CORREÇÃO 3: Remover a atualização antiga e incorreta ---
-                # self.socketio.emit('progress_bar_update', {'current': i + 1, 'total': total_rodadas})
-
+            self.motor.db, self.motor.api = self.db, self.api
+            with gerenciador_conexoes.em_uso():
+                self.motor.executar_periodo(data_planejamento, data_final, braco, rodada_inicial, rodada_final,
+                                            trace_id=job_id)
         except Exception as e:
             self._emit_log(f"Erro crítico durante a automação: {e}", 'error')
             logger.error("Erro crítico na thread de automação", exc_info=True)
         finally:
             self.finalizar_conexoes()
             self._emit_log("🎉 Automação concluída!", 'success')
-            self.socketio.emit('process_finished', {})
+            self.sink.emitir('process_finished', {'job_id': job_id})
             processo_em_andamento = False
             logger.info("Flag 'processo_em_andamento' redefinida para False.")
 
     def finalizar_conexoes(self):
+        # As conexões são compartilhadas e permanecem aquecidas entre execuções;
+        # o logout e o fechamento do pool acontecem no encerramento do processo.
         try:
-            if self.api: self.api.logout()
-            if self.db and self.db.connection: self.db.disconnect()
+            if self.db and self.db.connection:
+                self.db.connection.rollback()
         except Exception as e:
-            logger.error(f"Erro ao finalizar conexões: {e}")
+            logger.error("Erro ao finalizar conexões: %s", e)
 
     def obter_resumo(self):
-        return {"total_ops_criadas": self.total_ops_criadas, "total_falhas": self.total_falhas,
-                "ops_criadas_sucesso": self.ops_criadas_sucesso, "detalhes_falhas": self.detalhes_falhas}
+        return self.motor.obter_resumo()
 
 # --- GERENCIAMENTO DE ESTADO E ROTAS DA API ---
 sankhya_automation: Optional[SankhyaAutomationAPI] = None
@@ -211,9 +274,22 @@ def verificar_conexoes():
 
 @app.route('/api/sankhya/buscar_planejamentos', methods=['POST'])
 def buscar_planejamentos():
+    # As contagens (e o dry-run) usam a conexão das execuções, que não é thread-safe:
+    # recusadas durante uma automação, e nenhuma automação começa enquanto rodam.
+    global processo_em_andamento
     if not sankhya_automation: return jsonify({"sucesso": False, "erro": "Estado não inicializado."})
+    if processo_em_andamento:
+        return jsonify({"sucesso": False, "erro": "Um processo já está em andamento."}), 409
     data = request.json
-    return jsonify(sankhya_automation.buscar_planejamentos(data['data_planejamento'], data['braco'], data['rodada_inicial'], data['rodada_final']))
+    processo_em_andamento = True
+    try:
+        with gerenciador_conexoes.em_uso():
+            resultado = sankhya_automation.buscar_planejamentos(
+                data['data_planejamento'], data['braco'], data['rodada_inicial'], data['rodada_final'],
+                bool(data.get('dry_run', False)), data.get('data_final') or None)
+    finally:
+        processo_em_andamento = False
+    return jsonify(resultado)
 
 @app.route('/api/sankhya/iniciar_automacao_stream', methods=['POST'])
 def iniciar_automacao_stream():
@@ -224,30 +300,216 @@ def iniciar_automacao_stream():
         return jsonify({"sucesso": False, "erro": "Estado não inicializado."}), 500
 
     data = request.json
+    if data.get('data_final') and data['data_final'] < data['data_planejamento']:
+        return jsonify({"sucesso": False, "mensagem": "A data final deve ser maior ou igual à data inicial."}), 400
     processo_em_andamento = True
+    job_id = uuid.uuid4().hex
+    # Os eventos do job vão para a sala job_id; o cliente entra nela com 'entrar_job'.
+    sankhya_automation.sink.iniciar_job(job_id)
     
-    thread = Thread(target=sankhya_automation.executar_automacao_completa, args=(
-        data['data_planejamento'], data['braco'], data['rodada_inicial'], data['rodada_final']
+    # O nome identifica a thread para o perfilador (PERFILADOR_THREADS).
+    thread = Thread(name="automacao", target=sankhya_automation.executar_automacao_completa, args=(
+        data['data_planejamento'], data['braco'], data['rodada_inicial'], data['rodada_final'], job_id,
+        data.get('data_final') or None
     ))
     thread.daemon = True
     thread.start()
     
-    return jsonify({"sucesso": True, "mensagem": "Processo de automação iniciado em segundo plano."}), 202
+    return jsonify({"sucesso": True, "mensagem": "Processo de automação iniciado em segundo plano.", "job_id": job_id}), 202
+
+@socketio.on('entrar_job')
+def entrar_job(dados=None):
+    # Entra na sala do job (o atual, se não informado) e recebe o instantâneo em uma única mensagem
+    if not sankhya_automation:
+        emit('snapshot', {'job_id': None, 'encontrado': False})
+        return
+    emit('snapshot', sankhya_automation.sink.entrar((dados or {}).get('job_id')))
+
+@app.route('/api/sankhya/controle', methods=['GET'])
+def obter_controle():
+    if not sankhya_automation: return jsonify({"sucesso": False, "erro": "Estado não inicializado."})
+    return jsonify({"sucesso": True, "em_andamento": processo_em_andamento, **sankhya_automation.motor.controle.estado()})
+
+@app.route('/api/sankhya/controle/<acao>', methods=['POST'])
+def controlar_execucao(acao):
+    # Pausa, retomada e cancelamento valem na fronteira entre registros;
+    # "ajustar" altera a concorrência e a taxa de OPs por minuto da execução em andamento.
+    if not sankhya_automation or not processo_em_andamento:
+        return jsonify({"sucesso": False, "erro": "Nenhum processo em andamento."}), 409
+    controle = sankhya_automation.motor.controle
+    if acao == 'ajustar':
+        data = request.json or {}
+        try:
+            controle.ajustar(data.get('concorrencia'), data.get('ops_por_minuto'))
+        except (TypeError, ValueError) as e:
+            return jsonify({"sucesso": False, "erro": str(e)}), 400
+    elif acao in ('pausar', 'retomar', 'cancelar'):
+        getattr(controle, acao)()
+    else:
+        return jsonify({"sucesso": False, "erro": f"Ação desconhecida: {acao}"}), 404
+    logger.info("Controle da execução: %s (%s).", acao, controle.estado())
+    return jsonify({"sucesso": True, **controle.estado()})
 
 @app.route('/api/sankhya/resumo', methods=['GET'])
 def obter_resumo():
     if not sankhya_automation: return jsonify({"sucesso": False, "erro": "Estado não inicializado."})
     return jsonify(sankhya_automation.obter_resumo())
 
-# Rotas para servir o frontend
+@app.route('/api/sankhya/historico', methods=['GET'])
+def obter_historico():
+    # Execuções mais recentes gravadas no histórico persistente
+    limite = min(max(request.args.get('limite', 20, type=int), 1), 500)
+    return jsonify({"sucesso": True, "execucoes": historico_execucoes.listar(limite)})
+
+@app.route('/api/sankhya/historico/tendencias', methods=['GET'])
+def obter_tendencias():
+    # Vazão, falhas e latência média por etapa, agregadas por dia
+    dias = min(max(request.args.get('dias', 30, type=int), 1), 365)
+    return jsonify({"sucesso": True, **historico_execucoes.tendencias(dias)})
+
+@app.route('/api/sankhya/timeline', defaults={'job_id': None}, methods=['GET'])
+@app.route('/api/sankhya/timeline/<job_id>', methods=['GET'])
+def obter_timeline(job_id):
+    # Spans do job (ou do último job) para a linha do tempo estilo Gantt
+    job_id = job_id or rastreador.ultimo_job()
+    spans = rastreador.spans_do_job(job_id) if job_id else None
+    if spans is None:
+        return jsonify({"sucesso": False, "erro": "Job não encontrado."}), 404
+    return jsonify({"sucesso": True, "job_id": job_id, "spans": spans})
+
+@app.route('/api/sankhya/disjuntor', methods=['GET'])
+def obter_disjuntor():
+    # Estado atual do disjuntor da API Sankhya
+    return jsonify(disjuntor_api.estado())
+
+@app.route('/api/sankhya/sessoes', methods=['GET'])
+def obter_sessoes():
+    # Ocupação e contadores de cada sessão do pool da API Sankhya
+    api = gerenciador_conexoes.api
+    if api is None:
+        return jsonify({"sucesso": False, "erro": "Conexão com a API não estabelecida."}), 409
+    if hasattr(api, 'sessoes'):
+        return jsonify({"sucesso": True, **api.estado()})
+    return jsonify({"sucesso": True, "capacidade": 1, "sessoes": [
+        {"nome": api.nome, "limite": 1, "em_uso": None, "token_valido": api.token_valido()}]})
+
+@app.route('/api/sankhya/reconciliacao', methods=['GET', 'POST'])
+def reconciliar_ad_plan():
+    # Divergências entre AD_PLAN e TPRIPROC de uma data e braço; GET apenas relata,
+    # POST corrige as reparáveis com comandos em massa (sem chamar a API Sankhya).
+    # Os pares heurísticos de OPs órfãs só são gravados com "vincular_orfas": true.
+    global processo_em_andamento
+    dados = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+    data_planejamento = dados.get('data_planejamento')
+    try:
+        braco = int(dados.get('braco'))
+    except (TypeError, ValueError):
+        braco = None
+    if not data_planejamento or braco is None:
+        return jsonify({"sucesso": False, "erro": "Informe 'data_planejamento' (YYYY-MM-DD) e 'braco'."}), 400
+    if processo_em_andamento:
+        return jsonify({"sucesso": False, "erro": "Um processo já está em andamento."}), 409
+    db = gerenciador_conexoes.db
+    if db is None or not db.connection:
+        return jsonify({"sucesso": False, "erro": "Conexão com o banco não estabelecida."}), 409
+    # A conexão é a mesma das execuções: nenhuma automação começa durante a reconciliação.
+    processo_em_andamento = True
+    try:
+        with gerenciador_conexoes.em_uso():
+            relatorio = reconciliar(db, data_planejamento, braco, corrigir=request.method == 'POST',
+                                    vincular_orfas=dados.get('vincular_orfas') is True)
+    finally:
+        processo_em_andamento = False
+    return jsonify(relatorio), 200 if relatorio["sucesso"] else 500
+
+# --- PERFILAMENTO SOB DEMANDA (ADMIN) ---
+def _negar_admin():
+    # Sem PERFILADOR_TOKEN as rotas não existem; com ele, exigem o cabeçalho X-Admin-Token.
+    token = APP_CONFIG['perfilador_token']
+    if not token:
+        return jsonify({"sucesso": False, "erro": "Não encontrado."}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        return jsonify({"sucesso": False, "erro": "Token de administração inválido."}), 401
+    return None
+
+def _texto_colapsado(conteudo: str):
+    # Formato colapsado: flamegraph.pl, speedscope ou inferno geram o flamegraph.
+    return Response(conteudo, mimetype='text/plain; charset=utf-8')
+
+@app.route('/api/admin/perfil/iniciar', methods=['POST'])
+def iniciar_perfil():
+    negado = _negar_admin()
+    if negado: return negado
+    dados = request.get_json(silent=True) or {}
+    try:
+        intervalo_ms = float(dados['intervalo_ms']) if dados.get('intervalo_ms') else None
+        duracao_maxima = float(dados['duracao_maxima_s']) if dados.get('duracao_maxima_s') else None
+    except (TypeError, ValueError):
+        return jsonify({"sucesso": False, "erro": "'intervalo_ms' e 'duracao_maxima_s' devem ser números."}), 400
+    threads = dados.get('threads')
+    if threads is not None and not (isinstance(threads, list) and all(isinstance(t, str) and t for t in threads)):
+        return jsonify({"sucesso": False, "erro": "'threads' deve ser uma lista de prefixos de nome de thread."}), 400
+    if not perfilador.iniciar(intervalo_ms, duracao_maxima, threads):
+        return jsonify({"sucesso": False, "erro": "O perfilador já está ativo."}), 409
+    return jsonify({"sucesso": True, **perfilador.estado()})
+
+@app.route('/api/admin/perfil/parar', methods=['POST'])
+def parar_perfil():
+    negado = _negar_admin()
+    if negado: return negado
+    if not perfilador.parar():
+        return jsonify({"sucesso": False, "erro": "O perfilador não está ativo."}), 409
+    return jsonify({"sucesso": True, **perfilador.estado()})
+
+@app.route('/api/admin/perfil', methods=['GET'])
+def obter_perfil():
+    # formato=json (padrão): estado e funções mais amostradas; formato=colapsado: pilhas
+    # para flamegraph, com modo=todos|cpu|espera
+    negado = _negar_admin()
+    if negado: return negado
+    if request.args.get('formato') == 'colapsado':
+        modo = request.args.get('modo', 'todos')
+        if modo not in MODOS_PERFIL:
+            return jsonify({"sucesso": False, "erro": f"'modo' deve ser um de {', '.join(MODOS_PERFIL)}."}), 400
+        return _texto_colapsado(perfilador.colapsado(modo))
+    return jsonify({"sucesso": True, **perfilador.estado(request.args.get('top', 20, type=int))})
+
+@app.route('/api/admin/perfil/memoria', methods=['GET', 'POST', 'DELETE'])
+def perfil_memoria():
+    # POST: liga o tracemalloc ou tira um snapshot (comparado ao anterior); GET: pilhas de
+    # alocação do último snapshot no formato colapsado; DELETE: desliga o tracemalloc
+    negado = _negar_admin()
+    if negado: return negado
+    if request.method == 'POST':
+        return jsonify({"sucesso": True, **snapshots_memoria.capturar(request.args.get('top', 20, type=int))})
+    if request.method == 'DELETE':
+        if not snapshots_memoria.parar():
+            return jsonify({"sucesso": False, "erro": "O tracemalloc não está ativo."}), 409
+        return jsonify({"sucesso": True})
+    conteudo = snapshots_memoria.colapsado()
+    if conteudo is None:
+        return jsonify({"sucesso": False, "erro": "Nenhum snapshot de memória; use POST."}), 404
+    return _texto_colapsado(conteudo)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Exposição no formato texto do Prometheus (latências e erros por serviço/comando)
+    return Response(renderizar_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# Rotas para servir o frontend: catálogo montado uma vez na partida, com nomes
+# com hash (cache imutável), ETag/304 e variantes brotli/gzip.
+catalogo_estaticos = CatalogoEstaticos(app.static_folder)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    else:
-        return send_from_directory(app.static_folder, 'index.html')
+    status, corpo, cabecalhos, mimetype = catalogo_estaticos.responder(
+        path or 'index.html', request.headers.get('Accept-Encoding', ''), request.headers.get('If-None-Match', ''))
+    return Response(corpo, status=status, headers=cabecalhos, mimetype=mimetype)
 
 if __name__ == '__main__':
+    # Aquece o pool do banco e o token da API em segundo plano
+    gerenciador_conexoes.iniciar()
+    atexit.register(gerenciador_conexoes.encerrar)
     # Usa socketio.run() para iniciar o servidor
     socketio.run(app, host='0.0.0.0', port=5001, debug=False, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+Seleção preguiçosa das implementações de banco e API (reais ou mocks).
+SQLAlchemy, oracledb e requests só são importados quando a primeira
+instância é criada, e não na importação dos pontos de entrada.
+"""
+
+import threading
+
+from config import APP_CONFIG, credenciais_sankhya
+
+
+def criar_database():
+    """Cria a instância de OracleDatabase (real ou mock, conforme USAR_MOCK)."""
+    if APP_CONFIG['usar_mock']:
+        from database_mock import OracleDatabase
+    else:
+        from database import OracleDatabase
+    return OracleDatabase()
+
+
+def criar_api():
+    """
+    Cria a instância de SankhyaAPI (real ou mock, conforme USAR_MOCK; a real
+    sempre que uma gravação é reproduzida em SANKHYA_REPRODUZIR). Com mais de
+    um conjunto de credenciais (SANKHYA_CREDENCIAIS), retorna um PoolSessoes
+    com uma SankhyaAPI por conjunto.
+    """
+    if APP_CONFIG['usar_mock'] and not APP_CONFIG['sankhya_reproduzir']:
+        from sankhya_api_mock import SankhyaAPI
+    else:
+        from sankhya_api import SankhyaAPI
+    credenciais = credenciais_sankhya()
+    if len(credenciais) == 1:
+        return SankhyaAPI(credenciais[0])
+    from pool_sessoes import PoolSessoes
+    return PoolSessoes(SankhyaAPI, credenciais)
+
+
+def _importar_backends():
+    if APP_CONFIG['usar_mock']:
+        import database_mock, sankhya_api_mock  # noqa: F401
+    else:
+        import database  # noqa: F401
+    if not APP_CONFIG['usar_mock'] or APP_CONFIG['sankhya_reproduzir']:
+        import sankhya_api  # noqa: F401
+
+
+def preimportar_backends() -> threading.Thread:
+    """
+    Importa os backends em uma thread daemon, para que o custo de importação
+    se sobreponha a outra espera (ex.: o usuário digitando os parâmetros).
+    """
+    thread = threading.Thread(target=_importar_backends, name="preimportacao-backends", daemon=True)
+    thread.start()
+    return thread
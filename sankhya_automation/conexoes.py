@@ -0,0 +1,151 @@
+"""
+Módulo de gerenciamento das conexões compartilhadas do processo.
+Aquece o pool do banco Oracle e obtém o bearerToken da API Sankhya em
+segundo plano na partida, mantém uma sonda de saúde periódica e serve o
+estado em cache para a verificação de conexões da interface.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import APP_CONFIG
+from metricas import AQUECIMENTO_DURACAO, CONEXAO_OK
+
+logger = logging.getLogger(__name__)
+
+
+class GerenciadorConexoes:
+    """
+    Mantém uma instância de OracleDatabase e de SankhyaAPI aquecidas e
+    compartilhadas entre as execuções do processo.
+    """
+
+    def __init__(self, fabrica_db, fabrica_api):
+        self._fabrica_db = fabrica_db
+        self._fabrica_api = fabrica_api
+        self.db = None
+        self.api = None
+        self._estado: Dict[str, Any] = {"sucesso": False, "erro": "Aquecimento das conexões em andamento."}
+        self._pronto = threading.Event()
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._em_uso = False
+        self._thread: Optional[threading.Thread] = None
+        self._reaquecimento: Optional[threading.Thread] = None
+        self._lock_reaquecimento = threading.Lock()
+
+    def iniciar(self):
+        """
+        Dispara o aquecimento e a sonda periódica em uma thread daemon.
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._executar, name="aquecimento-conexoes", daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        inicio = time.perf_counter()
+        self._aquecer()
+        AQUECIMENTO_DURACAO.definir(time.perf_counter() - inicio)
+        logger.info("Aquecimento das conexões concluído em %.2fs (sucesso=%s).",
+                    time.perf_counter() - inicio, self._estado["sucesso"])
+        self._pronto.set()
+        while not self._parar.wait(APP_CONFIG['intervalo_sonda']):
+            self._sondar()
+
+    def _aquecer(self):
+        with self._lock:
+            try:
+                if self.db is None:
+                    self.db = self._fabrica_db()
+                if self.api is None:
+                    self.api = self._fabrica_api()
+                if not self.db.connection and not self.db.connect():
+                    self._atualizar_estado(False, "Falha na conexão com o banco Oracle", db_ok=False)
+                    return
+                if not self.db.sondar():
+                    self._atualizar_estado(False, "Falha na conexão com o banco Oracle", db_ok=False)
+                    return
+                if not self.api.token_valido() and not self.api.autenticar():
+                    self._atualizar_estado(False, "Falha na conexão com a API Sankhya", db_ok=True, api_ok=False)
+                    return
+                self._atualizar_estado(True, None, db_ok=True, api_ok=True)
+            except Exception as e:
+                logger.error("Erro ao aquecer conexões: %s", e, exc_info=True)
+                self._atualizar_estado(False, str(e))
+
+    def _sondar(self):
+        """
+        Sonda barata: SELECT 1 em uma conexão separada do pool e renovação do
+        token apenas quando expirado e sem execução em andamento.
+        """
+        if self.db is None or self.db.connection is None:
+            self._aquecer()
+            return
+        db_ok = self.db.sondar()
+        api_ok = True
+        if not self._em_uso and not self.api.token_valido():
+            with self._lock:
+                api_ok = self.api.autenticar()
+        erro = None if db_ok and api_ok else ("Falha na conexão com o banco Oracle" if not db_ok
+                                               else "Falha na conexão com a API Sankhya")
+        self._atualizar_estado(db_ok and api_ok, erro, db_ok=db_ok, api_ok=api_ok)
+
+    def _atualizar_estado(self, sucesso: bool, erro: Optional[str], db_ok: Optional[bool] = None,
+                          api_ok: Optional[bool] = None):
+        estado: Dict[str, Any] = {"sucesso": sucesso, "verificado_em": datetime.now().isoformat(timespec="seconds")}
+        if sucesso:
+            estado["mensagem"] = "Conexões estabelecidas com sucesso"
+        else:
+            estado["erro"] = erro
+        self._estado = estado
+        if db_ok is not None:
+            CONEXAO_OK.definir(1 if db_ok else 0, "oracle")
+        if api_ok is not None:
+            CONEXAO_OK.definir(1 if api_ok else 0, "sankhya_api")
+
+    def estado(self, timeout: float = 30.0) -> Dict[str, Any]:
+        """
+        Retorna o estado em cache das conexões, aguardando o aquecimento inicial
+        por até `timeout` segundos. Se o último resultado foi falha, dispara um
+        novo aquecimento em segundo plano e retorna a falha em cache.
+        """
+        self._pronto.wait(timeout)
+        if self._pronto.is_set() and not self._estado["sucesso"] and not self._em_uso:
+            self._reaquecer()
+        return dict(self._estado)
+
+    def _reaquecer(self):
+        """
+        Dispara um único aquecimento em segundo plano; chamadas concorrentes
+        enquanto ele roda não abrem outro.
+        """
+        with self._lock_reaquecimento:
+            if self._reaquecimento is not None and self._reaquecimento.is_alive():
+                return
+            self._reaquecimento = threading.Thread(target=self._aquecer, name="reaquecimento-conexoes", daemon=True)
+            self._reaquecimento.start()
+
+    @contextmanager
+    def em_uso(self):
+        """
+        Marca as conexões como em uso por uma execução; a sonda não renova o
+        token nem reconecta enquanto isso.
+        """
+        self._em_uso = True
+        try:
+            yield
+        finally:
+            self._em_uso = False
+
+    def encerrar(self):
+        self._parar.set()
+        try:
+            if self.api: self.api.logout()
+            if self.db and self.db.connection: self.db.disconnect()
+        except Exception as e:
+            logger.error("Erro ao encerrar conexões: %s", e)
@@ -3,6 +3,7 @@ Arquivo de configuração para a aplicação de automação de Ordens de Produç
 Este arquivo contém as configurações de conexão com o banco Oracle e API Sankhya.
 """
 
+import json
 import os
 from dotenv import load_dotenv
 
@@ -18,8 +19,9 @@ ORACLE_CONFIG = {
     'password': os.getenv('ORACLE_PASSWORD')
 }
 
-# String de conexão Oracle
-ORACLE_DATABASE_URI = f"oracle+oracledb://{ORACLE_CONFIG['username']}:{ORACLE_CONFIG['password']}@{ORACLE_CONFIG['host']}:{ORACLE_CONFIG['port']}/{ORACLE_CONFIG['service_name']}"
+# String de conexão Oracle (montada apenas quando a conexão é aberta)
+def oracle_database_uri() -> str:
+    return f"oracle+oracledb://{ORACLE_CONFIG['username']}:{ORACLE_CONFIG['password']}@{ORACLE_CONFIG['host']}:{ORACLE_CONFIG['port']}/{ORACLE_CONFIG['service_name']}"
 
 # Configurações da API Sankhya
 SANKHYA_CONFIG = {
@@ -33,9 +35,109 @@ SANKHYA_CONFIG = {
     'mge_session': os.getenv('SANKHYA_MGE_SESSION')
 }
 
+# Campos de cada conjunto de credenciais do pool de sessões da API
+CAMPOS_CREDENCIAL = ('app_key', 'client_token', 'username', 'password', 'mge_session')
+
+def credenciais_sankhya() -> list:
+    """
+    Conjuntos de credenciais do pool de sessões da API Sankhya.
+    SANKHYA_CREDENCIAIS é uma lista JSON de objetos com os campos de
+    CAMPOS_CREDENCIAL, 'nome' e 'max_concorrentes'; campos ausentes herdam de
+    SANKHYA_CONFIG. Sem a variável, há um único conjunto (o do SANKHYA_CONFIG).
+    """
+    padrao_concorrentes = int(os.getenv('SANKHYA_SESSAO_MAX_CONCORRENTES', '1'))
+    configuradas = json.loads(os.getenv('SANKHYA_CREDENCIAIS') or '[]') or [{}]
+    credenciais = []
+    for indice, configurada in enumerate(configuradas, 1):
+        credencial = {campo: configurada.get(campo) or SANKHYA_CONFIG[campo] for campo in CAMPOS_CREDENCIAL}
+        credencial['nome'] = configurada.get('nome') or configurada.get('username') or f"sessao{indice}"
+        credencial['max_concorrentes'] = max(1, int(configurada.get('max_concorrentes', padrao_concorrentes)))
+        credenciais.append(credencial)
+    return credenciais
+
 # Configurações da aplicação
 APP_CONFIG = {
     'debug': os.getenv('DEBUG', 'False').lower() == 'true',
     'log_level': os.getenv('LOG_LEVEL', 'INFO'),
-    'timeout': int(os.getenv('REQUEST_TIMEOUT', '60'))
+    'timeout': int(os.getenv('REQUEST_TIMEOUT', '60')),
+    # Timeouts (segundos) de conexão e de leitura das chamadas à API Sankhya
+    'connect_timeout': float(os.getenv('API_CONNECT_TIMEOUT', '5')),
+    'read_timeout': float(os.getenv('API_READ_TIMEOUT', os.getenv('REQUEST_TIMEOUT', '60'))),
+    # Prazo total (segundos) da criação de uma OP, somando todas as etapas
+    'prazo_op': float(os.getenv('PRAZO_OP', '180')),
+    # Disjuntor da API: falhas consecutivas para abrir e espera até a sonda (dobra a cada sonda falha)
+    'disjuntor_falhas': int(os.getenv('DISJUNTOR_FALHAS', '5')),
+    'disjuntor_espera': float(os.getenv('DISJUNTOR_ESPERA', '30')),
+    'disjuntor_espera_maxima': float(os.getenv('DISJUNTOR_ESPERA_MAXIMA', '300')),
+    # Usa os mocks de banco e API (testes sem Oracle/Sankhya)
+    'usar_mock': os.getenv('USAR_MOCK', 'False').lower() == 'true',
+    # Gravação do tráfego real da API Sankhya e reprodução de uma gravação (velocidade 0 = sem espera).
+    # Na reprodução, o cliente real é usado mesmo com USAR_MOCK (apenas o banco fica simulado).
+    'sankhya_gravar': os.getenv('SANKHYA_GRAVAR'),
+    'sankhya_reproduzir': os.getenv('SANKHYA_REPRODUZIR'),
+    'sankhya_reproduzir_velocidade': float(os.getenv('SANKHYA_REPRODUZIR_VELOCIDADE', '1')),
+    # Planejamentos processados em paralelo em cada rodada
+    'max_workers': int(os.getenv('MAX_WORKERS', '1')),
+    # Limite da concorrência ajustável durante a execução e taxa máxima de OPs por minuto (0 = sem limite)
+    'max_workers_limite': int(os.getenv('MAX_WORKERS_LIMITE', '16')),
+    'ops_por_minuto': float(os.getenv('OPS_POR_MINUTO', '0')),
+    # Tamanho máximo da lista de IDIPROCs (separados por vírgula) enviada à procedure de lote
+    'stp_max_caracteres': int(os.getenv('STP_MAX_CARACTERES', '32767')),
+    # Registros lidos por lote do cursor de planejamentos pendentes
+    'fetch_batch_size': int(os.getenv('FETCH_BATCH_SIZE', '200')),
+    # Modo vigia: microlote por sondagem, intervalo entre sondagens (dobra a cada sondagem
+    # vazia até o máximo), silêncio que fecha uma rodada, varredura completa e ociosidade máxima (0 = sem limite)
+    'vigia_microlote': int(os.getenv('VIGIA_MICROLOTE', '50')),
+    'vigia_intervalo': float(os.getenv('VIGIA_INTERVALO', '5')),
+    'vigia_intervalo_maximo': float(os.getenv('VIGIA_INTERVALO_MAXIMO', '60')),
+    'vigia_fechamento_rodada': float(os.getenv('VIGIA_FECHAMENTO_RODADA', '120')),
+    'vigia_varredura': float(os.getenv('VIGIA_VARREDURA', '600')),
+    'vigia_ocioso_maximo': float(os.getenv('VIGIA_OCIOSO_MAXIMO', '0')),
+    # Telemetria ao vivo: cadência de publicação, constante de tempo da média móvel
+    # exponencial de OPs/min, janela do p95 por etapa e pontos do gráfico (segundos/pontos)
+    'telemetria_cadencia': float(os.getenv('TELEMETRIA_CADENCIA', '2')),
+    'telemetria_ewma': float(os.getenv('TELEMETRIA_EWMA', '30')),
+    'telemetria_janela': float(os.getenv('TELEMETRIA_JANELA', '60')),
+    'telemetria_pontos': int(os.getenv('TELEMETRIA_PONTOS', '60')),
+    # Retentativas na mesma execução das falhas transitórias da API: tentativas extras por
+    # planejamento (0 = desligado) e backoff exponencial com jitter (segundos)
+    'retentativas_maximas': int(os.getenv('RETENTATIVAS_MAXIMAS', '3')),
+    'retentativa_espera_base': float(os.getenv('RETENTATIVA_ESPERA_BASE', '2')),
+    'retentativa_espera_maxima': float(os.getenv('RETENTATIVA_ESPERA_MAXIMA', '30')),
+    # Painel da CLI: bloco de status redesenhado no lugar (atualizações por segundo) em um
+    # terminal; fora dele, um resumo a cada intervalo (segundos). Desligado, uma linha por etapa
+    'painel_terminal': os.getenv('PAINEL_TERMINAL', 'True').lower() == 'true',
+    'painel_atualizacoes_por_segundo': float(os.getenv('PAINEL_ATUALIZACOES_POR_SEGUNDO', '4')),
+    'painel_intervalo_resumo': float(os.getenv('PAINEL_INTERVALO_RESUMO', '10')),
+    # Perfilamento sob demanda na aplicação web (/api/admin/perfil): desligado sem token;
+    # intervalo de amostragem, duração máxima (segundos), prefixos das threads amostradas
+    # e frames guardados por alocação no tracemalloc
+    'perfilador_token': os.getenv('PERFILADOR_TOKEN', ''),
+    'perfilador_intervalo_ms': float(os.getenv('PERFILADOR_INTERVALO_MS', '10')),
+    'perfilador_duracao_maxima': float(os.getenv('PERFILADOR_DURACAO_MAXIMA', '300')),
+    'perfilador_threads': [p.strip() for p in os.getenv('PERFILADOR_THREADS', 'automacao,op,retentativa').split(',') if p.strip()],
+    'perfilador_frames_memoria': int(os.getenv('PERFILADOR_FRAMES_MEMORIA', '25')),
+    # Reconciliação AD_PLAN x TPRIPROC: dias, a partir da data do planejamento, em que
+    # uma OP sem IDIPROC gravado pode ter sido instanciada
+    'reconciliacao_janela_dias': int(os.getenv('RECONCILIACAO_JANELA_DIAS', '2')),
+    # Validade (segundos) do cache de contagem de pendentes por (data, braço)
+    'cache_pendentes_ttl': float(os.getenv('CACHE_PENDENTES_TTL', '30')),
+    # Validade assumida do bearerToken e intervalo da sonda de saúde (segundos)
+    'token_ttl': int(os.getenv('SANKHYA_TOKEN_TTL', '1500')),
+    'intervalo_sonda': int(os.getenv('INTERVALO_SONDA', '60')),
+    # Histórico de latências por etapa usado na estimativa do dry-run
+    'historico_latencias_file': os.getenv('HISTORICO_LATENCIAS_FILE', 'historico_latencias.json'),
+    # Banco SQLite com o histórico de execuções (vazão, latências e falhas por categoria)
+    'historico_execucoes_db': os.getenv('HISTORICO_EXECUCOES_DB', 'historico_execucoes.db'),
+    # Logs: arquivo rotativo comprimido e limite de dumps de diagnóstico
+    'log_max_bytes': int(os.getenv('LOG_MAX_BYTES', str(20 * 1024 * 1024))),
+    'log_backups': int(os.getenv('LOG_BACKUPS', '10')),
+    'log_diagnostico_por_minuto': int(os.getenv('LOG_DIAGNOSTICO_POR_MINUTO', '10')),
+    'log_diagnostico_max_caracteres': int(os.getenv('LOG_DIAGNOSTICO_MAX_CARACTERES', '4000')),
+    # Linhas de log guardadas no instantâneo enviado a quem entra na sala de um job
+    'snapshot_linhas_log': int(os.getenv('SNAPSHOT_LINHAS_LOG', '200')),
+    # Arquivo rotativo de traces (um span JSON por linha)
+    'trace_file': os.getenv('TRACE_FILE', 'traces.jsonl'),
+    'trace_max_bytes': int(os.getenv('TRACE_MAX_BYTES', str(20 * 1024 * 1024))),
+    'trace_backups': int(os.getenv('TRACE_BACKUPS', '5'))
 }
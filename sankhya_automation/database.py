@@ -4,14 +4,62 @@ Implementa as operações de consulta e atualização na tabela AD_PLAN.
 """
 
 import logging
-from typing import List, Dict, Any, Optional
-from sqlalchemy import create_engine, text, bindparam
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
-from config import ORACLE_DATABASE_URI
+from config import oracle_database_uri, APP_CONFIG
+from metricas import medir_sql
+from modelos import Planejamento, datas_do_periodo
 
 # Configuração do logger
 logger = logging.getLogger(__name__)
 
+# Tipo de coleção nativo do Oracle usado para enviar listas de números como bind.
+TIPO_LISTA_NUMERICA = "SYS.ODCINUMBERLIST"
+# Capacidade do tipo: SYS.ODCINUMBERLIST é um VARRAY(32767) OF NUMBER.
+MAXIMO_LISTA_NUMERICA = 32767
+
+class CachePendentes:
+    """
+    Cache com TTL do agregado de planejamentos pendentes por (data, braço).
+    É compartilhado por todas as instâncias do processo e invalidado sempre
+    que este processo grava um IDIPROC.
+    """
+
+    def __init__(self, ttl_segundos: float):
+        self.ttl_segundos = ttl_segundos
+        self._entradas: Dict[Tuple[str, int], Tuple[float, Dict[int, int]]] = {}
+        self._datas: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def obter(self, data_planejamento: str, braco: int) -> Optional[Dict[int, int]]:
+        with self._lock:
+            armazenado_em = self._datas.get(data_planejamento)
+            if armazenado_em is None or time.monotonic() - armazenado_em > self.ttl_segundos:
+                return None
+            # A data foi agregada por completo: braço ausente significa sem pendências.
+            return self._entradas.get((data_planejamento, int(braco)), {})
+
+    def armazenar(self, data_planejamento: str, agregado: Dict[int, Dict[int, int]]):
+        with self._lock:
+            for chave in [k for k in self._entradas if k[0] == data_planejamento]:
+                del self._entradas[chave]
+            for braco, por_rodada in agregado.items():
+                self._entradas[(data_planejamento, braco)] = por_rodada
+            self._datas[data_planejamento] = time.monotonic()
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._datas.clear()
+
+
+cache_pendentes = CachePendentes(APP_CONFIG['cache_pendentes_ttl'])
+
+
 class OracleDatabase:
     """
     Classe para gerenciar conexões e operações com o banco de dados Oracle.
@@ -23,6 +71,7 @@ class OracleDatabase:
         """
         self.engine = None
         self.connection = None
+        self._tipo_lista_numerica = None
         
     def connect(self) -> bool:
         """
@@ -35,20 +84,21 @@ class OracleDatabase:
             # --- MELHORIA ADICIONADA AQUI ---
             # pool_pre_ping=True instrui o SQLAlchemy a verificar a conexão
             # antes de cada operação, evitando erros de timeout.
-            self.engine = create_engine(
-                ORACLE_DATABASE_URI, 
-                echo=False,
-                pool_pre_ping=True
-            )
-            
-            self.connection = self.engine.connect()
+            with medir_sql("connect"):
+                self.engine = create_engine(
+                    oracle_database_uri(), 
+                    echo=False,
+                    pool_pre_ping=True
+                )
+                
+                self.connection = self.engine.connect()
             logger.info("Conexão com o banco de dados estabelecida com sucesso.")
             return True
         except SQLAlchemyError as e:
-            logger.error(f"Erro ao conectar com o banco de dados: {e}")
+            logger.error("Erro ao conectar com o banco de dados: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Erro inesperado ao conectar com o banco: {e}")
+            logger.error("Erro inesperado ao conectar com o banco: %s", e)
             return False
     
     def disconnect(self):
@@ -62,8 +112,27 @@ class OracleDatabase:
             if self.engine:
                 self.engine.dispose()
         except Exception as e:
-            logger.error(f"Erro ao fechar conexão com o banco: {e}")
+            logger.error("Erro ao fechar conexão com o banco: %s", e)
     
+    def _encerrar_leitura(self):
+        """
+        Encerra a transação implícita aberta pelas consultas. No SQLAlchemy 2.x
+        qualquer execute() inicia uma transação (autobegin) que só termina com
+        commit()/rollback(); aberta, ela faz o próximo connection.begin() falhar.
+        """
+        if self.connection.in_transaction():
+            self.connection.commit()
+
+    @contextmanager
+    def _transacao(self):
+        """
+        Transação explícita de escrita (commit ao sair, rollback em exceção),
+        aberta depois de encerrar a leitura anterior na mesma conexão.
+        """
+        self._encerrar_leitura()
+        with self.connection.begin() as transacao:
+            yield transacao
+
     def buscar_planejamentos(self, data_planejamento: str, braco: int, 
                            rodada_inicial: int, rodada_final: int) -> List[Dict[str, Any]]:
         """
@@ -96,32 +165,165 @@ class OracleDatabase:
             """)
             
             # Executa a consulta com os parâmetros
-            result = self.connection.execute(query, {
-                'data_planejamento': data_planejamento,
-                'braco': braco,
-                'rodada_inicial': rodada_inicial,
-                'rodada_final': rodada_final
-            })
-            
-            # Converte o resultado em lista de dicionários
-            registros = []
-            for row in result:
-                registros.append({
-                    'NUPLAN': row[0],
-                    'CODPROD': row[1],
-                    'QTDPLAN': row[2]
+            with medir_sql("buscar_planejamentos"):
+                result = self.connection.execute(query, {
+                    'data_planejamento': data_planejamento,
+                    'braco': braco,
+                    'rodada_inicial': rodada_inicial,
+                    'rodada_final': rodada_final
                 })
+                
+                # Converte o resultado em lista de dicionários
+                registros = []
+                for row in result:
+                    registros.append({
+                        'NUPLAN': row[0],
+                        'CODPROD': row[1],
+                        'QTDPLAN': row[2]
+                    })
             
-            logger.info(f"Encontrados {len(registros)} planejamentos pendentes.")
+            logger.info("Encontrados %s planejamentos pendentes.", len(registros))
             return registros
             
         except SQLAlchemyError as e:
-            logger.error(f"Erro ao executar consulta SQL: {e}")
+            logger.error("Erro ao executar consulta SQL: %s", e)
             return []
         except Exception as e:
-            logger.error(f"Erro inesperado ao buscar planejamentos: {e}")
+            logger.error("Erro inesperado ao buscar planejamentos: %s", e)
             return []
     
+    def iterar_planejamentos(self, data_planejamento: str, braco: int,
+                             rodada_inicial: int, rodada_final: int,
+                             tamanho_lote: Optional[int] = None,
+                             data_final: Optional[str] = None) -> Iterator[List[Planejamento]]:
+        """
+        Variante em streaming de buscar_planejamentos: lê os registros de um cursor
+        no servidor e os entrega em lotes de `tamanho_lote`, sem materializar o
+        resultado inteiro. O primeiro lote fica disponível assim que é buscado.
+
+        O cursor usa uma conexão própria do pool, e não `self.connection`: as
+        gravações dos workers fazem commit nesta última durante a leitura, e um
+        fetch através de commits na mesma sessão arrisca ORA-01555 em execuções
+        longas. Uma falha no meio da leitura é propagada, para que uma leitura
+        parcial não pareça uma execução completa.
+
+        Args:
+            data_planejamento (str): Data do planejamento (inicial) no formato YYYY-MM-DD
+            braco (int): Número do braço de produção
+            rodada_inicial (int): Rodada inicial do range
+            rodada_final (int): Rodada final do range
+            tamanho_lote (Optional[int]): Registros por lote; padrão APP_CONFIG['fetch_batch_size']
+            data_final (Optional[str]): Data final (YYYY-MM-DD) para buscar um período
+                inteiro em uma única consulta; por padrão, apenas `data_planejamento`
+
+        Yields:
+            List[Planejamento]: Lotes de registros pendentes, ordenados por data, RODADA e NUPLAN
+
+        Raises:
+            SQLAlchemyError: Se a consulta ou a busca de um lote falhar.
+        """
+        if not self.engine:
+            logger.error("Conexão com o banco não estabelecida.")
+            return
+        
+        tamanho_lote = tamanho_lote or APP_CONFIG['fetch_batch_size']
+        # Filtro por intervalo em DTINC (em vez de TRUNC) para permitir o uso de índice.
+        query = text("""
+            SELECT NUPLAN, CODPROD, QTDPLAN, RODADA, TO_CHAR(DTINC, 'YYYY-MM-DD') AS DATA
+            FROM AD_PLAN
+            WHERE
+                DTINC >= TO_DATE(:data_inicial, 'YYYY-MM-DD')
+                AND DTINC < TO_DATE(:data_final, 'YYYY-MM-DD') + 1
+                AND BRACO = :braco
+                AND RODADA BETWEEN :rodada_inicial AND :rodada_final
+                AND IDIPROC IS NULL
+            ORDER BY TRUNC(DTINC), RODADA, NUPLAN
+        """)
+        
+        total = 0
+        try:
+            with self.engine.connect() as conexao:
+                with medir_sql("buscar_planejamentos"):
+                    result = conexao.execution_options(stream_results=True, yield_per=tamanho_lote).execute(query, {
+                        'data_inicial': data_planejamento,
+                        'data_final': data_final or data_planejamento,
+                        'braco': braco,
+                        'rodada_inicial': rodada_inicial,
+                        'rodada_final': rodada_final
+                    })
+                try:
+                    for particao in result.partitions(tamanho_lote):
+                        lote = [Planejamento(*row) for row in particao]
+                        total += len(lote)
+                        yield lote
+                finally:
+                    result.close()
+            logger.info("Lidos %s planejamentos pendentes em streaming.", total)
+
+        except SQLAlchemyError as e:
+            logger.error("Leitura em streaming interrompida após %s planejamentos: %s", total, e)
+            raise
+
+    def buscar_planejamentos_novos(self, nuplan_apos: int, data_inicial: str, rodada_inicial: int,
+                                   rodada_final: int, bracos: Optional[List[int]] = None,
+                                   limite: Optional[int] = None) -> Optional[List[Planejamento]]:
+        """
+        Busca os planejamentos pendentes com NUPLAN acima da marca d'água informada
+        (modo vigia). A consulta percorre o índice da chave primária a partir da
+        marca, então o custo de uma sondagem sem novidades é praticamente nulo.
+
+        Args:
+            nuplan_apos (int): Maior NUPLAN já visto (0 para todos os pendentes)
+            data_inicial (str): Considera apenas planejamentos a partir desta data (YYYY-MM-DD)
+            rodada_inicial (int): Rodada inicial do range
+            rodada_final (int): Rodada final do range
+            bracos (Optional[List[int]]): Braços a considerar; por padrão, todos
+            limite (Optional[int]): Máximo de registros (microlote); padrão APP_CONFIG['vigia_microlote']
+
+        Returns:
+            Optional[List[Planejamento]]: Registros ordenados por NUPLAN (com DATA e BRACO), ou None em caso de erro
+        """
+        if not self.connection:
+            logger.error("Conexão com o banco não estabelecida.")
+            return None
+
+        filtro_bracos = "AND BRACO IN (SELECT COLUMN_VALUE FROM TABLE(:bracos))" if bracos else ""
+        query = text(f"""
+            SELECT NUPLAN, CODPROD, QTDPLAN, RODADA, TO_CHAR(DTINC, 'YYYY-MM-DD') AS DATA, BRACO
+            FROM AD_PLAN
+            WHERE
+                NUPLAN > :nuplan_apos
+                AND DTINC >= TO_DATE(:data_inicial, 'YYYY-MM-DD')
+                AND RODADA BETWEEN :rodada_inicial AND :rodada_final
+                AND IDIPROC IS NULL
+                {filtro_bracos}
+            ORDER BY NUPLAN
+            FETCH FIRST :limite ROWS ONLY
+        """)
+        parametros = {
+            'nuplan_apos': nuplan_apos,
+            'data_inicial': data_inicial,
+            'rodada_inicial': rodada_inicial,
+            'rodada_final': rodada_final,
+            'limite': limite or APP_CONFIG['vigia_microlote'],
+        }
+        try:
+            if bracos:
+                parametros['bracos'] = self._lista_numerica(bracos)
+            with medir_sql("buscar_planejamentos_novos"):
+                result = self.connection.execute(query, parametros)
+                registros = [Planejamento(*row) for row in result]
+            # A conexão fica ociosa entre as sondagens; não deixa a transação da leitura aberta.
+            self._encerrar_leitura()
+            return registros
+
+        except SQLAlchemyError as e:
+            logger.error("Erro ao buscar planejamentos novos: %s", e)
+            return None
+        except Exception as e:
+            logger.error("Erro inesperado ao buscar planejamentos novos: %s", e)
+            return None
+
     def atualizar_idiproc(self, nuplan: int, idiproc: int) -> bool:
         """
         Atualiza o campo IDIPROC na tabela AD_PLAN para um NUPLAN específico.
@@ -145,24 +347,24 @@ class OracleDatabase:
                 WHERE NUPLAN = :nuplan_atual
             """)
             
-            # Executa a atualização
-            result = self.connection.execute(update_query, {
-                'idiproc_recebido_api': idiproc,
-                'nuplan_atual': nuplan
-            })
-            
-            # Confirma a transação
-            self.connection.commit()
+            # Executa a atualização e confirma a transação
+            with medir_sql("atualizar_idiproc"):
+                result = self.connection.execute(update_query, {
+                    'idiproc_recebido_api': idiproc,
+                    'nuplan_atual': nuplan
+                })
+                self.connection.commit()
             
             if result.rowcount > 0:
-                logger.info(f"IDIPROC {idiproc} atualizado com sucesso para NUPLAN {nuplan}.")
+                cache_pendentes.invalidar()
+                logger.info("IDIPROC %s atualizado com sucesso para NUPLAN %s.", idiproc, nuplan)
                 return True
             else:
-                logger.warning(f"Nenhum registro foi atualizado para NUPLAN {nuplan}.")
+                logger.warning("Nenhum registro foi atualizado para NUPLAN %s.", nuplan)
                 return False
                 
         except SQLAlchemyError as e:
-            logger.error(f"Erro ao atualizar IDIPROC: {e}")
+            logger.error("Erro ao atualizar IDIPROC: %s", e)
             # Rollback em caso de erro
             try:
                 self.connection.rollback()
@@ -170,131 +372,452 @@ class OracleDatabase:
                 pass
             return False
         except Exception as e:
-            logger.error(f"Erro inesperado ao atualizar IDIPROC: {e}")
+            logger.error("Erro inesperado ao atualizar IDIPROC: %s", e)
             return False
         
-    def gerar_lote_para_ops(self, idiproc_list: List[int], braco: int) -> Optional[int]:
+    def _lista_numerica(self, valores: List[int]):
+        """
+        Converte uma lista de inteiros em uma coleção Oracle (SYS.ODCINUMBERLIST)
+        para ser usada como `TABLE(:lista)`. O texto do SQL não depende do tamanho
+        da lista e o cursor é compartilhado, mas a coleção aceita no máximo
+        MAXIMO_LISTA_NUMERICA elementos: listas maiores devem ser divididas
+        com _blocos_lista_numerica.
+        """
+        if len(valores) > MAXIMO_LISTA_NUMERICA:
+            raise ValueError(f"{TIPO_LISTA_NUMERICA} aceita até {MAXIMO_LISTA_NUMERICA} elementos; recebeu {len(valores)}.")
+        driver_connection = self.connection.connection.driver_connection
+        if self._tipo_lista_numerica is None or self._tipo_lista_numerica[0] is not driver_connection:
+            self._tipo_lista_numerica = (driver_connection, driver_connection.gettype(TIPO_LISTA_NUMERICA))
+        colecao = self._tipo_lista_numerica[1].newobject()
+        colecao.extend([int(v) for v in valores])
+        return colecao
+
+    @staticmethod
+    def _blocos_lista_numerica(valores: List[int]) -> List[List[int]]:
+        """
+        Divide a lista em blocos que cabem em uma coleção SYS.ODCINUMBERLIST.
+        """
+        return [valores[i:i + MAXIMO_LISTA_NUMERICA] for i in range(0, len(valores), MAXIMO_LISTA_NUMERICA)]
+
+    @staticmethod
+    def _dividir_argumento_procedure(idiproc_list: List[int], max_caracteres: int) -> List[List[int]]:
+        """
+        Divide a lista de IDIPROCs em blocos cuja representação separada por
+        vírgulas cabe no argumento VARCHAR2 da procedure.
+        """
+        blocos: List[List[int]] = [[]]
+        tamanho = 0
+        for idiproc in idiproc_list:
+            tamanho_item = len(str(idiproc)) + (1 if blocos[-1] else 0)
+            if blocos[-1] and tamanho + tamanho_item > max_caracteres:
+                blocos.append([])
+                tamanho_item = len(str(idiproc))
+                tamanho = 0
+            blocos[-1].append(idiproc)
+            tamanho += tamanho_item
+        return blocos
+
+    def gerar_lotes_para_ops(self, idiproc_list: List[int], braco: int) -> Dict[int, List[int]]:
         """
-        Chama a procedure STP_GERAR_RODADA_VASAP_EXT para criar um lote unificado,
-        e em seguida busca e retorna o NROLOTE gerado.
+        Chama a procedure STP_GERAR_RODADA_VASAP_EXT para criar os lotes das OPs
+        e busca o NROLOTE gerado para cada uma.
+
+        A procedure recebe os IDIPROCs como uma única string separada por vírgulas;
+        quando a string excede APP_CONFIG['stp_max_caracteres'], a lista é dividida
+        em blocos e a procedure é chamada uma vez por bloco (um lote por bloco).
 
         Args:
             idiproc_list (List[int]): Lista com os números das OPs (IDIPROC) criadas.
             braco (int): O número do braço de produção que foi programado.
 
         Returns:
-            Optional[int]: O número do lote (NROLOTE) gerado, ou None em caso de falha.
+            Dict[int, List[int]]: IDIPROCs de cada NROLOTE gerado; vazio em caso de falha.
         """
         if not self.connection:
             logger.error("Conexão com o banco não estabelecida para gerar lote.")
-            return None
+            return {}
         
         if not idiproc_list:
             logger.warning("Nenhuma OP criada, a geração de lote não será executada.")
-            return None
+            return {}
 
+        blocos = self._dividir_argumento_procedure(idiproc_list, APP_CONFIG['stp_max_caracteres'])
+        if len(blocos) > 1:
+            logger.info("Lista de %s OPs dividida em %s blocos para a procedure de lote.", len(idiproc_list), len(blocos))
+
+        proc_call = text("BEGIN STP_GERAR_RODADA_VASAP_EXT(:idiprocs, :braco, :mensagem); END;")
+        query_lote = text("""
+            SELECT IDIPROC, NROLOTE FROM TPRIPROC
+            WHERE IDIPROC IN (SELECT COLUMN_VALUE FROM TABLE(:idiproc_list)) AND NROLOTE IS NOT NULL
+        """)
+
+        lotes: Dict[int, List[int]] = {}
         # CORREÇÃO: Envolve toda a lógica em um único bloco de transação.
         # O 'with' garante que a transação será commitada em caso de sucesso
         # ou sofrerá rollback em caso de erro, deixando a conexão limpa.
         try:
-            with self.connection.begin() as trans:
-                idiprocs_str = ','.join(map(str, idiproc_list))
-                
-                logger.info(f"Chamando procedure STP_GERAR_RODADA_VASAP_EXT para as OPs: {idiprocs_str} e Braço: {braco}")
+            with self._transacao():
+                for bloco in blocos:
+                    idiprocs_str = ','.join(map(str, bloco))
+                    
+                    logger.info("Chamando procedure STP_GERAR_RODADA_VASAP_EXT para %s OPs e Braço: %s", len(bloco), braco)
+                    logger.debug("OPs enviadas à procedure: %s", idiprocs_str)
+                    
+                    with medir_sql("stp_gerar_rodada_vasap_ext"):
+                        self.connection.execute(
+                            proc_call, 
+                            {"idiprocs": idiprocs_str, "braco": braco, "mensagem": ""}
+                        )
+                    
+                    logger.info("Procedure de geração de lote executada com sucesso.")
 
-                proc_call = text("BEGIN STP_GERAR_RODADA_VASAP_EXT(:idiprocs, :braco, :mensagem); END;")
-                
-                self.connection.execute(
-                    proc_call, 
-                    {"idiprocs": idiprocs_str, "braco": braco, "mensagem": ""}
-                )
-                
-                logger.info("Procedure de geração de lote executada com sucesso.")
-
-                # Após a procedure, busca o NROLOTE gerado DENTRO da mesma transação
-                logger.info(f"Buscando o NROLOTE gerado para os IDIPROCs...")
-                
-                query_lote = text("""
-                    SELECT DISTINCT NROLOTE FROM TPRIPROC WHERE IDIPROC IN :idiproc_list AND NROLOTE IS NOT NULL
-                """)
-                
-                result = self.connection.execute(
-                    query_lote.bindparams(bindparam('idiproc_list', expanding=True)),
-                    {"idiproc_list": idiproc_list}
-                )
-                nrolote = result.scalar_one_or_none()
+                    # Após a procedure, busca o NROLOTE gerado DENTRO da mesma transação
+                    with medir_sql("buscar_nrolote"):
+                        for parte in self._blocos_lista_numerica(bloco):
+                            result = self.connection.execute(query_lote, {"idiproc_list": self._lista_numerica(parte)})
+                            for idiproc, nrolote in result:
+                                lotes.setdefault(int(nrolote), []).append(int(idiproc))
 
-                if nrolote:
-                    logger.info(f"NROLOTE {nrolote} encontrado com sucesso.")
-                    return nrolote
-                else:
-                    logger.error(f"Não foi possível encontrar o NROLOTE para os IDIPROCs: {idiproc_list}.")
+                if not lotes:
+                    logger.error("Não foi possível encontrar o NROLOTE para %s IDIPROCs.", len(idiproc_list))
                     # Força o rollback da transação ao levantar uma exceção
                     raise RuntimeError("NROLOTE não encontrado após execução da procedure.")
 
+            logger.info("NROLOTE(s) %s encontrado(s) com sucesso.", sorted(lotes))
+            return lotes
+
         except (SQLAlchemyError, RuntimeError) as e:
-            logger.error(f"Erro na transação de geração de lote ou busca de NROLOTE: {e}")
-            return None
+            logger.error("Erro na transação de geração de lote ou busca de NROLOTE: %s", e)
+            return {}
         except Exception as e:
-            logger.error(f"Erro inesperado ao gerar lote: {e}")
-            return None
-        
+            logger.error("Erro inesperado ao gerar lote: %s", e)
+            return {}
+
     def atualizar_lote_em_ad_plan(self, nrolote: int, nuplan_list: List[int]) -> bool:
         """
-        Atualiza o campo NROLOTE para uma lista de NUPLANs de uma só vez.
+        Atualiza o campo NROLOTE para uma lista de NUPLANs em uma única transação.
+        A lista é enviada como coleção Oracle, um UPDATE a cada
+        MAXIMO_LISTA_NUMERICA NUPLANs.
         """
         if not self.connection or not nuplan_list: return False
         try:
-            logger.info(f"Atualizando NROLOTE={nrolote} para {len(nuplan_list)} registros em AD_PLAN.")
-            query = text("UPDATE AD_PLAN SET NROLOTE = :nrolote WHERE NUPLAN IN :nuplan_list")
+            logger.info("Atualizando NROLOTE=%s para %s registros em AD_PLAN.", nrolote, len(nuplan_list))
+            query = text("UPDATE AD_PLAN SET NROLOTE = :nrolote WHERE NUPLAN IN (SELECT COLUMN_VALUE FROM TABLE(:nuplan_list))")
             
-            # Esta função já usa seu próprio bloco de transação, o que é correto.
-            # Agora não haverá conflito pois a função anterior limpou a conexão.
-            with self.connection.begin() as trans:
-                result = self.connection.execute(
-                    query.bindparams(bindparam('nuplan_list', expanding=True)),
-                    {"nrolote": nrolote, "nuplan_list": nuplan_list}
-                )
+            atualizados = 0
+            with medir_sql("atualizar_lote_em_ad_plan"), self._transacao():
+                for parte in self._blocos_lista_numerica(nuplan_list):
+                    result = self.connection.execute(
+                        query,
+                        {"nrolote": nrolote, "nuplan_list": self._lista_numerica(parte)}
+                    )
+                    atualizados += result.rowcount
             
-            logger.info(f"{result.rowcount} registros em AD_PLAN atualizados com o novo lote.")
-            return result.rowcount > 0
+            logger.info("%s registros em AD_PLAN atualizados com o novo lote.", atualizados)
+            return atualizados > 0
         except SQLAlchemyError as e:
-            logger.error(f"Erro ao atualizar NROLOTE em AD_PLAN: {e}")
+            logger.error("Erro ao atualizar NROLOTE em AD_PLAN: %s", e)
             return False  
+        except Exception as e:
+            logger.error("Erro inesperado ao atualizar NROLOTE em AD_PLAN: %s", e)
+            return False
     
-    def contar_planejamentos_pendentes(self, data_planejamento: str, braco: int, 
-                                      rodada_inicial: int, rodada_final: int) -> int:
+    def contar_pendentes_por_braco_rodada(self, data_planejamento: str) -> Optional[Dict[int, Dict[int, int]]]:
         """
-        Conta o número total de planejamentos pendentes em um range de rodadas.
+        Agrega, em uma única consulta, os planejamentos pendentes da data por BRACO e RODADA.
+
+        Returns:
+            Optional[Dict[int, Dict[int, int]]]: {braço: {rodada: quantidade}}, ou None em caso de erro
         """
         if not self.connection:
             logger.error("Conexão com o banco não estabelecida para contagem.")
-            return 0
+            return None
         
         try:
+            # Filtro por intervalo em DTINC (em vez de TRUNC) para permitir o uso de índice.
             query = text("""
-                SELECT COUNT(*)
+                SELECT BRACO, RODADA, COUNT(*)
                 FROM AD_PLAN
                 WHERE
-                    TRUNC(DTINC) = TO_DATE(:data_planejamento, 'YYYY-MM-DD')
-                    AND BRACO = :braco
-                    AND RODADA BETWEEN :rodada_inicial AND :rodada_final
+                    DTINC >= TO_DATE(:data_planejamento, 'YYYY-MM-DD')
+                    AND DTINC < TO_DATE(:data_planejamento, 'YYYY-MM-DD') + 1
                     AND IDIPROC IS NULL
+                GROUP BY BRACO, RODADA
             """)
             
-            result = self.connection.execute(query, {
-                'data_planejamento': data_planejamento,
-                'braco': braco,
-                'rodada_inicial': rodada_inicial,
-                'rodada_final': rodada_final
-            })
+            with medir_sql("contar_pendentes_por_braco_rodada"):
+                result = self.connection.execute(query, {'data_planejamento': data_planejamento})
+                agregado: Dict[int, Dict[int, int]] = {}
+                for braco, rodada, quantidade in result:
+                    agregado.setdefault(int(braco), {})[int(rodada)] = int(quantidade)
+            return agregado
             
-            total = result.scalar_one()
-            return total
+        except SQLAlchemyError as e:
+            logger.error("Erro ao executar contagem SQL agregada: %s", e)
+            return None
+
+    def contar_pendentes_por_data_braco_rodada(self, data_inicial: str,
+                                               data_final: str) -> Optional[Dict[str, Dict[int, Dict[int, int]]]]:
+        """
+        Agrega, em uma única consulta, os planejamentos pendentes de um período
+        por data, BRACO e RODADA.
+
+        Returns:
+            Optional[Dict[str, Dict[int, Dict[int, int]]]]: {data: {braço: {rodada: quantidade}}},
+            com todas as datas do período (vazias se não houver pendências), ou None em caso de erro
+        """
+        if not self.connection:
+            logger.error("Conexão com o banco não estabelecida para contagem.")
+            return None
+        
+        try:
+            query = text("""
+                SELECT TO_CHAR(TRUNC(DTINC), 'YYYY-MM-DD'), BRACO, RODADA, COUNT(*)
+                FROM AD_PLAN
+                WHERE
+                    DTINC >= TO_DATE(:data_inicial, 'YYYY-MM-DD')
+                    AND DTINC < TO_DATE(:data_final, 'YYYY-MM-DD') + 1
+                    AND IDIPROC IS NULL
+                GROUP BY TRUNC(DTINC), BRACO, RODADA
+            """)
+            
+            with medir_sql("contar_pendentes_por_data_braco_rodada"):
+                result = self.connection.execute(query, {'data_inicial': data_inicial, 'data_final': data_final})
+                agregado: Dict[str, Dict[int, Dict[int, int]]] = {data: {} for data in datas_do_periodo(data_inicial, data_final)}
+                for data, braco, rodada, quantidade in result:
+                    agregado.setdefault(data, {}).setdefault(int(braco), {})[int(rodada)] = int(quantidade)
+            return agregado
             
         except SQLAlchemyError as e:
-            logger.error(f"Erro ao executar contagem SQL: {e}")
-            return 0
+            logger.error("Erro ao executar contagem SQL agregada por período: %s", e)
+            return None
+
+    def contar_planejamentos_por_data_rodada(self, data_inicial: str, data_final: str, braco: int,
+                                             rodada_inicial: int, rodada_final: int) -> Dict[str, Dict[int, int]]:
+        """
+        Conta os planejamentos pendentes de cada data e rodada do período.
+        Usa o agregado em cache quando todas as datas estão nele; caso contrário,
+        agrega o período inteiro em uma única consulta e alimenta o cache.
+
+        Returns:
+            Dict[str, Dict[int, int]]: {data: {rodada: quantidade}} para cada data do período
+        """
+        datas = datas_do_periodo(data_inicial, data_final)
+        em_cache = {data: cache_pendentes.obter(data, braco) for data in datas}
+        if any(por_rodada is None for por_rodada in em_cache.values()):
+            agregado = self.contar_pendentes_por_data_braco_rodada(data_inicial, data_final)
+            if agregado is None:
+                return {}
+            for data, por_braco in agregado.items():
+                cache_pendentes.armazenar(data, por_braco)
+            em_cache = {data: agregado.get(data, {}).get(int(braco), {}) for data in datas}
+        return {data: {r: q for r, q in por_rodada.items() if rodada_inicial <= r <= rodada_final}
+                for data, por_rodada in em_cache.items()}
+
+    def contar_planejamentos_por_rodada(self, data_planejamento: str, braco: int,
+                                        rodada_inicial: int, rodada_final: int) -> Dict[int, int]:
+        """
+        Conta os planejamentos pendentes de cada rodada do range.
+        Qualquer sub-range é respondido a partir do agregado em cache da (data, braço).
+
+        Returns:
+            Dict[int, int]: Quantidade de planejamentos pendentes por rodada
+        """
+        por_rodada = cache_pendentes.obter(data_planejamento, braco)
+        if por_rodada is None:
+            agregado = self.contar_pendentes_por_braco_rodada(data_planejamento)
+            if agregado is None:
+                return {}
+            cache_pendentes.armazenar(data_planejamento, agregado)
+            por_rodada = agregado.get(int(braco), {})
+        return {r: q for r, q in por_rodada.items() if rodada_inicial <= r <= rodada_final}
+
+    def contar_planejamentos_pendentes(self, data_planejamento: str, braco: int, 
+                                      rodada_inicial: int, rodada_final: int) -> int:
+        """
+        Conta o número total de planejamentos pendentes em um range de rodadas.
+        """
+        return sum(self.contar_planejamentos_por_rodada(data_planejamento, braco, rodada_inicial, rodada_final).values())
+
+    def buscar_ops_sem_planejamento(self, data_planejamento: str, braco: int, idproc: int,
+                                    janela_dias: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Busca, em uma única consulta, as OPs do processo `idproc` instanciadas a
+        partir da data que nenhum planejamento de AD_PLAN referencia (OP criada,
+        mas IDIPROC não gravado). Cada OP é pareada a um planejamento pendente da
+        data com o mesmo produto e quantidade, na ordem de IDIPROC e NUPLAN, apenas
+        quando há tantas OPs quanto pendentes para o par (produto, quantidade).
+        O pareamento é heurístico (nada liga a OP ao NUPLAN) e serve para relatar;
+        gravá-lo é uma decisão explícita do chamador.
+
+        Args:
+            data_planejamento (str): Data do planejamento no formato YYYY-MM-DD
+            braco (int): Braço de produção dos planejamentos pareados
+            idproc (int): Processo produtivo usado na criação das OPs
+            janela_dias (int): Dias, a partir da data, em que a OP pode ter sido instanciada
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: OPs órfãs com o NUPLAN e a RODADA do par
+            (None quando não há par único), ou None em caso de erro
+        """
+        if not self.connection:
+            logger.error("Conexão com o banco não estabelecida para reconciliação.")
+            return None
+
+        # Os pendentes são numerados em todos os braços da data: uma OP de outro
+        # braço com o mesmo produto torna o pareamento ambíguo em vez de errado.
+        query = text("""
+            WITH PENDENTES AS (
+                SELECT NUPLAN, RODADA, BRACO, CODPROD, QTDPLAN,
+                       ROW_NUMBER() OVER (PARTITION BY CODPROD, QTDPLAN ORDER BY NUPLAN) AS ORDEM,
+                       COUNT(*) OVER (PARTITION BY CODPROD, QTDPLAN) AS QUANTIDADE
+                FROM AD_PLAN
+                WHERE
+                    DTINC >= TO_DATE(:data_planejamento, 'YYYY-MM-DD')
+                    AND DTINC < TO_DATE(:data_planejamento, 'YYYY-MM-DD') + 1
+                    AND IDIPROC IS NULL
+            ),
+            ORFAS AS (
+                SELECT P.IDIPROC, PA.CODPRODPA, PA.QTDPRODUZIR,
+                       ROW_NUMBER() OVER (PARTITION BY PA.CODPRODPA, PA.QTDPRODUZIR ORDER BY P.IDIPROC) AS ORDEM,
+                       COUNT(*) OVER (PARTITION BY PA.CODPRODPA, PA.QTDPRODUZIR) AS QUANTIDADE
+                FROM TPRIPROC P
+                JOIN TPRIPA PA ON PA.IDIPROC = P.IDIPROC
+                WHERE
+                    P.IDPROC = :idproc
+                    AND P.DHINST >= TO_DATE(:data_planejamento, 'YYYY-MM-DD')
+                    AND P.DHINST < TO_DATE(:data_planejamento, 'YYYY-MM-DD') + :janela_dias
+                    AND NOT EXISTS (SELECT 1 FROM AD_PLAN A WHERE A.IDIPROC = P.IDIPROC)
+            )
+            SELECT O.IDIPROC, O.CODPRODPA, O.QTDPRODUZIR, D.NUPLAN, D.RODADA
+            FROM ORFAS O
+            LEFT JOIN PENDENTES D
+                ON D.CODPROD = O.CODPRODPA AND D.QTDPLAN = O.QTDPRODUZIR
+                AND D.ORDEM = O.ORDEM AND D.QUANTIDADE = O.QUANTIDADE
+            WHERE D.NUPLAN IS NULL OR D.BRACO = :braco
+            ORDER BY O.IDIPROC
+        """)
+        try:
+            with medir_sql("buscar_ops_sem_planejamento"):
+                result = self.connection.execute(query, {
+                    'data_planejamento': data_planejamento,
+                    'braco': braco,
+                    'idproc': idproc,
+                    'janela_dias': janela_dias,
+                })
+                return [{'IDIPROC': row[0], 'CODPROD': row[1], 'QTD': row[2], 'NUPLAN': row[3], 'RODADA': row[4]}
+                        for row in result]
+
+        except SQLAlchemyError as e:
+            logger.error("Erro ao buscar OPs sem planejamento: %s", e)
+            return None
+
+    def buscar_divergencias_lote(self, data_planejamento: str, braco: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Busca, em uma única consulta, os planejamentos da data e braço com IDIPROC
+        cuja OP não existe em TPRIPROC ou cujo NROLOTE em AD_PLAN não confere com
+        o da OP (ausente em um dos lados ou diferente).
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: Registros com NUPLAN, RODADA, IDIPROC,
+            NROLOTE_PLAN, NROLOTE_OP e OP_EXISTE, ou None em caso de erro
+        """
+        if not self.connection:
+            logger.error("Conexão com o banco não estabelecida para reconciliação.")
+            return None
+
+        query = text("""
+            SELECT A.NUPLAN, A.RODADA, A.IDIPROC, A.NROLOTE, P.NROLOTE,
+                   CASE WHEN P.IDIPROC IS NULL THEN 0 ELSE 1 END
+            FROM AD_PLAN A
+            LEFT JOIN TPRIPROC P ON P.IDIPROC = A.IDIPROC
+            WHERE
+                A.DTINC >= TO_DATE(:data_planejamento, 'YYYY-MM-DD')
+                AND A.DTINC < TO_DATE(:data_planejamento, 'YYYY-MM-DD') + 1
+                AND A.BRACO = :braco
+                AND A.IDIPROC IS NOT NULL
+                AND (P.IDIPROC IS NULL OR A.NROLOTE IS NULL OR P.NROLOTE IS NULL OR A.NROLOTE <> P.NROLOTE)
+            ORDER BY A.RODADA, A.NUPLAN
+        """)
+        try:
+            with medir_sql("buscar_divergencias_lote"):
+                result = self.connection.execute(query, {'data_planejamento': data_planejamento, 'braco': braco})
+                return [{'NUPLAN': row[0], 'RODADA': row[1], 'IDIPROC': row[2], 'NROLOTE_PLAN': row[3],
+                         'NROLOTE_OP': row[4], 'OP_EXISTE': bool(row[5])} for row in result]
+
+        except SQLAlchemyError as e:
+            logger.error("Erro ao buscar divergências de lote: %s", e)
+            return None
+
+    def vincular_idiprocs(self, pares: List[Tuple[Any, int]]) -> Optional[int]:
+        """
+        Grava em AD_PLAN, em um único comando com array binding, o IDIPROC de
+        cada par (NUPLAN, IDIPROC), apenas nos planejamentos ainda sem IDIPROC.
+
+        Returns:
+            Optional[int]: Quantidade de planejamentos atualizados, ou None em caso de falha
+        """
+        if not pares: return 0
+        if not self.connection: return None
+        query = text("UPDATE AD_PLAN SET IDIPROC = :idiproc WHERE NUPLAN = :nuplan AND IDIPROC IS NULL")
+        try:
+            with medir_sql("vincular_idiprocs"), self._transacao():
+                result = self.connection.execute(query, [{"nuplan": nuplan, "idiproc": idiproc} for nuplan, idiproc in pares])
+            cache_pendentes.invalidar()
+            logger.info("IDIPROC gravado em %s de %s planejamentos reconciliados.", result.rowcount, len(pares))
+            return result.rowcount
+        except SQLAlchemyError as e:
+            logger.error("Erro ao vincular IDIPROCs em AD_PLAN: %s", e)
+            return None
+
+    def copiar_nrolote_de_tpriproc(self, nuplan_list: List[Any]) -> Optional[int]:
+        """
+        Copia, com um MERGE a cada MAXIMO_LISTA_NUMERICA NUPLANs, o NROLOTE das
+        OPs em TPRIPROC para os planejamentos informados (lote gerado, mas não
+        gravado em AD_PLAN).
+
+        Returns:
+            Optional[int]: Quantidade de planejamentos atualizados, ou None em caso de falha
+        """
+        if not nuplan_list: return 0
+        if not self.connection: return None
+        query = text("""
+            MERGE INTO AD_PLAN A
+            USING (
+                SELECT A2.NUPLAN, P.NROLOTE
+                FROM AD_PLAN A2
+                JOIN TPRIPROC P ON P.IDIPROC = A2.IDIPROC
+                WHERE A2.NUPLAN IN (SELECT COLUMN_VALUE FROM TABLE(:nuplan_list)) AND P.NROLOTE IS NOT NULL
+            ) S
+            ON (A.NUPLAN = S.NUPLAN)
+            WHEN MATCHED THEN UPDATE SET A.NROLOTE = S.NROLOTE
+        """)
+        try:
+            copiados = 0
+            with medir_sql("copiar_nrolote_de_tpriproc"), self._transacao():
+                for parte in self._blocos_lista_numerica(nuplan_list):
+                    result = self.connection.execute(query, {"nuplan_list": self._lista_numerica(parte)})
+                    copiados += result.rowcount
+            logger.info("NROLOTE copiado de TPRIPROC para %s planejamentos.", copiados)
+            return copiados
+        except SQLAlchemyError as e:
+            logger.error("Erro ao copiar NROLOTE de TPRIPROC para AD_PLAN: %s", e)
+            return None
+
+    def sondar(self) -> bool:
+        """
+        Sonda de saúde barata em uma conexão separada do pool, segura para ser
+        chamada por outra thread enquanto a conexão principal está em uso.
+        """
+        if not self.engine:
+            return False
+        
+        try:
+            with medir_sql("sondar"), self.engine.connect() as conexao:
+                return conexao.execute(text("SELECT 1 FROM DUAL")).scalar() == 1
+        except Exception as e:
+            logger.error("Erro na sonda do banco: %s", e)
+            return False
 
     def testar_conexao(self) -> bool:
         """
@@ -307,9 +830,10 @@ class OracleDatabase:
             return False
         
         try:
-            result = self.connection.execute(text("SELECT 1 FROM DUAL"))
-            row = result.fetchone()
+            with medir_sql("testar_conexao"):
+                result = self.connection.execute(text("SELECT 1 FROM DUAL"))
+                row = result.fetchone()
             return row is not None and row[0] == 1
         except Exception as e:
-            logger.error(f"Erro no teste de conexão: {e}")
+            logger.error("Erro no teste de conexão: %s", e)
             return False
\ No newline at end of file
@@ -1,5 +1,7 @@
 # Mock da classe OracleDatabase para teste sem Oracle
 import logging
+import random
+from modelos import Planejamento, datas_do_periodo
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +13,11 @@ class OracleDatabase:
     def __init__(self):
         self.connection = None
         self.cursor = None
+        # AD_PLAN simulada do modo vigia: {NUPLAN: Planejamento} e IDIPROC gravado por NUPLAN
+        self.ad_plan = {}
+        self.idiprocs = {}
+        # NROLOTE gravado em AD_PLAN pela reconciliação simulada: {NUPLAN: NROLOTE}
+        self.lotes = {}
         logger.info("Mock OracleDatabase inicializado")
 
     def connect(self) -> bool:
@@ -24,6 +31,10 @@ class OracleDatabase:
         logger.info("Mock: Desconectando do banco Oracle...")
         self.connection = None
 
+    def sondar(self) -> bool:
+        """Mock da sonda de saúde"""
+        return self.connection is not None
+
     def testar_conexao(self) -> bool:
         """Mock do teste de conexão"""
         logger.info("Mock: Testando conexão com banco Oracle...")
@@ -35,6 +46,17 @@ class OracleDatabase:
         # Simular alguns planejamentos pendentes
         return (rodada_final - rodada_inicial + 1) * 3
 
+    def contar_planejamentos_por_rodada(self, data_planejamento: str, braco: int, rodada_inicial: int, rodada_final: int) -> dict:
+        """Mock da contagem de planejamentos por rodada"""
+        logger.info(f"Mock: Contando planejamentos por rodada para {data_planejamento}, braço {braco}, rodadas {rodada_inicial}-{rodada_final}")
+        return {rodada: 3 for rodada in range(rodada_inicial, rodada_final + 1)}
+
+    def contar_planejamentos_por_data_rodada(self, data_inicial: str, data_final: str, braco: int, rodada_inicial: int, rodada_final: int) -> dict:
+        """Mock da contagem de planejamentos por data e rodada"""
+        logger.info(f"Mock: Contando planejamentos de {data_inicial} a {data_final}, braço {braco}, rodadas {rodada_inicial}-{rodada_final}")
+        return {data: {rodada: 3 for rodada in range(rodada_inicial, rodada_final + 1)}
+                for data in datas_do_periodo(data_inicial, data_final)}
+
     def buscar_planejamentos(self, data_planejamento: str, braco: int, rodada_inicial: int, rodada_final: int):
         """Mock da busca de planejamentos"""
         logger.info(f"Mock: Buscando planejamentos para {data_planejamento}, braço {braco}, rodadas {rodada_inicial}-{rodada_final}")
@@ -52,13 +74,78 @@ class OracleDatabase:
         
         return planejamentos
 
+    def iterar_planejamentos(self, data_planejamento: str, braco: int, rodada_inicial: int, rodada_final: int, tamanho_lote: int = None,
+                             data_final: str = None):
+        """Mock da busca de planejamentos em streaming (um lote por data)"""
+        for data in datas_do_periodo(data_planejamento, data_final or data_planejamento):
+            registros = self.buscar_planejamentos(data, braco, rodada_inicial, rodada_final)
+            yield [Planejamento(f"{r['NUPLAN']}-{data}", r['CODPROD'], r['QTDPLAN'], r['RODADA'], data) for r in registros]
+
+    def _simular_insercoes(self, data_inicial: str, bracos: list):
+        """Simula planejadores inserindo registros em AD_PLAN entre as sondagens"""
+        # Os planejadores "terminam" após 40 registros, para exercitar o recuo e a ociosidade.
+        for _ in range(min(random.choice((0, 0, 0, 1, 2, 4)), 40 - len(self.ad_plan))):
+            nuplan = 1000 + len(self.ad_plan)
+            rodada = 1 + len(self.ad_plan) // 8
+            self.ad_plan[nuplan] = Planejamento(nuplan, f"PROD{nuplan}", 100, rodada, data_inicial,
+                                                random.choice(bracos or [1]))
+
+    def buscar_planejamentos_novos(self, nuplan_apos: int, data_inicial: str, rodada_inicial: int, rodada_final: int,
+                                   bracos: list = None, limite: int = None) -> list:
+        """Mock da sondagem do modo vigia sobre a AD_PLAN simulada"""
+        self._simular_insercoes(data_inicial, bracos)
+        novos = [r for nuplan, r in sorted(self.ad_plan.items())
+                 if nuplan > nuplan_apos and nuplan not in self.idiprocs
+                 and rodada_inicial <= r.RODADA <= rodada_final and (not bracos or r.BRACO in bracos)]
+        return novos[:limite or 50]
+
     def atualizar_idiproc(self, nuplan: str, idiproc: int) -> bool:
         """Mock da atualização do IDIPROC"""
         logger.info(f"Mock: Atualizando NUPLAN {nuplan} com IDIPROC {idiproc}")
+        self.idiprocs[nuplan] = idiproc
         return True
 
-    def gerar_lote_para_ops(self, idiprocs: list, braco: int) -> bool:
-        """Mock da geração de lote"""
-        logger.info(f"Mock: Gerando lote para OPs {idiprocs} no braço {braco}")
-        return True
+    def gerar_lotes_para_ops(self, idiprocs: list, braco: int) -> dict:
+        """Mock da geração de lotes (um único lote com todas as OPs)"""
+        logger.info(f"Mock: Gerando lotes para {len(idiprocs)} OPs no braço {braco}")
+        return {1: list(idiprocs)} if idiprocs else {}
+
+    def atualizar_lote_em_ad_plan(self, nrolote: int, nuplan_list: list) -> bool:
+        """Mock da atualização do NROLOTE"""
+        logger.info(f"Mock: Atualizando NROLOTE {nrolote} para {len(nuplan_list)} NUPLANs")
+        self.lotes.update((nuplan, nrolote) for nuplan in nuplan_list)
+        return bool(nuplan_list)
+
+    def buscar_ops_sem_planejamento(self, data_planejamento: str, braco: int, idproc: int, janela_dias: int) -> list:
+        """Mock das OPs sem IDIPROC gravado: uma pareada a um planejamento e uma sem par"""
+        nuplan = f"PLAN101-{data_planejamento}"
+        orfas = [{'IDIPROC': 90002, 'CODPROD': 'PROD1002', 'QTD': 150, 'NUPLAN': None, 'RODADA': None}]
+        if nuplan not in self.idiprocs:
+            orfas.insert(0, {'IDIPROC': 90001, 'CODPROD': 'PROD1001', 'QTD': 100, 'NUPLAN': nuplan, 'RODADA': 1})
+        return orfas
+
+    def buscar_divergencias_lote(self, data_planejamento: str, braco: int) -> list:
+        """Mock das divergências de lote: uma de cada tipo, até serem corrigidas"""
+        simuladas = [
+            {'NUPLAN': f"PLAN102-{data_planejamento}", 'RODADA': 1, 'IDIPROC': 90003, 'NROLOTE_PLAN': None, 'NROLOTE_OP': 7, 'OP_EXISTE': True},
+            {'NUPLAN': f"PLAN103-{data_planejamento}", 'RODADA': 1, 'IDIPROC': 90004, 'NROLOTE_PLAN': 6, 'NROLOTE_OP': 7, 'OP_EXISTE': True},
+            {'NUPLAN': f"PLAN201-{data_planejamento}", 'RODADA': 2, 'IDIPROC': 90005, 'NROLOTE_PLAN': None, 'NROLOTE_OP': None, 'OP_EXISTE': True},
+            {'NUPLAN': f"PLAN202-{data_planejamento}", 'RODADA': 2, 'IDIPROC': 90006, 'NROLOTE_PLAN': None, 'NROLOTE_OP': None, 'OP_EXISTE': False},
+        ]
+        # O planejamento vinculado pela reconciliação ainda não tem lote.
+        nuplan = f"PLAN101-{data_planejamento}"
+        if nuplan in self.idiprocs:
+            simuladas.insert(0, {'NUPLAN': nuplan, 'RODADA': 1, 'IDIPROC': self.idiprocs[nuplan],
+                                 'NROLOTE_PLAN': None, 'NROLOTE_OP': None, 'OP_EXISTE': True})
+        return [d for d in simuladas if not d['OP_EXISTE'] or d['NUPLAN'] not in self.lotes]
+
+    def vincular_idiprocs(self, pares: list) -> int:
+        """Mock da gravação em massa do IDIPROC"""
+        novos = [(nuplan, idiproc) for nuplan, idiproc in pares if nuplan not in self.idiprocs]
+        self.idiprocs.update(novos)
+        return len(novos)
 
+    def copiar_nrolote_de_tpriproc(self, nuplan_list: list) -> int:
+        """Mock da cópia do NROLOTE de TPRIPROC"""
+        self.lotes.update((nuplan, 7) for nuplan in nuplan_list)
+        return len(nuplan_list)
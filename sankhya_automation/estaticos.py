@@ -0,0 +1,161 @@
+"""
+Módulo de entrega dos arquivos estáticos do dashboard.
+Na partida, lê a pasta static uma única vez e monta um catálogo em memória:
+nomes com hash do conteúdo (cache imutável no navegador), ETag fraco para
+revalidação com 304 e variantes pré-comprimidas (brotli/gzip) escolhidas
+pelo Accept-Encoding. O index.html passa a referenciar os nomes com hash.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli  # dependência opcional: sem ela, apenas gzip
+except ImportError:
+    brotli = None
+
+PAGINA_INICIAL = "index.html"
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+
+# Tipos que compensam compressão; abaixo do tamanho mínimo o ganho não paga o cabeçalho.
+TIPOS_COMPRIMIVEIS = ("text/", "application/javascript", "application/json", "image/svg+xml")
+TAMANHO_MINIMO_COMPRESSAO = 512
+
+# Ordem de preferência das codificações oferecidas ao navegador.
+CODIFICACOES = ("br", "gzip")
+EXTENSOES_CODIFICACAO = {"br": ".br", "gzip": ".gz"}
+
+
+@dataclass(slots=True)
+class Ativo:
+    """
+    Arquivo estático carregado em memória, com suas variantes comprimidas.
+    """
+    nome: str
+    nome_hash: str
+    mimetype: str
+    conteudo: bytes
+    etag: str
+    variantes: Dict[str, bytes] = field(default_factory=dict)
+
+
+class CatalogoEstaticos:
+    """
+    Catálogo dos arquivos da pasta static, montado uma vez na partida.
+    """
+
+    def __init__(self, pasta: str):
+        self.pasta = pasta
+        self._por_nome: Dict[str, Ativo] = {}
+        self._carregar()
+
+    def _carregar(self):
+        for raiz, _, arquivos in os.walk(self.pasta):
+            for arquivo in arquivos:
+                caminho = os.path.join(raiz, arquivo)
+                nome = os.path.relpath(caminho, self.pasta).replace(os.sep, "/")
+                if os.path.splitext(nome)[1] in (".br", ".gz"):
+                    continue
+                with open(caminho, "rb") as f:
+                    ativo = self._criar_ativo(nome, f.read())
+                self._por_nome[nome] = ativo
+                if nome != PAGINA_INICIAL:
+                    self._por_nome[ativo.nome_hash] = ativo
+
+        pagina = self._por_nome.get(PAGINA_INICIAL)
+        if pagina is not None:
+            # A página inicial é sempre revalidada e aponta para os nomes com hash.
+            html = self._referenciar_hashes(pagina.conteudo.decode("utf-8"))
+            self._por_nome[PAGINA_INICIAL] = self._criar_ativo(PAGINA_INICIAL, html.encode("utf-8"))
+        logger.info("Catálogo de estáticos carregado: %s arquivos (brotli %s).",
+                    len({id(a) for a in self._por_nome.values()}), "ativo" if brotli else "indisponível")
+
+    def _criar_ativo(self, nome: str, conteudo: bytes) -> Ativo:
+        resumo = hashlib.sha256(conteudo).hexdigest()
+        base, extensao = os.path.splitext(nome)
+        mimetype = mimetypes.guess_type(nome)[0] or "application/octet-stream"
+        ativo = Ativo(nome, f"{base}.{resumo[:10]}{extensao}", mimetype, conteudo, f'W/"{resumo[:32]}"')
+        if mimetype.startswith(TIPOS_COMPRIMIVEIS) and len(conteudo) >= TAMANHO_MINIMO_COMPRESSAO:
+            for codificacao in CODIFICACOES:
+                variante = self._variante(nome, conteudo, codificacao)
+                if variante is not None and len(variante) < len(conteudo):
+                    ativo.variantes[codificacao] = variante
+        return ativo
+
+    def _variante(self, nome: str, conteudo: bytes, codificacao: str) -> Optional[bytes]:
+        # Uma variante gerada no build (ex.: style.css.br) tem prioridade, se estiver atualizada.
+        caminho = os.path.join(self.pasta, nome + EXTENSOES_CODIFICACAO[codificacao])
+        origem = os.path.join(self.pasta, nome)
+        if os.path.exists(caminho) and os.path.getmtime(caminho) >= os.path.getmtime(origem):
+            with open(caminho, "rb") as f:
+                return f.read()
+        if codificacao == "gzip":
+            return gzip.compress(conteudo, compresslevel=9, mtime=0)
+        if codificacao == "br" and brotli is not None:
+            return brotli.compress(conteudo, quality=11)
+        return None
+
+    def _referenciar_hashes(self, html: str) -> str:
+        def trocar(correspondencia: "re.Match") -> str:
+            ativo = self._por_nome.get(correspondencia.group(2))
+            if ativo is None or ativo.nome == PAGINA_INICIAL:
+                return correspondencia.group(0)
+            return f'{correspondencia.group(1)}"{ativo.nome_hash}"'
+        # Apenas referências relativas (href/src sem esquema nem barra inicial).
+        return re.sub(r'((?:href|src)=)"(?![a-z]+:|/)([^"?#]+)"', trocar, html)
+
+    def buscar(self, nome: str) -> Optional[Ativo]:
+        return self._por_nome.get(nome)
+
+    def responder(self, nome: str, accept_encoding: str, if_none_match: str) -> Tuple[int, bytes, Dict[str, str], str]:
+        """
+        Monta a resposta de um arquivo. Nomes desconhecidos recebem a página
+        inicial (rotas do frontend).
+
+        Returns:
+            Tuple[int, bytes, Dict[str, str], str]: status, corpo, cabeçalhos e mimetype.
+        """
+        ativo = self._por_nome.get(nome) or self._por_nome[PAGINA_INICIAL]
+        imutavel = nome == ativo.nome_hash
+        cabecalhos = {
+            "Cache-Control": CACHE_IMUTAVEL if imutavel else CACHE_REVALIDAR,
+            "ETag": ativo.etag,
+            "Vary": "Accept-Encoding",
+        }
+        # Comparação fraca: o prefixo W/ é ignorado.
+        etags = {etag.strip().removeprefix("W/") for etag in if_none_match.split(",")}
+        if ativo.etag.removeprefix("W/") in etags or "*" in etags:
+            return 304, b"", cabecalhos, ativo.mimetype
+
+        codificacao = self._escolher_codificacao(ativo, accept_encoding)
+        corpo = ativo.variantes[codificacao] if codificacao else ativo.conteudo
+        if codificacao:
+            cabecalhos["Content-Encoding"] = codificacao
+        cabecalhos["Content-Length"] = str(len(corpo))
+        return 200, corpo, cabecalhos, ativo.mimetype
+
+    @staticmethod
+    def _escolher_codificacao(ativo: Ativo, accept_encoding: str) -> Optional[str]:
+        aceitas = {}
+        for parte in accept_encoding.lower().split(","):
+            nome, _, parametros = parte.strip().partition(";")
+            qualidade = 1.0
+            if parametros.strip().startswith("q="):
+                try:
+                    qualidade = float(parametros.strip()[2:])
+                except ValueError:
+                    qualidade = 0.0
+            aceitas[nome.strip()] = qualidade
+        for codificacao in CODIFICACOES:
+            if codificacao in ativo.variantes and aceitas.get(codificacao, aceitas.get("*", 0.0)) > 0:
+                return codificacao
+        return None
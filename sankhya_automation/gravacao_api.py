@@ -0,0 +1,237 @@
+"""
+Gravação e reprodução do tráfego real com a API Sankhya.
+O gravador envolve a sessão HTTP da SankhyaAPI e grava cada par
+requisição/resposta (sem credenciais nem tokens) com a duração, em JSON Lines
+(comprimido se o arquivo terminar em .gz). Todas as sessões que gravam no
+mesmo arquivo compartilham um único gravador (um handle, um lock e uma origem
+de tempo), então `inicio_s` é comparável entre sessões. A sessão de reprodução devolve as
+respostas gravadas, por serviço e na ordem da gravação, na velocidade original
+ou escalada, para validar mudanças de desempenho do cliente sem o ERP.
+
+Uso para resumir uma gravação:
+    python sankhya_automation/gravacao_api.py gravacao.jsonl.gz
+"""
+
+import atexit
+import gzip
+import http.client
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Campos removidos das requisições e respostas gravadas (comparação sem diferenciar maiúsculas).
+CAMPOS_SENSIVEIS = frozenset({"bearertoken", "password", "token", "appkey", "authorization",
+                              "mgesession", "jsessionid", "username"})
+MASCARA = "***"
+
+
+def sanitizar(valor: Any) -> Any:
+    """
+    Copia um valor JSON trocando o conteúdo dos campos sensíveis pela máscara.
+    """
+    if isinstance(valor, dict):
+        return {k: MASCARA if k.lower() in CAMPOS_SENSIVEIS else sanitizar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [sanitizar(v) for v in valor]
+    return valor
+
+
+def _servico(params: Optional[Dict[str, Any]]) -> str:
+    # O login é a única chamada sem serviceName.
+    return (params or {}).get("serviceName") or "login"
+
+
+def _abrir(arquivo: str, modo: str):
+    if arquivo.endswith(".gz"):
+        return gzip.open(arquivo, modo + "t", encoding="utf-8")
+    return open(arquivo, modo, encoding="utf-8")
+
+
+def ler_gravacao(arquivo: str) -> List[Dict[str, Any]]:
+    with _abrir(arquivo, "r") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+class _Gravador:
+    """
+    Arquivo de gravação compartilhado pelas sessões do processo. Com vários
+    handles de append no mesmo .gz, cada um fecharia o seu membro gzip em
+    momentos diferentes e as linhas se intercalariam corrompidas.
+    """
+
+    def __init__(self, arquivo: str):
+        self.arquivo = arquivo
+        self.inicio = time.monotonic()
+        self._lock = threading.Lock()
+        self._saida = _abrir(arquivo, "a")
+        logger.info("Gravando o tráfego da API Sankhya em '%s'.", arquivo)
+
+    def gravar(self, registro: Dict[str, Any]):
+        linha = json.dumps(registro, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._lock:
+            if self._saida is not None:
+                self._saida.write(linha + "\n")
+                self._saida.flush()
+
+    def fechar(self):
+        with self._lock:
+            if self._saida is not None:
+                self._saida.close()
+                self._saida = None
+
+
+_gravadores: Dict[str, _Gravador] = {}
+_gravadores_lock = threading.Lock()
+
+
+def _gravador(arquivo: str) -> _Gravador:
+    with _gravadores_lock:
+        gravador = _gravadores.get(arquivo)
+        if gravador is None:
+            gravador = _gravadores[arquivo] = _Gravador(arquivo)
+        return gravador
+
+
+def fechar_gravacoes():
+    """
+    Fecha os arquivos de gravação abertos; a próxima sessão gravadora reabre o arquivo.
+    """
+    with _gravadores_lock:
+        gravadores = list(_gravadores.values())
+        _gravadores.clear()
+    for gravador in gravadores:
+        gravador.fechar()
+
+
+atexit.register(fechar_gravacoes)
+
+
+class SessaoGravadora:
+    """
+    Sessão HTTP que repassa as chamadas à sessão real e grava cada troca no
+    gravador compartilhado do arquivo.
+    """
+
+    def __init__(self, sessao: requests.Session, arquivo: str):
+        self.sessao = sessao
+        self.arquivo = arquivo
+        self._gravador = _gravador(arquivo)
+
+    def post(self, url: str, timeout=None, params: Optional[Dict[str, Any]] = None, json: Any = None, **kwargs):
+        inicio = time.monotonic()
+        registro = {
+            "servico": _servico(params),
+            "inicio_s": round(inicio - self._gravador.inicio, 4),
+            "params": sanitizar(params or {}),
+            "corpo": sanitizar(json),
+        }
+        try:
+            resposta = self.sessao.post(url, timeout=timeout, params=params, json=json, **kwargs)
+        except requests.RequestException as e:
+            registro.update(duracao_s=round(time.monotonic() - inicio, 4), erro=type(e).__name__, mensagem=str(e))
+            self._gravador.gravar(registro)
+            raise
+        registro["duracao_s"] = round(time.monotonic() - inicio, 4)
+        registro["status"] = resposta.status_code
+        registro["tipo"] = resposta.headers.get("Content-Type", "")
+        try:
+            registro["resposta"] = sanitizar(resposta.json())
+        except ValueError:
+            registro["texto"] = resposta.text
+        self._gravador.gravar(registro)
+        return resposta
+
+
+class SessaoReproducao:
+    """
+    Sessão HTTP que devolve as respostas de uma gravação. Cada serviço tem a
+    sua fila, consumida na ordem gravada (e reiniciada ao acabar). Com
+    `velocidade` 1 cada resposta leva a duração gravada; 2 leva a metade;
+    0 responde sem espera. Uma duração gravada acima do timeout de leitura da
+    chamada vira ReadTimeout, como aconteceria com o servidor real.
+    """
+
+    reproduzindo = True
+
+    def __init__(self, arquivo: str, velocidade: float = 1.0):
+        self.arquivo = arquivo
+        self.velocidade = max(0.0, velocidade)
+        self._gravados = _agrupar(ler_gravacao(arquivo))
+        self._filas: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        logger.info("Reproduzindo a gravação '%s' (%s trocas, velocidade %s).",
+                    arquivo, sum(map(len, self._gravados.values())), self.velocidade)
+
+    def _proximo(self, servico: str) -> Dict[str, Any]:
+        with self._lock:
+            fila = self._filas.get(servico)
+            if not fila:
+                if servico not in self._gravados:
+                    raise requests.ConnectionError(f"Serviço '{servico}' ausente da gravação '{self.arquivo}'.")
+                fila = self._filas[servico] = deque(self._gravados[servico])
+            return fila.popleft()
+
+    def _esperar(self, segundos: float):
+        if self.velocidade:
+            time.sleep(segundos / self.velocidade)
+
+    def post(self, url: str, timeout=None, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        registro = self._proximo(_servico(params))
+        duracao = registro.get("duracao_s", 0.0)
+        leitura = timeout[1] if isinstance(timeout, tuple) else timeout
+        if leitura is not None and duracao > leitura:
+            self._esperar(leitura)
+            raise requests.exceptions.ReadTimeout(f"Reprodução: duração gravada {duracao}s acima do timeout {leitura}s.")
+        self._esperar(duracao)
+        if registro.get("erro"):
+            erro = getattr(requests.exceptions, registro["erro"], requests.RequestException)
+            raise erro(registro.get("mensagem", "Erro gravado."))
+
+        resposta = requests.Response()
+        resposta.status_code = registro["status"]
+        resposta.reason = http.client.responses.get(resposta.status_code, "")
+        resposta.url = url or ""
+        resposta.headers["Content-Type"] = registro.get("tipo") or "application/json"
+        resposta.encoding = "utf-8"
+        corpo = registro.get("texto")
+        if corpo is None:
+            corpo = json.dumps(registro.get("resposta"), ensure_ascii=False)
+        resposta._content = corpo.encode("utf-8")
+        return resposta
+
+
+def resumir(arquivo: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Quantidade, erros, duração média e p95 de cada serviço da gravação.
+    """
+    resumo: Dict[str, Dict[str, Any]] = {}
+    for servico, registros in _agrupar(ler_gravacao(arquivo)).items():
+        duracoes = sorted(r.get("duracao_s", 0.0) for r in registros)
+        resumo[servico] = {
+            "chamadas": len(registros),
+            "erros": sum(1 for r in registros if r.get("erro") or r.get("status", 200) >= 400),
+            "media_s": round(sum(duracoes) / len(duracoes), 4),
+            "p95_s": duracoes[min(len(duracoes) - 1, int(0.95 * len(duracoes)))],
+        }
+    return resumo
+
+
+def _agrupar(registros: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    grupos: Dict[str, List[Dict[str, Any]]] = {}
+    for registro in registros:
+        grupos.setdefault(registro["servico"], []).append(registro)
+    return grupos
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("uso: python sankhya_automation/gravacao_api.py ARQUIVO")
+    print(json.dumps(resumir(sys.argv[1]), ensure_ascii=False, indent=2))
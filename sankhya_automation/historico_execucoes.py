@@ -0,0 +1,168 @@
+"""
+Módulo do histórico persistente de execuções da automação.
+Grava cada execução (parâmetros, início e fim, vazão, latência por etapa e
+falhas por categoria) em um banco SQLite local e calcula as tendências
+diárias de vazão e latência consultadas pelo dashboard.
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import APP_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT,
+    origem TEXT NOT NULL,
+    inicio TEXT NOT NULL,
+    fim TEXT NOT NULL,
+    duracao_s REAL NOT NULL,
+    parametros TEXT NOT NULL,
+    status TEXT NOT NULL,
+    pendentes INTEGER NOT NULL,
+    processados INTEGER NOT NULL,
+    ops_criadas INTEGER NOT NULL,
+    falhas INTEGER NOT NULL,
+    ops_por_segundo REAL NOT NULL,
+    falhas_por_categoria TEXT NOT NULL,
+    latencias TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_execucoes_inicio ON execucoes (inicio);
+"""
+
+_COLUNAS_JSON = ("parametros", "falhas_por_categoria", "latencias")
+
+
+class HistoricoExecucoes:
+    """
+    Histórico de execuções em SQLite. Cada operação abre a própria conexão,
+    então a instância pode ser usada por qualquer thread.
+    """
+
+    def __init__(self, arquivo: Optional[str] = None):
+        self.arquivo = arquivo or APP_CONFIG['historico_execucoes_db']
+        self._lock = threading.Lock()
+        self._esquema_criado = False
+
+    def _conectar(self):
+        # Importado sob demanda para não pesar na partida da CLI.
+        import sqlite3
+        conexao = sqlite3.connect(self.arquivo, timeout=10)
+        conexao.row_factory = sqlite3.Row
+        if not self._esquema_criado:
+            with self._lock:
+                conexao.executescript(_ESQUEMA)
+                self._esquema_criado = True
+        return conexao
+
+    def registrar(self, execucao: Dict[str, Any]) -> Optional[int]:
+        """
+        Grava uma execução. Erros são registrados no log e não interrompem a automação.
+
+        Args:
+            execucao (Dict[str, Any]): Campos da tabela `execucoes` (exceto `id`); os campos
+                parametros, falhas_por_categoria e latencias são dicionários.
+
+        Returns:
+            Optional[int]: Id da execução gravada, ou None em caso de erro.
+        """
+        registro = dict(execucao)
+        for coluna in _COLUNAS_JSON:
+            registro[coluna] = json.dumps(registro.get(coluna) or {}, ensure_ascii=False, default=str)
+        colunas = ", ".join(registro)
+        marcadores = ", ".join(f":{coluna}" for coluna in registro)
+        try:
+            conexao = self._conectar()
+            try:
+                with conexao:
+                    cursor = conexao.execute(f"INSERT INTO execucoes ({colunas}) VALUES ({marcadores})", registro)
+                return cursor.lastrowid
+            finally:
+                conexao.close()
+        except Exception as e:
+            logger.error("Erro ao gravar o histórico de execuções: %s", e, exc_info=True)
+            return None
+
+    def listar(self, limite: int = 20) -> List[Dict[str, Any]]:
+        """
+        Retorna as execuções mais recentes (da mais nova para a mais antiga).
+        """
+        conexao = self._conectar()
+        try:
+            linhas = conexao.execute("SELECT * FROM execucoes ORDER BY inicio DESC, id DESC LIMIT ?", (limite,)).fetchall()
+        finally:
+            conexao.close()
+        return [self._para_dict(linha) for linha in linhas]
+
+    def tendencias(self, dias: int = 30) -> Dict[str, Any]:
+        """
+        Agrega as execuções dos últimos `dias` por dia: quantidade, OPs, falhas,
+        vazão (OPs por segundo de processamento) e latência média por etapa.
+        Compara também a vazão da metade mais recente do período com a anterior.
+        """
+        desde = (datetime.now() - timedelta(days=dias)).isoformat(timespec="seconds")
+        conexao = self._conectar()
+        try:
+            linhas = conexao.execute("SELECT * FROM execucoes WHERE inicio >= ? ORDER BY inicio", (desde,)).fetchall()
+        finally:
+            conexao.close()
+
+        por_dia: Dict[str, Dict[str, Any]] = {}
+        for linha in map(self._para_dict, linhas):
+            dia = por_dia.setdefault(linha["inicio"][:10], {
+                "execucoes": 0, "ops_criadas": 0, "falhas": 0, "duracao_s": 0.0,
+                "falhas_por_categoria": {}, "_latencias": {}})
+            dia["execucoes"] += 1
+            dia["ops_criadas"] += linha["ops_criadas"]
+            dia["falhas"] += linha["falhas"]
+            dia["duracao_s"] += linha["duracao_s"]
+            for categoria, quantidade in linha["falhas_por_categoria"].items():
+                dia["falhas_por_categoria"][categoria] = dia["falhas_por_categoria"].get(categoria, 0) + quantidade
+            for etapa, resumo in linha["latencias"].items():
+                contagem, soma = dia["_latencias"].get(etapa, (0, 0.0))
+                dia["_latencias"][etapa] = (contagem + resumo["contagem"], soma + resumo["contagem"] * resumo["media_s"])
+
+        serie = []
+        for data, dia in sorted(por_dia.items()):
+            latencias: Dict[str, Tuple[int, float]] = dia.pop("_latencias")
+            dia["ops_por_segundo"] = round(dia["ops_criadas"] / dia["duracao_s"], 4) if dia["duracao_s"] > 0 else 0.0
+            dia["duracao_s"] = round(dia["duracao_s"], 3)
+            dia["latencia_media_s"] = {etapa: round(soma / contagem, 4) for etapa, (contagem, soma) in latencias.items() if contagem}
+            serie.append({"data": data, **dia})
+
+        metade = len(serie) // 2
+        return {
+            "dias": dias,
+            "por_dia": serie,
+            "ops_por_segundo_anterior": self._vazao(serie[:metade]),
+            "ops_por_segundo_recente": self._vazao(serie[metade:]),
+        }
+
+    @staticmethod
+    def _vazao(dias: List[Dict[str, Any]]) -> Optional[float]:
+        duracao = sum(dia["duracao_s"] for dia in dias)
+        return round(sum(dia["ops_criadas"] for dia in dias) / duracao, 4) if duracao > 0 else None
+
+    @staticmethod
+    def _para_dict(linha) -> Dict[str, Any]:
+        registro = dict(linha)
+        for coluna in _COLUNAS_JSON:
+            registro[coluna] = json.loads(registro[coluna] or "{}")
+        return registro
+
+
+def resumir_latencias(deltas: Dict[str, Tuple[int, float]]) -> Dict[str, Dict[str, float]]:
+    """
+    Converte (contagem, soma) por etapa em {contagem, media_s} para o histórico.
+    """
+    return {etapa: {"contagem": contagem, "media_s": round(soma / contagem, 4)}
+            for etapa, (contagem, soma) in deltas.items() if contagem}
+
+
+historico_execucoes = HistoricoExecucoes()
@@ -4,12 +4,16 @@ Módulo para interface de usuário da aplicação.
 """
 
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Tuple, Optional, List, Dict, Any
 
 # ... (outros métodos da classe continuam iguais) ...
 
 class InterfaceUsuario:
+    # Destino das mensagens de progresso (None = stdout). No modo lote com o
+    # resumo JSON no stdout, as mensagens vão para o stderr.
+    arquivo_progresso = None
+
     # ... (exibir_cabecalho, validar_data, etc. continuam aqui) ...
     @staticmethod
     def exibir_cabecalho():
@@ -56,6 +60,60 @@ class InterfaceUsuario:
         except ValueError:
             return False
     
+    @staticmethod
+    def para_iso(data_str: str) -> str:
+        """
+        Converte uma data DD/MM/YYYY para o formato YYYY-MM-DD usado nas consultas.
+        """
+        return datetime.strptime(data_str, '%d/%m/%Y').strftime('%Y-%m-%d')
+
+    @staticmethod
+    def expandir_datas(texto: str) -> List[str]:
+        """
+        Expande uma lista de datas e/ou intervalos no formato DD/MM/YYYY.
+        Exemplo: "20/07/2025,22/07/2025:24/07/2025".
+
+        Raises:
+            ValueError: Se alguma data for inválida ou um intervalo estiver invertido.
+        """
+        datas: List[str] = []
+        for parte in filter(None, (p.strip() for p in texto.split(','))):
+            inicio_str, _, fim_str = parte.partition(':')
+            inicio = datetime.strptime(inicio_str.strip(), '%d/%m/%Y')
+            fim = datetime.strptime(fim_str.strip(), '%d/%m/%Y') if fim_str else inicio
+            if fim < inicio:
+                raise ValueError(f"intervalo de datas invertido: {parte}")
+            while inicio <= fim:
+                data = inicio.strftime('%d/%m/%Y')
+                if data not in datas:
+                    datas.append(data)
+                inicio += timedelta(days=1)
+        if not datas:
+            raise ValueError("nenhuma data informada")
+        return datas
+
+    @staticmethod
+    def expandir_numeros(texto: str) -> List[int]:
+        """
+        Expande uma lista de números positivos e/ou intervalos. Exemplo: "1,3-5".
+
+        Raises:
+            ValueError: Se algum número for inválido ou um intervalo estiver invertido.
+        """
+        numeros: List[int] = []
+        for parte in filter(None, (p.strip() for p in texto.split(','))):
+            inicio_str, _, fim_str = parte.partition('-')
+            inicio = int(inicio_str)
+            fim = int(fim_str) if fim_str else inicio
+            if inicio <= 0 or fim < inicio:
+                raise ValueError(f"intervalo inválido: {parte}")
+            for numero in range(inicio, fim + 1):
+                if numero not in numeros:
+                    numeros.append(numero)
+        if not numeros:
+            raise ValueError("nenhum número informado")
+        return numeros
+
     @staticmethod
     def solicitar_data_planejamento() -> str:
         """
@@ -78,6 +136,29 @@ class InterfaceUsuario:
                 print("   ❌ Data inválida! Use o formato DD/MM/YYYY.")
                 print()
     
+    @staticmethod
+    def solicitar_data_final(data_inicial: str) -> str:
+        """
+        Solicita a data final opcional do período (Enter = apenas a data inicial).
+
+        Returns:
+            str: Data final no formato DD/MM/YYYY
+        """
+        while True:
+            print("📅 Data Final (opcional):")
+            print("   Para processar um período, digite a última data; Enter processa apenas a data informada.")
+            print()
+
+            data = input("   Data final: ").strip()
+            if not data:
+                return data_inicial
+            try:
+                InterfaceUsuario.expandir_datas(f"{data_inicial}:{data}")
+                return data
+            except ValueError:
+                print(f"   ❌ Data inválida! Use o formato DD/MM/YYYY, igual ou posterior a {data_inicial}.")
+                print()
+
     @staticmethod
     def solicitar_braco_producao() -> int:
         """
@@ -138,21 +219,30 @@ class InterfaceUsuario:
                 print()
 
     @staticmethod
-    def coletar_parametros() -> Optional[Tuple[str, int, int, int]]:
+    def coletar_parametros() -> Optional[Tuple[str, str, int, int, int]]:
         """
         Coleta todos os parâmetros necessários do usuário.
+
+        Returns:
+            Optional[Tuple[str, str, int, int, int]]: (data_inicial, data_final, braco,
+            rodada_inicial, rodada_final), ou None se o usuário cancelar.
         """
         InterfaceUsuario.exibir_cabecalho()
         
         data_planejamento = InterfaceUsuario.solicitar_data_planejamento()
         print()
+        data_final = InterfaceUsuario.solicitar_data_final(data_planejamento)
+        print()
         braco = InterfaceUsuario.solicitar_braco_producao()
         print()
         rodada_inicial, rodada_final = InterfaceUsuario.solicitar_range_rodadas()
         print()
         
         print("📋 Resumo dos Parâmetros:")
-        print(f"   Data do Planejamento: {data_planejamento}")
+        if data_final == data_planejamento:
+            print(f"   Data do Planejamento: {data_planejamento}")
+        else:
+            print(f"   Período do Planejamento: {data_planejamento} a {data_final}")
         print(f"   Braço de Produção: {braco}")
         print(f"   Range de Rodadas: {rodada_inicial} a {rodada_final}")
         print()
@@ -160,7 +250,7 @@ class InterfaceUsuario:
         confirmacao = input("   Confirma os parâmetros? (s/n): ").strip().lower()
         
         if confirmacao in ['s', 'sim', 'y', 'yes']:
-            return data_planejamento, braco, rodada_inicial, rodada_final
+            return data_planejamento, data_final, braco, rodada_inicial, rodada_final
         else:
             print("   Operação cancelada pelo usuário.")
             return None # Retorna None se o usuário cancelar
@@ -170,7 +260,7 @@ class InterfaceUsuario:
         """Exibe mensagem de progresso formatada."""
         icones = {"info": "ℹ️", "sucesso": "✅", "erro": "❌", "aviso": "⚠️"}
         icone = icones.get(tipo, "ℹ️")
-        print(f"{icone} {mensagem}")
+        print(f"{icone} {mensagem}", file=InterfaceUsuario.arquivo_progresso)
     
     # --- MÉTODO ATUALIZADO ---
     @staticmethod
@@ -0,0 +1,176 @@
+"""
+Módulo de configuração do logging assíncrono da aplicação.
+Os registros são enfileirados pelas threads de trabalho e gravados por uma
+thread dedicada (QueueListener) em um arquivo rotativo comprimido, com um
+registro JSON por linha, além do console opcional.
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, List, Optional
+
+from config import APP_CONFIG
+
+_listener: Optional[QueueListener] = None
+_listeners_auxiliares: List[QueueListener] = []
+
+# Atributos padrão de um LogRecord; o que não estiver aqui é tratado como campo extra.
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class FormatadorJSON(logging.Formatter):
+    """
+    Formata cada registro como um objeto JSON em uma única linha.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        registro = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO:
+                registro[chave] = valor
+        if record.exc_info:
+            registro["exc"] = self.formatException(record.exc_info)
+        return json.dumps(registro, default=str, ensure_ascii=False)
+
+
+class _QueueHandlerSemFormatacao(QueueHandler):
+    """
+    QueueHandler que não formata a mensagem na thread chamadora: a
+    interpolação dos argumentos acontece na thread do listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return logging.makeLogRecord(record.__dict__)
+
+
+def _rotacionar_gzip(origem: str, destino: str):
+    with open(origem, 'rb') as f_in, gzip.open(destino, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(origem)
+
+
+def criar_handler_assincrono(*handlers: logging.Handler) -> QueueHandler:
+    """
+    Envolve handlers síncronos em um QueueHandler atendido por uma thread própria.
+    """
+    fila: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = QueueListener(fila, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners_auxiliares.append(listener)
+    atexit.register(listener.stop)
+    return _QueueHandlerSemFormatacao(fila)
+
+
+def configurar_logging(arquivo: str, console: bool = True, nivel: Optional[str] = None):
+    """
+    Substitui os handlers do logger raiz por uma fila assíncrona.
+
+    Args:
+        arquivo (str): Caminho do arquivo de log (JSON por linha, rotativo e comprimido).
+        console (bool): Se True, também escreve no stdout em formato texto.
+        nivel (Optional[str]): Nível de log; por padrão usa APP_CONFIG['log_level'].
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler_arquivo = RotatingFileHandler(
+        arquivo,
+        maxBytes=APP_CONFIG['log_max_bytes'],
+        backupCount=APP_CONFIG['log_backups'],
+        encoding='utf-8'
+    )
+    handler_arquivo.namer = lambda nome: nome + ".gz"
+    handler_arquivo.rotator = _rotacionar_gzip
+    handler_arquivo.setFormatter(FormatadorJSON())
+    handlers = [handler_arquivo]
+
+    if console:
+        handler_console = logging.StreamHandler(sys.stdout)
+        handler_console.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        handlers.append(handler_console)
+
+    fila: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_QueueHandlerSemFormatacao(fila))
+    raiz.setLevel(nivel or APP_CONFIG['log_level'])
+
+    _listener = QueueListener(fila, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(encerrar_logging)
+
+
+def encerrar_logging():
+    """
+    Esvazia a fila e encerra a thread de gravação dos logs.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class LimitadorDiagnostico:
+    """
+    Limita a quantidade de dumps de diagnóstico (respostas completas da API)
+    gravados por janela de tempo. Os excedentes são apenas contados e
+    informados quando a janela seguinte começa.
+    """
+
+    def __init__(self, max_por_janela: int, janela_segundos: float, max_caracteres: int):
+        self.max_por_janela = max_por_janela
+        self.janela_segundos = janela_segundos
+        self.max_caracteres = max_caracteres
+        self._inicio_janela = 0.0
+        self._emitidos = 0
+        self._suprimidos = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, log: logging.Logger, titulo: str, dados: Any, nivel: int = logging.ERROR):
+        if not log.isEnabledFor(nivel):
+            return
+        with self._lock:
+            agora = time.monotonic()
+            if agora - self._inicio_janela >= self.janela_segundos:
+                suprimidos = self._suprimidos
+                self._inicio_janela, self._emitidos, self._suprimidos = agora, 0, 0
+                if suprimidos:
+                    log.warning("%d dumps de diagnóstico suprimidos na janela anterior.", suprimidos)
+            if self._emitidos >= self.max_por_janela:
+                self._suprimidos += 1
+                return
+            self._emitidos += 1
+        texto = json.dumps(dados, default=str, ensure_ascii=False)
+        if len(texto) > self.max_caracteres:
+            texto = texto[:self.max_caracteres] + "...(truncado)"
+        log.log(nivel, "%s: %s", titulo, texto)
+
+
+limitador_diagnostico = LimitadorDiagnostico(
+    APP_CONFIG['log_diagnostico_por_minuto'], 60.0, APP_CONFIG['log_diagnostico_max_caracteres']
+)
+
+
+def log_diagnostico(log: logging.Logger, titulo: str, dados: Any, nivel: int = logging.ERROR):
+    """
+    Grava um dump de diagnóstico respeitando o limite de taxa global.
+    """
+    limitador_diagnostico.registrar(log, titulo, dados, nivel)
@@ -3,31 +3,70 @@ Aplicação principal para automação de Ordens de Produção no sistema Sankhy
 ...
 """
 
+import argparse
+import json
 import logging
+import signal
 import sys
-from typing import Dict, Any
-from database import OracleDatabase
-from sankhya_api import SankhyaAPI
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from backends import criar_database, criar_api, preimportar_backends
+from config import APP_CONFIG
 from interface import InterfaceUsuario
-
-# ... (configuração do logging continua igual) ...
+from modelos import agrupar_periodos
+from motor import MotorAutomacao, SinkProgresso
+from log_assincrono import configurar_logging
+from painel_terminal import PainelTerminal
 
 logger = logging.getLogger(__name__)
 
+# Códigos de saída do modo lote (não interativo).
+SAIDA_SUCESSO = 0
+SAIDA_FALHAS_PARCIAIS = 1
+SAIDA_ARGUMENTOS_INVALIDOS = 2  # mesmo código usado pelo argparse
+SAIDA_ERRO_FATAL = 3
+SAIDA_INTERROMPIDO = 130
+
+class SinkConsole(SinkProgresso):
+    """
+    Entrega o progresso do motor ao console (InterfaceUsuario), uma linha por
+    etapa. Usado com PAINEL_TERMINAL=false; o padrão é o PainelTerminal.
+    """
+
+    def log(self, mensagem: str, tipo: str = "info"):
+        InterfaceUsuario.exibir_progresso(mensagem, tipo)
+
+
 class AutomacaoOrdemProducao:
     """
     Classe principal para automação de criação de Ordens de Produção.
     """
     
     def __init__(self):
-        self.db = OracleDatabase()
-        self.api = SankhyaAPI()
+        # Banco e API são criados após a coleta dos parâmetros (importação preguiçosa)
+        self.db = None
+        self.api = None
         self.interface = InterfaceUsuario()
-        
-        self.total_ops_criadas = 0
-        self.total_falhas = 0
-        self.ops_criadas_sucesso = []
-        self.detalhes_falhas = []
+        self.motor: Optional[MotorAutomacao] = None
+
+    def _conectar(self) -> bool:
+        """
+        Cria o banco, a API e o motor de processamento e conecta ao banco.
+        """
+        self.db = criar_database()
+        self.api = criar_api()
+        sink = PainelTerminal() if APP_CONFIG['painel_terminal'] else SinkConsole()
+        self.motor = MotorAutomacao(self.db, self.api, sink)
+        if not self.db.connect() or not self.db.testar_conexao():
+            self.interface.exibir_progresso("Falha na conexão com o banco Oracle. Abortando.", "erro")
+            return False
+        return True
+
+    def _resumo(self) -> Dict[str, Any]:
+        if self.motor is None:
+            return {"total_ops_criadas": 0, "total_falhas": 0, "ops_criadas_sucesso": [], "detalhes_falhas": [], "por_data": {}}
+        return self.motor.obter_resumo()
 
     def verificar_conexoes(self) -> bool:
         self.interface.exibir_progresso("Verificando conexões...", "info")
@@ -45,62 +84,179 @@ class AutomacaoOrdemProducao:
         self.interface.exibir_progresso("Conexão com API Sankhya estabelecida.", "sucesso")
         return True
 
-    def processar_uma_rodada(self, data_planejamento: str, braco: int, rodada_atual: int):
+    def executar_lote(self, datas: List[str], bracos: List[int], rodada_inicial: int,
+                      rodada_final: int) -> Dict[str, Any]:
         """
-        Processa todos os planejamentos de UMA ÚNICA rodada.
+        Modo não interativo: processa todas as combinações de data e braço em
+        uma única sessão (uma conexão com o banco e um token reaproveitado).
+
+        Returns:
+            Dict[str, Any]: Resumo da execução, com o código de saída em 'codigo_saida'.
         """
-        self.interface.exibir_progresso(f"--- Iniciando processamento da Rodada: {rodada_atual} ---", "info")
-        
-        registros = self.db.buscar_planejamentos(data_planejamento, braco, rodada_atual, rodada_atual)
-        
-        if not registros:
-            self.interface.exibir_progresso(f"Nenhum planejamento pendente para a Rodada {rodada_atual}.", "aviso")
-            return
+        inicio = time.perf_counter()
+        resumo: Dict[str, Any] = {
+            "inicio": datetime.now().isoformat(timespec="seconds"),
+            "parametros": {"datas": datas, "bracos": bracos,
+                           "rodada_inicial": rodada_inicial, "rodada_final": rodada_final},
+            "execucoes": [],
+            # O motor zera as retentativas a cada período; aqui elas são somadas.
+            "retentativas": {"agendadas": 0, "recuperadas": 0, "sem_sucesso": 0},
+        }
+        codigo = SAIDA_SUCESSO
+        try:
+            if not self._conectar():
+                codigo = SAIDA_ERRO_FATAL
+                return resumo
 
-        self.interface.exibir_progresso(f"Processando {len(registros)} planejamentos para a Rodada {rodada_atual}...", "info")
-        
-        idiprocs_desta_rodada = []
-        for i, registro in enumerate(registros, 1):
-            self.interface.exibir_progresso(f"  [{i}/{len(registros)}-{rodada_atual}] Processando NUPLAN: {registro['NUPLAN']}...", "info")
-            
-            try:
-                dados_produto_api = {"CODPRODPA": registro['CODPROD'], "IDPROC": 51, "CODPLP": 1, "TAMLOTE": registro['QTDPLAN']}
-                sucesso, idiproc, mensagem = self.api.criar_ordem_producao(dados_produto_api)
-
-                if sucesso and idiproc:
-                    if self.db.atualizar_idiproc(registro['NUPLAN'], idiproc):
-                        self.interface.exibir_progresso(f"    ✅ OP {idiproc} criada e NUPLAN {registro['NUPLAN']} atualizado.", "sucesso")
-                        self.total_ops_criadas += 1
-                        self.ops_criadas_sucesso.append({"nuplan": registro['NUPLAN'], "idiproc": idiproc})
-                        idiprocs_desta_rodada.append(idiproc)
-                    else:
-                        erro_msg = f"OP {idiproc} criada, mas FALHA ao atualizar banco."
-                        self.interface.exibir_progresso(f"    ❌ {erro_msg}", "erro")
-                        self.detalhes_falhas.append({"nuplan": registro['NUPLAN'], "erro": erro_msg})
-                        self.total_falhas += 1
+            # Cada sequência contínua de datas é processada com uma única consulta por braço.
+            for data_inicial, data_final in agrupar_periodos([InterfaceUsuario.para_iso(d) for d in datas]):
+                for braco in bracos:
+                    execucoes = self._executar_periodo(data_inicial, data_final, braco, rodada_inicial, rodada_final)
+                    resumo["execucoes"].extend(execucoes)
+                    for chave, quantidade in self.motor.retentativas.items():
+                        resumo["retentativas"][chave] += quantidade
+                    if any(execucao["abortada"] for execucao in execucoes):
+                        codigo = SAIDA_ERRO_FATAL
+                        return resumo
+        except KeyboardInterrupt:
+            self.interface.exibir_progresso("Operação interrompida pelo usuário.", "aviso")
+            codigo = SAIDA_INTERROMPIDO
+        except Exception as e:
+            logger.error("Erro inesperado no modo lote: %s", e, exc_info=True)
+            self.interface.exibir_progresso(f"Erro inesperado na aplicação: {e}", "erro")
+            resumo["erro"] = str(e)
+            codigo = SAIDA_ERRO_FATAL
+        finally:
+            self.finalizar_conexoes()
+            duracao = time.perf_counter() - inicio
+            totais = self._resumo()
+            if codigo == SAIDA_SUCESSO and totais["total_falhas"]:
+                codigo = SAIDA_FALHAS_PARCIAIS
+            resumo.update({
+                "fim": datetime.now().isoformat(timespec="seconds"),
+                "duracao_s": round(duracao, 2),
+                "total_ops_criadas": totais["total_ops_criadas"],
+                "total_falhas": totais["total_falhas"],
+                "ops_por_minuto": round(totais["total_ops_criadas"] * 60 / duracao, 2) if duracao > 0 else 0.0,
+                "ops_criadas": totais["ops_criadas_sucesso"],
+                "falhas": totais["detalhes_falhas"],
+                "codigo_saida": codigo,
+            })
+        return resumo
+
+    def executar_vigia(self, desde: str, bracos: Optional[List[int]], rodada_inicial: Optional[int],
+                       rodada_final: Optional[int]) -> int:
+        """
+        Modo vigia: processa continuamente os planejamentos novos de AD_PLAN com
+        a mesma conexão e sessão. SIGINT/SIGTERM encerram de forma ordenada (as
+        OPs em voo terminam e os lotes das rodadas abertas são gerados).
+
+        Returns:
+            int: Código de saída.
+        """
+        from vigia import RODADA_MAXIMA, VigiaPlanejamentos
+        try:
+            if not self._conectar():
+                return SAIDA_ERRO_FATAL
+            for sinal in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sinal, lambda *_: self.motor.controle.cancelar())
+            vigia = VigiaPlanejamentos(self.motor, desde, bracos, rodada_inicial or 1, rodada_final or RODADA_MAXIMA)
+            vigia.executar()
+        except Exception as e:
+            logger.error("Erro inesperado no modo vigia: %s", e, exc_info=True)
+            self.interface.exibir_progresso(f"Erro inesperado na aplicação: {e}", "erro")
+            return SAIDA_ERRO_FATAL
+        finally:
+            self.finalizar_conexoes()
+        return SAIDA_FALHAS_PARCIAIS if self.motor.total_falhas else SAIDA_SUCESSO
+
+    def executar_reconciliacao(self, datas: List[str], bracos: List[int], corrigir: bool,
+                               vincular_orfas: bool = False) -> Dict[str, Any]:
+        """
+        Reconcilia AD_PLAN e TPRIPROC para cada combinação de data e braço, apenas
+        com o banco (nenhuma chamada à API Sankhya). Os pares heurísticos de OPs
+        órfãs só são gravados com `vincular_orfas`.
+
+        Returns:
+            Dict[str, Any]: Relatórios por (data, braço), com o código de saída em 'codigo_saida'.
+        """
+        from reconciliacao import reconciliar
+        resumo: Dict[str, Any] = {"inicio": datetime.now().isoformat(timespec="seconds"),
+                                  "parametros": {"datas": datas, "bracos": bracos, "corrigir": corrigir,
+                                                 "vincular_orfas": vincular_orfas},
+                                  "reconciliacoes": []}
+        codigo = SAIDA_SUCESSO
+        try:
+            self.db = criar_database()
+            if not self.db.connect() or not self.db.testar_conexao():
+                self.interface.exibir_progresso("Falha na conexão com o banco Oracle. Abortando.", "erro")
+                codigo = SAIDA_ERRO_FATAL
+                return resumo
+            for data in [InterfaceUsuario.para_iso(d) for d in datas]:
+                for braco in bracos:
+                    relatorio = reconciliar(self.db, data, braco, corrigir, vincular_orfas)
+                    resumo["reconciliacoes"].append(relatorio)
+                    self._exibir_reconciliacao(relatorio)
+                    if not relatorio["sucesso"]:
+                        codigo = SAIDA_ERRO_FATAL
+                        return resumo
+                    if relatorio["pendentes"]:
+                        codigo = SAIDA_FALHAS_PARCIAIS
+        except KeyboardInterrupt:
+            self.interface.exibir_progresso("Operação interrompida pelo usuário.", "aviso")
+            codigo = SAIDA_INTERROMPIDO
+        except Exception as e:
+            logger.error("Erro inesperado na reconciliação: %s", e, exc_info=True)
+            self.interface.exibir_progresso(f"Erro inesperado na aplicação: {e}", "erro")
+            resumo["erro"] = str(e)
+            codigo = SAIDA_ERRO_FATAL
+        finally:
+            self.finalizar_conexoes()
+            resumo.update({"fim": datetime.now().isoformat(timespec="seconds"), "codigo_saida": codigo})
+        return resumo
+
+    def _exibir_reconciliacao(self, relatorio: Dict[str, Any]):
+        titulo = f"Reconciliação da data {relatorio['data']}, braço {relatorio['braco']}"
+        if not relatorio["sucesso"]:
+            self.interface.exibir_progresso(f"{titulo}: {relatorio['erro']}", "erro")
+            # Falha em uma correção: as divergências encontradas continuam no relatório.
+            if "totais" not in relatorio:
+                return
+        self.interface.exibir_progresso(
+            f"{titulo}: {relatorio['total']} divergências, {relatorio['total_corrigido']} corrigidas.",
+            "sucesso" if not relatorio["pendentes"] else "aviso")
+        for categoria, quantidade in relatorio["totais"].items():
+            if quantidade:
+                corrigidos = relatorio["corrigidos"].get(categoria)
+                if corrigidos is None:
+                    sufixo = " (correção manual)"
                 else:
-                    erro_msg = f"Erro ao criar OP: {mensagem}"
-                    self.interface.exibir_progresso(f"    ❌ {erro_msg}", "erro")
-                    self.detalhes_falhas.append({"nuplan": registro['NUPLAN'], "erro": erro_msg})
-                    self.total_falhas += 1
-            except Exception as e:
-                erro_msg = f"Erro inesperado ao processar NUPLAN {registro['NUPLAN']}: {e}"
-                logger.error(erro_msg, exc_info=True)
-                self.interface.exibir_progresso(f"    ❌ {erro_msg}", "erro")
-                self.detalhes_falhas.append({"nuplan": registro['NUPLAN'], "erro": erro_msg})
-                self.total_falhas += 1
-            
-            import time
-            time.sleep(0.5)
+                    sufixo = f" ({corrigidos} corrigidas)" if relatorio["corrigir"] else " (reparável)"
+                self.interface.exibir_progresso(f"  {categoria}: {quantidade}{sufixo}", "info")
 
-        self.interface.exibir_progresso(f"Finalizando a Rodada {rodada_atual}...", "info")
-        if idiprocs_desta_rodada:
-            if self.db.gerar_lote_para_ops(idiprocs_desta_rodada, braco):
-                self.interface.exibir_progresso(f"Lote unificado e braço registrados para a Rodada {rodada_atual}.", "sucesso")
-            else:
-                self.interface.exibir_progresso(f"FALHA ao registrar lote/braço para a Rodada {rodada_atual}.", "erro")
-        else:
-            self.interface.exibir_progresso("Nenhuma OP criada com sucesso nesta rodada, geração de lote ignorada.", "aviso")
+    def _executar_periodo(self, data_inicial: str, data_final: str, braco: int, rodada_inicial: int,
+                          rodada_final: int) -> List[Dict[str, Any]]:
+        """
+        Processa um período contínuo de um braço no modo lote e mede a vazão de cada data.
+        """
+        periodo = data_inicial if data_inicial == data_final else f"{data_inicial} a {data_final}"
+        self.interface.exibir_progresso(
+            f"=== Data {periodo}, Braço {braco}, Rodadas {rodada_inicial} a {rodada_final} ===", "info")
+        self.motor.executar_periodo(data_inicial, data_final, braco, rodada_inicial, rodada_final)
+        execucoes = []
+        for data, resumo_data in self.motor.por_data.items():
+            duracao = resumo_data["duracao_s"]
+            execucoes.append({
+                "data": data,
+                "braco": braco,
+                "pendentes": resumo_data["pendentes"],
+                "ops_criadas": resumo_data["ops_criadas"],
+                "falhas": resumo_data["falhas"],
+                "duracao_s": round(duracao, 2),
+                "ops_por_minuto": round(resumo_data["ops_criadas"] * 60 / duracao, 2) if duracao > 0 else 0.0,
+                "abortada": resumo_data["abortada"],
+            })
+        return execucoes
 
     def finalizar_conexoes(self):
         try:
@@ -109,7 +265,7 @@ class AutomacaoOrdemProducao:
             if self.db: self.db.disconnect()
             self.interface.exibir_progresso("Conexões finalizadas.", "sucesso")
         except Exception as e:
-            logger.error(f"Erro ao finalizar conexões: {e}")
+            logger.error("Erro ao finalizar conexões: %s", e)
 
     # --- MÉTODO EXECUTAR ATUALIZADO COM A LÓGICA DE RE-AUTENTICAÇÃO ---
     def executar(self):
@@ -117,39 +273,34 @@ class AutomacaoOrdemProducao:
         Método principal que orquestra toda a aplicação.
         """
         try:
+            # Importa SQLAlchemy/oracledb/requests enquanto o usuário digita
+            preimportar_backends()
             parametros = self.interface.coletar_parametros()
             if not parametros:
                 self.interface.exibir_progresso("Operação cancelada na coleta de parâmetros.", "aviso")
                 return
             
-            data_planejamento, braco, rodada_inicial, rodada_final = parametros
+            data_inicial, data_final, braco, rodada_inicial, rodada_final = parametros
+            # O banco recebe as datas no formato YYYY-MM-DD.
+            data_inicial = InterfaceUsuario.para_iso(data_inicial)
+            data_final = InterfaceUsuario.para_iso(data_final)
             print()
 
             # A verificação de conexão com o banco é feita uma vez.
-            if not self.db.connect() or not self.db.testar_conexao():
-                self.interface.exibir_progresso("Falha na conexão com o banco Oracle. Abortando.", "erro")
+            if not self._conectar():
                 return
             
             print()
 
-            total_a_processar = self.db.contar_planejamentos_pendentes(data_planejamento, braco, rodada_inicial, rodada_final)
+            # O período inteiro é contado em uma consulta, reaproveitada pelo motor via cache.
+            pendentes = self.db.contar_planejamentos_por_data_rodada(data_inicial, data_final, braco, rodada_inicial, rodada_final)
+            total_a_processar = sum(sum(por_rodada.values()) for por_rodada in pendentes.values())
 
             if total_a_processar == 0:
                 self.interface.exibir_progresso("Nenhum planejamento pendente encontrado para o range de rodadas informado.", "aviso")
             else:
                 if self.interface.confirmar_continuacao(f"Encontrados {total_a_processar} planejamentos no total. Deseja processar todos?"):
-                    # Loop principal que itera sobre cada rodada
-                    for rodada in range(rodada_inicial, rodada_final + 1):
-                        # --- MELHORIA ADICIONADA AQUI ---
-                        # Inicia uma nova sessão da API para cada rodada
-                        self.interface.exibir_progresso(f"Iniciando nova sessão na API para a Rodada {rodada}...", "info")
-                        if not self.api.autenticar():
-                            self.interface.exibir_progresso(f"Falha ao re-autenticar para a Rodada {rodada}. Abortando processo.", "erro")
-                            break # Interrompe o loop principal se a autenticação falhar
-
-                        # Chama o método que processa a rodada com a sessão nova
-                        self.processar_uma_rodada(data_planejamento, braco, rodada)
-                        print() # Adiciona espaço entre o processamento de cada rodada
+                    self.motor.executar_periodo(data_inicial, data_final, braco, rodada_inicial, rodada_final)
                 else:
                     self.interface.exibir_progresso("Processamento cancelado pelo usuário.", "aviso")
 
@@ -163,25 +314,136 @@ class AutomacaoOrdemProducao:
             self.interface.exibir_progresso(erro_msg, "erro")
         finally:
             self.finalizar_conexoes()
+            totais = self._resumo()
             self.interface.exibir_resumo_final(
-                self.total_ops_criadas, 
-                self.total_falhas,
-                self.ops_criadas_sucesso,
-                self.detalhes_falhas
+                totais["total_ops_criadas"],
+                totais["total_falhas"],
+                totais["ops_criadas_sucesso"],
+                totais["detalhes_falhas"]
             )
 
-# ... (função main() continua igual) ...
-def main():
+def _tipo_datas(texto: str) -> List[str]:
+    try:
+        return InterfaceUsuario.expandir_datas(texto)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"datas inválidas ({e}); use DD/MM/YYYY, listas com ',' e intervalos com ':'")
+
+
+def _tipo_numeros(texto: str) -> List[int]:
+    try:
+        return InterfaceUsuario.expandir_numeros(texto)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"valor inválido ({e}); use números positivos, listas com ',' e intervalos com '-'")
+
+
+def _analisar_argumentos(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Automação de Ordens de Produção no Sankhya. Sem argumentos, abre o modo interativo.")
+    parser.add_argument("--datas", type=_tipo_datas,
+                        help="Datas de planejamento, ex.: 20/07/2025,22/07/2025:24/07/2025")
+    parser.add_argument("--bracos", type=_tipo_numeros, help="Braços de produção, ex.: 1,3-4")
+    parser.add_argument("--rodadas", type=_tipo_numeros, help="Rodadas a processar, ex.: 1-5")
+    parser.add_argument("--vigiar", action="store_true",
+                        help="Modo vigia: processa continuamente os planejamentos novos (--bracos e --rodadas opcionais)")
+    parser.add_argument("--desde", type=_tipo_datas,
+                        help="Modo vigia: considera planejamentos a partir desta data (padrão: hoje)")
+    parser.add_argument("--reconciliar", action="store_true",
+                        help="Reconcilia AD_PLAN e TPRIPROC das datas e braços informados (--datas e --bracos)")
+    parser.add_argument("--somente-relatorio", action="store_true",
+                        help="Reconciliação: apenas relata as divergências, sem corrigir")
+    parser.add_argument("--vincular-orfas", action="store_true",
+                        help="Reconciliação: grava também o IDIPROC das OPs órfãs pareadas por produto e "
+                             "quantidade (heurístico; confira o relatório antes)")
+    parser.add_argument("--resumo-json", metavar="ARQUIVO",
+                        help="Grava o resumo JSON da execução no arquivo ('-' para stdout)")
+    args = parser.parse_args(argv)
+
+    informados = [args.datas is not None, args.bracos is not None, args.rodadas is not None]
+    if (args.somente_relatorio or args.vincular_orfas) and not args.reconciliar:
+        parser.error("--somente-relatorio e --vincular-orfas só valem com --reconciliar")
+    if args.somente_relatorio and args.vincular_orfas:
+        parser.error("--vincular-orfas não combina com --somente-relatorio")
+    if args.reconciliar:
+        if args.vigiar or args.desde is not None or args.rodadas is not None:
+            parser.error("a reconciliação não aceita --vigiar, --desde nem --rodadas")
+        if args.datas is None or args.bracos is None:
+            parser.error("a reconciliação exige --datas e --bracos")
+    elif args.vigiar:
+        if args.datas is not None or args.resumo_json:
+            parser.error("o modo vigia não aceita --datas nem --resumo-json (use --desde)")
+    elif args.desde is not None:
+        parser.error("--desde só vale no modo vigia (--vigiar)")
+    elif any(informados) and not all(informados):
+        parser.error("o modo lote exige --datas, --bracos e --rodadas")
+    if args.desde is not None and len(args.desde) != 1:
+        parser.error("--desde aceita uma única data")
+    if args.rodadas and args.rodadas != list(range(min(args.rodadas), max(args.rodadas) + 1)):
+        parser.error("--rodadas deve ser um intervalo contínuo (ex.: 1-5)")
+    return args
+
+
+def executar_modo_lote(args: argparse.Namespace) -> int:
+    """
+    Executa o modo não interativo e publica o resumo JSON. Retorna o código de saída.
+    """
+    resumo_no_stdout = args.resumo_json == "-"
+    if resumo_no_stdout:
+        InterfaceUsuario.arquivo_progresso = sys.stderr
+
+    app = AutomacaoOrdemProducao()
+    resumo = app.executar_lote(args.datas, args.bracos, min(args.rodadas), max(args.rodadas))
+
+    texto = json.dumps(resumo, ensure_ascii=False, indent=2, default=str)
+    if resumo_no_stdout:
+        print(texto)
+    else:
+        if args.resumo_json:
+            with open(args.resumo_json, 'w', encoding='utf-8') as f:
+                f.write(texto)
+        app.interface.exibir_resumo_final(resumo["total_ops_criadas"], resumo["total_falhas"],
+                                          resumo["ops_criadas"], resumo["falhas"])
+    return resumo["codigo_saida"]
+
+
+def executar_modo_reconciliacao(args: argparse.Namespace) -> int:
+    """
+    Executa a reconciliação e publica o relatório JSON. Retorna o código de saída.
+    """
+    if args.resumo_json == "-":
+        InterfaceUsuario.arquivo_progresso = sys.stderr
+    resumo = AutomacaoOrdemProducao().executar_reconciliacao(args.datas, args.bracos, not args.somente_relatorio,
+                                                             args.vincular_orfas)
+    if args.resumo_json:
+        texto = json.dumps(resumo, ensure_ascii=False, indent=2, default=str)
+        if args.resumo_json == "-":
+            print(texto)
+        else:
+            with open(args.resumo_json, 'w', encoding='utf-8') as f:
+                f.write(texto)
+    return resumo["codigo_saida"]
+
+
+def main(argv: Optional[List[str]] = None):
     """
     Função principal da aplicação.
     """
+    configurar_logging('sankhya_op_automation.log', console=False)
+    args = _analisar_argumentos(argv)
     try:
+        if args.reconciliar:
+            sys.exit(executar_modo_reconciliacao(args))
+        if args.vigiar:
+            desde = InterfaceUsuario.para_iso(args.desde[0]) if args.desde else datetime.now().strftime("%Y-%m-%d")
+            rodadas = args.rodadas or [None]
+            sys.exit(AutomacaoOrdemProducao().executar_vigia(desde, args.bracos, rodadas[0], rodadas[-1]))
+        if args.datas is not None:
+            sys.exit(executar_modo_lote(args))
         app = AutomacaoOrdemProducao()
         app.executar()
     except Exception as e:
         print(f"❌ Erro crítico na aplicação: {e}")
-        logger.critical(f"Erro crítico na aplicação: {e}", exc_info=True)
-        sys.exit(1)
+        logger.critical("Erro crítico na aplicação: %s", e, exc_info=True)
+        sys.exit(SAIDA_ERRO_FATAL if args.datas is not None or args.vigiar else 1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
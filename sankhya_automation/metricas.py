@@ -0,0 +1,307 @@
+"""
+Módulo de métricas em processo para a automação de Ordens de Produção.
+Mantém histogramas de latência e contadores de erro rotulados por serviço da
+API Sankhya ou por comando SQL, e os exporta no formato texto do Prometheus.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from rastreamento import span
+
+# Limites (em segundos) dos buckets dos histogramas de latência.
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _formatar_rotulos(nomes: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class Contador:
+    """
+    Contador monotônico rotulado.
+    """
+
+    def __init__(self, nome: str, descricao: str, rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *valores_rotulos: str, valor: float = 1.0):
+        with self._lock:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0.0) + valor
+
+    def valor(self, *valores_rotulos: str) -> float:
+        with self._lock:
+            return self._valores.get(valores_rotulos, 0.0)
+
+    def renderizar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            itens = sorted(self._valores.items())
+        for valores_rotulos, valor in itens:
+            linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, valores_rotulos)} {valor:g}")
+        return linhas
+
+
+class Medidor:
+    """
+    Valor instantâneo (gauge) rotulado.
+    """
+
+    def __init__(self, nome: str, descricao: str, rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def definir(self, valor: float, *valores_rotulos: str):
+        with self._lock:
+            self._valores[valores_rotulos] = valor
+
+    def definir_se_ausente(self, valor: float, *valores_rotulos: str) -> bool:
+        with self._lock:
+            if valores_rotulos in self._valores:
+                return False
+            self._valores[valores_rotulos] = valor
+            return True
+
+    def valor(self, *valores_rotulos: str) -> Optional[float]:
+        with self._lock:
+            return self._valores.get(valores_rotulos)
+
+    def renderizar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} gauge"]
+        with self._lock:
+            itens = sorted(self._valores.items())
+        for valores_rotulos, valor in itens:
+            linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, valores_rotulos)} {valor:g}")
+        return linhas
+
+
+class Histograma:
+    """
+    Histograma de latência rotulado com buckets fixos.
+    Cada observação custa uma busca binária e um incremento sob lock.
+    """
+
+    def __init__(self, nome: str, descricao: str, rotulos: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = BUCKETS_PADRAO):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self.buckets = tuple(sorted(buckets))
+        # Para cada combinação de rótulos: [contagens por bucket (+Inf no fim), soma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, segundos: float, *valores_rotulos: str):
+        indice = bisect.bisect_left(self.buckets, segundos)
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[valores_rotulos] = serie
+            serie[0][indice] += 1
+            serie[1] += segundos
+            serie[2] += 1
+
+    def resumo(self, *valores_rotulos: str) -> Optional[Dict[str, float]]:
+        """
+        Retorna contagem, soma, média e percentis aproximados (p50/p95) de uma série.
+        """
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                return None
+            contagens, soma, total = list(serie[0]), serie[1], serie[2]
+        if total == 0:
+            return None
+        return {
+            "contagem": total,
+            "soma": soma,
+            "media": soma / total,
+            "p50": self._percentil(contagens, total, 0.50),
+            "p95": self._percentil(contagens, total, 0.95),
+        }
+
+    def instantaneo(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """
+        Retorna (contagem, soma) de cada série, para cálculo de deltas por execução.
+        """
+        with self._lock:
+            return {k: (v[2], v[1]) for k, v in self._series.items()}
+
+    def contagens(self) -> Dict[Tuple[str, ...], List[int]]:
+        """
+        Retorna as contagens por bucket de cada série; a diferença entre duas
+        leituras dá o histograma de uma janela de tempo (ver percentil).
+        """
+        with self._lock:
+            return {k: list(v[0]) for k, v in self._series.items()}
+
+    def percentil(self, contagens: List[int], q: float) -> Optional[float]:
+        """
+        Percentil aproximado (limite superior do bucket) de contagens por bucket.
+        """
+        total = sum(contagens)
+        return self._percentil(contagens, total, q) if total else None
+
+    def series(self) -> List[Tuple[str, ...]]:
+        with self._lock:
+            return list(self._series.keys())
+
+    def _percentil(self, contagens: List[int], total: int, q: float) -> float:
+        alvo = q * total
+        acumulado = 0
+        for indice, contagem in enumerate(contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return self.buckets[indice] if indice < len(self.buckets) else self.buckets[-1]
+        return self.buckets[-1]
+
+    def renderizar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            itens = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for valores_rotulos, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, valores_rotulos, f'le="{limite:g}"')
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _formatar_rotulos(self.rotulos, valores_rotulos, 'le="+Inf"')
+            linhas.append(f"{self.nome}_bucket{rotulos} {total}")
+            rotulos = _formatar_rotulos(self.rotulos, valores_rotulos)
+            linhas.append(f"{self.nome}_sum{rotulos} {soma:.6f}")
+            linhas.append(f"{self.nome}_count{rotulos} {total}")
+        return linhas
+
+
+_REGISTRO: List[object] = []
+
+# Instante de início do processo, referência para as métricas de partida.
+INICIO_PROCESSO = time.monotonic()
+
+
+def _registrar(metrica):
+    _REGISTRO.append(metrica)
+    return metrica
+
+
+def renderizar_prometheus() -> str:
+    """
+    Gera o texto de exposição (formato Prometheus 0.0.4) de todas as métricas registradas.
+    """
+    linhas: List[str] = []
+    for metrica in _REGISTRO:
+        linhas.extend(metrica.renderizar())
+    return "\n".join(linhas) + "\n"
+
+
+# --- MÉTRICAS DA APLICAÇÃO ---
+API_LATENCIA = _registrar(Histograma(
+    "sankhya_api_request_duration_seconds",
+    "Latência das chamadas à API Sankhya por serviço.",
+    ("service",)))
+API_ERROS = _registrar(Contador(
+    "sankhya_api_errors_total",
+    "Erros nas chamadas à API Sankhya por serviço e tipo de erro.",
+    ("service", "tipo")))
+SQL_LATENCIA = _registrar(Histograma(
+    "oracle_statement_duration_seconds",
+    "Latência dos comandos executados no Oracle por comando.",
+    ("statement",)))
+SQL_ERROS = _registrar(Contador(
+    "oracle_statement_errors_total",
+    "Erros nos comandos executados no Oracle por comando.",
+    ("statement",)))
+
+AQUECIMENTO_DURACAO = _registrar(Medidor(
+    "sankhya_aquecimento_duration_seconds",
+    "Duração do aquecimento (pool do banco e token da API) na partida."))
+TEMPO_ATE_PRIMEIRA_OP = _registrar(Medidor(
+    "sankhya_tempo_ate_primeira_op_seconds",
+    "Tempo entre a partida do processo e a primeira OP criada."))
+CONEXAO_OK = _registrar(Medidor(
+    "sankhya_conexao_ok",
+    "Resultado da última sonda de saúde (1 = ok) por alvo.",
+    ("alvo",)))
+DISJUNTOR_ESTADO = _registrar(Medidor(
+    "sankhya_circuit_breaker_state",
+    "Estado do disjuntor (0 = fechado, 1 = meio aberto, 2 = aberto) por serviço.",
+    ("disjuntor",)))
+DISJUNTOR_ABERTURAS = _registrar(Contador(
+    "sankhya_circuit_breaker_open_total",
+    "Quantidade de aberturas do disjuntor por serviço.",
+    ("disjuntor",)))
+SESSAO_OPS = _registrar(Contador(
+    "sankhya_session_ops_total",
+    "OPs processadas por sessão do pool da API Sankhya e resultado.",
+    ("sessao", "resultado")))
+SESSAO_DURACAO = _registrar(Histograma(
+    "sankhya_session_op_duration_seconds",
+    "Duração da criação de uma OP por sessão do pool da API Sankhya.",
+    ("sessao",)))
+SESSAO_EM_USO = _registrar(Medidor(
+    "sankhya_session_in_use",
+    "OPs em andamento em cada sessão do pool da API Sankhya.",
+    ("sessao",)))
+SESSAO_ESPERA = _registrar(Histograma(
+    "sankhya_session_lease_wait_seconds",
+    "Espera por uma sessão livre no pool da API Sankhya."))
+
+
+def registrar_primeira_op() -> Optional[float]:
+    """
+    Registra o tempo até a primeira OP do processo; retorna o valor só na primeira chamada.
+    """
+    segundos = time.monotonic() - INICIO_PROCESSO
+    return segundos if TEMPO_ATE_PRIMEIRA_OP.definir_se_ausente(segundos) else None
+
+
+@contextmanager
+def medir_api(service_name: str):
+    """
+    Cronometra uma chamada à API Sankhya. Exceções são contadas e propagadas.
+    Dentro de um trace ativo, abre também um span filho para a chamada.
+    """
+    inicio = time.perf_counter()
+    try:
+        with span(f"api {service_name}", service=service_name):
+            yield
+    except Exception as e:
+        API_ERROS.incrementar(service_name, type(e).__name__)
+        raise
+    finally:
+        API_LATENCIA.observar(time.perf_counter() - inicio, service_name)
+
+
+@contextmanager
+def medir_sql(statement: str):
+    """
+    Cronometra um comando no Oracle. Exceções são contadas e propagadas.
+    Dentro de um trace ativo, abre também um span filho para o comando.
+    """
+    inicio = time.perf_counter()
+    try:
+        with span(f"sql {statement}", statement=statement):
+            yield
+    except Exception:
+        SQL_ERROS.incrementar(statement)
+        raise
+    finally:
+        SQL_LATENCIA.observar(time.perf_counter() - inicio, statement)
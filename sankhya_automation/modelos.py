@@ -0,0 +1,44 @@
+"""
+Tipos de registro e utilitários de data compartilhados entre o acesso ao banco
+e a orquestração.
+Não depende de SQLAlchemy nem do driver Oracle, para poder ser usado pelos mocks.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Planejamento:
+    """
+    Registro pendente da tabela AD_PLAN (imutável e sem __dict__ por instância).
+    """
+    NUPLAN: int
+    CODPROD: int
+    QTDPLAN: float
+    RODADA: int
+    DATA: Optional[str] = None  # data do planejamento (YYYY-MM-DD)
+    BRACO: Optional[int] = None  # preenchido apenas nas consultas de vários braços (modo vigia)
+
+
+def datas_do_periodo(data_inicial: str, data_final: str) -> List[str]:
+    """
+    Lista as datas (YYYY-MM-DD) de data_inicial a data_final, inclusive.
+    """
+    inicio = date.fromisoformat(data_inicial)
+    fim = date.fromisoformat(data_final)
+    return [(inicio + timedelta(days=i)).isoformat() for i in range((fim - inicio).days + 1)]
+
+
+def agrupar_periodos(datas: List[str]) -> List[Tuple[str, str]]:
+    """
+    Agrupa datas (YYYY-MM-DD) em períodos contínuos (data_inicial, data_final).
+    """
+    periodos: List[Tuple[str, str]] = []
+    for data in sorted(set(datas)):
+        if periodos and date.fromisoformat(data) - date.fromisoformat(periodos[-1][1]) == timedelta(days=1):
+            periodos[-1] = (periodos[-1][0], data)
+        else:
+            periodos.append((data, data))
+    return periodos
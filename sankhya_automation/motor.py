@@ -0,0 +1,683 @@
+"""
+Motor de orquestração da automação de Ordens de Produção.
+Concentra o caminho de processamento usado pela CLI e pela aplicação web:
+contagem e busca em streaming do período, criação das OPs (com concorrência
+configurável), gravação do IDIPROC, geração do lote por (data, braço, rodada)
+e gravação do NROLOTE em AD_PLAN. O progresso é entregue a um "sink"
+plugável (console, Socket.IO, ...) e a execução pode ser pausada, retomada,
+cancelada e reajustada (concorrência e taxa) enquanto roda. Falhas
+transitórias da API são reprocessadas na mesma sessão, com backoff, antes do
+lote da rodada. O modo vigia usa o mesmo motor para microlotes
+(processar_registros e gerar_lote).
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from config import APP_CONFIG
+from historico_execucoes import historico_execucoes, resumir_latencias
+from metricas import registrar_primeira_op
+from modelos import Planejamento
+from planejador import historico, InstantaneoLatencias
+from rastreamento import span, definir_atributo
+from resiliencia import coletar_falhas, disjuntor_api, FECHADO, TRANSITORIA
+from telemetria import TelemetriaExecucao
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros fixos do lançamento de OP.
+IDPROC_PADRAO = 51
+CODPLP_PADRAO = 1
+
+# Categorias de falha por registro (gravadas no histórico de execuções).
+FALHA_API = "api"
+FALHA_BANCO = "banco"
+FALHA_INESPERADA = "inesperada"
+
+EXECUTANDO = "executando"
+PAUSADO = "pausado"
+CANCELANDO = "cancelando"
+
+
+class SinkProgresso:
+    """
+    Destino dos eventos de progresso do motor. As implementações sobrescrevem
+    apenas o que precisam; os métodos são chamados pela thread do motor (exceto telemetria).
+
+    Tipos de mensagem: 'info', 'sucesso', 'aviso' e 'erro'.
+    """
+
+    def log(self, mensagem: str, tipo: str = "info"):
+        pass
+
+    def contadores(self, ops_criadas: int, falhas: int, rodada: Optional[int]):
+        pass
+
+    def progresso(self, processados: int, total: int):
+        pass
+
+    def telemetria(self, dados: Dict[str, Any]):
+        """Vazão, ETA, OPs em voo e p95 por etapa; chamado pela thread da telemetria, em cadência fixa."""
+        pass
+
+    def concluir(self):
+        """Fim de uma execução (ou do modo vigia), depois da última telemetria."""
+        pass
+
+
+class ControleExecucao:
+    """
+    Controle cooperativo de uma execução: pausa, retomada e cancelamento valem
+    na fronteira entre registros (as OPs já enviadas terminam e o lote das OPs
+    criadas é gerado); concorrência e taxa de OPs podem ser ajustadas a quente.
+    """
+
+    def __init__(self, concorrencia: int, ops_por_minuto: float = 0.0, concorrencia_maxima: Optional[int] = None):
+        self.concorrencia_maxima = max(1, concorrencia_maxima or APP_CONFIG['max_workers_limite'])
+        self.concorrencia = min(max(1, concorrencia), self.concorrencia_maxima)
+        self.ops_por_minuto = max(0.0, ops_por_minuto)
+        self.cancelado = threading.Event()
+        self._liberado = threading.Event()
+        self._liberado.set()
+        self._proxima_liberacao = 0.0
+        self._ouvintes: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+
+    def reiniciar(self):
+        """
+        Prepara o controle para uma nova execução (mantém concorrência e taxa ajustadas).
+        """
+        self.cancelado.clear()
+        self._liberado.set()
+        self._proxima_liberacao = 0.0
+
+    @property
+    def pausado(self) -> bool:
+        return not self._liberado.is_set()
+
+    def pausar(self):
+        self._liberado.clear()
+        self._notificar()
+
+    def retomar(self):
+        self._liberado.set()
+        self._notificar()
+
+    def cancelar(self):
+        self.cancelado.set()
+        # Acorda uma execução pausada para que ela possa encerrar.
+        self._liberado.set()
+        self._notificar()
+
+    def ajustar(self, concorrencia: Optional[int] = None, ops_por_minuto: Optional[float] = None):
+        """
+        Raises:
+            ValueError: Se a concorrência estiver fora de 1..concorrencia_maxima ou a taxa for negativa.
+        """
+        if concorrencia is not None and not 1 <= int(concorrencia) <= self.concorrencia_maxima:
+            raise ValueError(f"A concorrência deve estar entre 1 e {self.concorrencia_maxima}.")
+        if ops_por_minuto is not None and float(ops_por_minuto) < 0:
+            raise ValueError("A taxa de OPs por minuto não pode ser negativa (0 = sem limite).")
+        with self._lock:
+            if concorrencia is not None:
+                self.concorrencia = int(concorrencia)
+            if ops_por_minuto is not None:
+                self.ops_por_minuto = float(ops_por_minuto)
+        self._notificar()
+
+    def aguardar_liberacao(self) -> bool:
+        """
+        Bloqueia enquanto a execução estiver pausada e, com taxa limitada, até a
+        próxima OP poder ser enviada. Retorna False se a execução foi cancelada.
+        """
+        self._liberado.wait()
+        while True:
+            if self.cancelado.is_set():
+                return False
+            with self._lock:
+                agora = time.monotonic()
+                espera = self._proxima_liberacao - agora
+                if espera <= 0:
+                    intervalo = 60.0 / self.ops_por_minuto if self.ops_por_minuto else 0.0
+                    self._proxima_liberacao = max(agora, self._proxima_liberacao) + intervalo
+                    return True
+            # Espera interrompível por cancelamento; a taxa pode ter mudado ao acordar.
+            self.cancelado.wait(min(espera, 1.0))
+            self._liberado.wait()
+
+    def adicionar_ouvinte(self, ouvinte: Callable[[Dict[str, Any]], None]):
+        """
+        Registra uma função chamada (com o estado) a cada comando recebido.
+        """
+        self._ouvintes.append(ouvinte)
+
+    def _notificar(self):
+        estado = self.estado()
+        for ouvinte in list(self._ouvintes):
+            try:
+                ouvinte(estado)
+            except Exception as e:
+                logger.error("Erro ao notificar mudança do controle da execução: %s", e)
+
+    def estado(self) -> Dict[str, Any]:
+        situacao = CANCELANDO if self.cancelado.is_set() else PAUSADO if self.pausado else EXECUTANDO
+        return {"estado": situacao, "concorrencia": self.concorrencia,
+                "concorrencia_maxima": self.concorrencia_maxima, "ops_por_minuto": self.ops_por_minuto}
+
+
+@dataclass(frozen=True, slots=True)
+class ResultadoRegistro:
+    """
+    Resultado do processamento de um planejamento.
+    """
+    registro: Planejamento
+    data: str
+    idiproc: Optional[int]
+    erro: Optional[str]
+    categoria: Optional[str] = None
+    transitoria: bool = False
+    tentativa: int = 1
+
+
+@dataclass(slots=True)
+class Retentativa:
+    """
+    Falha transitória aguardando nova tentativa na fila da rodada.
+    """
+    pronto_em: float
+    resultado: ResultadoRegistro
+
+
+class MotorAutomacao:
+    """
+    Executa a automação de um período (datas, braço e range de rodadas).
+
+    Os totais (OPs criadas, falhas e listas de detalhes) acumulam entre
+    execuções da mesma instância; o resumo por data, as falhas por categoria e
+    as retentativas são da última execução, que também é gravada no histórico
+    de execuções.
+    """
+
+    def __init__(self, db, api, sink: Optional[SinkProgresso] = None, concorrencia: Optional[int] = None,
+                 origem: str = "cli"):
+        self.db = db
+        self.api = api
+        self.sink = sink or SinkProgresso()
+        self.origem = origem
+        self.controle = ControleExecucao(concorrencia or APP_CONFIG['max_workers'], APP_CONFIG['ops_por_minuto'])
+        self.telemetria = TelemetriaExecucao()
+        self.cancelado = False
+
+        self.total_ops_criadas = 0
+        self.total_falhas = 0
+        self.ops_criadas_sucesso: List[Dict[str, Any]] = []
+        self.detalhes_falhas: List[Dict[str, Any]] = []
+        self.por_data: Dict[str, Dict[str, Any]] = {}
+        self.falhas_por_categoria: Dict[str, int] = {}
+        self.retentativas = self._novo_resumo_retentativas()
+        self._retentativas: List[Retentativa] = []
+        self._descartando_retentativas = False
+        self.registros_processados = 0
+        self.total_registros = 0
+        self.rodada_atual: Optional[int] = None
+
+        # A conexão do banco não é thread-safe: workers e motor a usam sob este lock.
+        self._lock_db = threading.Lock()
+
+    # --- EXECUÇÃO ---
+    def executar_periodo(self, data_inicial: str, data_final: str, braco: int, rodada_inicial: int,
+                         rodada_final: int, trace_id: Optional[str] = None) -> bool:
+        """
+        Processa os planejamentos pendentes de data_inicial a data_final (YYYY-MM-DD).
+
+        Args:
+            trace_id (Optional[str]): Quando informado, a execução é registrada como um trace.
+
+        Returns:
+            bool: False se o processamento foi abortado (falha de autenticação) ou cancelado.
+        """
+        self.controle.reiniciar()
+        self.cancelado = False
+        self.por_data, self.falhas_por_categoria = {}, {}
+        self.retentativas = self._novo_resumo_retentativas()
+        self.total_registros = self.registros_processados = 0
+        latencias_inicio = InstantaneoLatencias()
+        inicio, cronometro = datetime.now(), time.perf_counter()
+        status = "erro"
+        self.telemetria.iniciar(self.sink.telemetria)
+        try:
+            with span("automacao", trace_id=trace_id, data_planejamento=data_inicial, data_final=data_final,
+                      braco=braco, rodada_inicial=rodada_inicial, rodada_final=rodada_final):
+                concluida = self._executar_periodo(data_inicial, data_final, braco, rodada_inicial, rodada_final)
+            status = "concluida" if concluida else "cancelada" if self.cancelado else "abortada"
+            return concluida
+        finally:
+            self.telemetria.parar()
+            self.sink.concluir()
+            historico.registrar_execucao(latencias_inicio)
+            duracao = time.perf_counter() - cronometro
+            ops_criadas = sum(resumo["ops_criadas"] for resumo in self.por_data.values())
+            historico_execucoes.registrar({
+                "job_id": trace_id, "origem": self.origem,
+                "inicio": inicio.isoformat(timespec="seconds"),
+                "fim": datetime.now().isoformat(timespec="seconds"),
+                "duracao_s": round(duracao, 3),
+                "parametros": {"data_inicial": data_inicial, "data_final": data_final, "braco": braco,
+                               "rodada_inicial": rodada_inicial, "rodada_final": rodada_final,
+                               "concorrencia": self.controle.concorrencia},
+                "status": status,
+                "pendentes": self.total_registros,
+                "processados": self.registros_processados,
+                "ops_criadas": ops_criadas,
+                "falhas": sum(resumo["falhas"] for resumo in self.por_data.values()),
+                "ops_por_segundo": round(ops_criadas / duracao, 4) if duracao > 0 else 0.0,
+                "falhas_por_categoria": self.falhas_por_categoria,
+                "latencias": resumir_latencias(latencias_inicio.deltas()),
+            })
+
+    def _executar_periodo(self, data_inicial: str, data_final: str, braco: int, rodada_inicial: int,
+                          rodada_final: int) -> bool:
+        pendentes = self.db.contar_planejamentos_por_data_rodada(data_inicial, data_final, braco, rodada_inicial, rodada_final)
+        self.total_registros = sum(sum(por_rodada.values()) for por_rodada in pendentes.values())
+        self.telemetria.definir_total(self.total_registros)
+        self.por_data = {data: self._novo_resumo_data(sum(por_rodada.values())) for data, por_rodada in pendentes.items()}
+
+        self.sink.log(f"Total de {self.total_registros} planejamentos a serem processados.", "info")
+        if len(pendentes) > 1:
+            for data, resumo_data in self.por_data.items():
+                self.sink.log(f"  Data {data}: {resumo_data['pendentes']} planejamentos pendentes.", "info")
+        self.sink.progresso(0, self.total_registros)
+        if not self.total_registros:
+            self.sink.log("Nenhum planejamento pendente no período informado.", "aviso")
+            return True
+
+        try:
+            return self._processar_stream(data_inicial, data_final, braco, rodada_inicial, rodada_final, pendentes)
+        finally:
+            if len(self.por_data) > 1:
+                for data, resumo_data in self.por_data.items():
+                    self.sink.log(f"Data {data}: {resumo_data['ops_criadas']} OPs criadas, {resumo_data['falhas']} falhas.", "info")
+
+    def _processar_stream(self, data_inicial: str, data_final: str, braco: int, rodada_inicial: int,
+                          rodada_final: int, pendentes: Dict[str, Dict[int, int]]) -> bool:
+        # Os registros do período inteiro chegam de um único cursor, ordenados por
+        # data, rodada e NUPLAN; cada (data, rodada) é um grupo com o seu lote.
+        grupo: Optional[Tuple[str, int]] = None
+        pilha_span = ExitStack()
+        # O pool é criado com o limite de concorrência; as threads só nascem sob demanda
+        # e o número de OPs em voo segue o valor atual do controle.
+        executor: Optional[ThreadPoolExecutor] = None
+        em_voo: Set[Future] = set()
+        idiprocs_do_grupo: List[int] = []
+        nuplan_por_idiproc: Dict[int, Any] = {}
+        inicio_grupo = time.perf_counter()
+        indice = 0
+
+        def registrar(resultado: ResultadoRegistro):
+            if not self._adiar(resultado):
+                self._registrar_resultado(resultado, idiprocs_do_grupo, nuplan_por_idiproc)
+
+        def concluir(resultados: Set[Future]):
+            for futuro in resultados:
+                registrar(futuro.result())
+
+        def drenar(limite: int = 0):
+            # Aguarda até restarem no máximo `limite` OPs em voo.
+            nonlocal em_voo
+            while len(em_voo) > limite:
+                concluidos, em_voo = wait(em_voo, return_when=FIRST_COMPLETED)
+                concluir(concluidos)
+
+        def fechar_grupo():
+            # Todas as OPs da (data, rodada), inclusive as retentativas, precisam estar concluídas antes do lote.
+            drenar()
+            self._drenar_retentativas(registrar)
+            data, rodada = grupo
+            self._gerar_lote(data, rodada, braco, idiprocs_do_grupo, nuplan_por_idiproc)
+            self.por_data[data]["duracao_s"] += time.perf_counter() - inicio_grupo
+            pilha_span.close()
+
+        # A leitura usa uma conexão própria (não a dos workers), então não passa pelo _lock_db.
+        iterador = iter(self.db.iterar_planejamentos(data_inicial, braco, rodada_inicial, rodada_final,
+                                                     data_final=data_final))
+        erro_leitura: Optional[Exception] = None
+        try:
+            while True:
+                try:
+                    lote_registros = next(iterador, None)
+                except Exception as e:
+                    erro_leitura = e
+                    break
+                if lote_registros is None:
+                    break
+                for registro in lote_registros:
+                    if self.controle.pausado:
+                        # Contadores em dia enquanto a execução estiver parada.
+                        drenar()
+                        self.sink.log("⏸️ Processamento pausado.", "aviso")
+                    if not self.controle.aguardar_liberacao() or not self._aguardar_disjuntor():
+                        self.cancelado = True
+                        break
+                    data = registro.DATA or data_inicial
+                    if (data, registro.RODADA) != grupo:
+                        if grupo is not None:
+                            fechar_grupo()
+                        grupo = (data, registro.RODADA)
+                        idiprocs_do_grupo, nuplan_por_idiproc = [], {}
+                        indice, inicio_grupo = 0, time.perf_counter()
+                        self.por_data.setdefault(data, self._novo_resumo_data(0))
+                        pilha_span.enter_context(span("rodada", data=data, rodada=registro.RODADA))
+                        if not self._iniciar_grupo(data, registro.RODADA):
+                            self.por_data[data]["abortada"] = True
+                            return False
+
+                    indice += 1
+                    total_do_grupo = pendentes.get(data, {}).get(registro.RODADA, indice)
+                    self.sink.log(f"  [{indice}/{total_do_grupo}-{registro.RODADA}] Processando NUPLAN: {registro.NUPLAN}...", "info")
+                    concorrencia = self.controle.concorrencia
+                    drenar(concorrencia - 1)
+                    if concorrencia == 1:
+                        registrar(self._processar_registro(registro, data))
+                        continue
+                    if executor is None:
+                        executor = ThreadPoolExecutor(self.controle.concorrencia_maxima, thread_name_prefix="op")
+                    # Cada tarefa herda o contexto atual (span da rodada como pai).
+                    contexto = contextvars.copy_context()
+                    em_voo.add(executor.submit(contexto.run, self._processar_registro, registro, data))
+                if self.cancelado:
+                    break
+
+            if grupo is not None:
+                # No cancelamento ou em uma falha de leitura, o lote das OPs já criadas também é gerado.
+                fechar_grupo()
+            if erro_leitura is not None:
+                self.sink.log(f"Leitura dos planejamentos interrompida após {self.registros_processados} de "
+                              f"{self.total_registros}: {erro_leitura}", "erro")
+                raise erro_leitura
+            if self.cancelado:
+                self.sink.log(f"⏹️ Processamento cancelado após {self.registros_processados} de {self.total_registros} planejamentos.", "aviso")
+                return False
+            return True
+        finally:
+            # Em caso de abandono (abort/exceção), aguarda as OPs já enviadas.
+            if em_voo:
+                concluir(set(wait(em_voo).done))
+            # Retentativas que não chegaram a ser drenadas (abort/exceção) contam como falha.
+            pendentes, self._retentativas = self._retentativas, []
+            self._descartar_retentativas(pendentes, registrar)
+            if executor is not None:
+                executor.shutdown(wait=True)
+            pilha_span.close()
+            fechar = getattr(iterador, "close", None)
+            if fechar:
+                fechar()
+
+    def processar_registros(self, registros: List[Planejamento],
+                            grupo_do: Callable[[ResultadoRegistro], Tuple[List[int], Dict[int, Any]]]) -> bool:
+        """
+        Cria as OPs de registros já lidos (microlote do modo vigia), com a
+        concorrência e a taxa do controle. O lote não é gerado aqui: cada
+        resultado é acumulado nas listas (IDIPROCs, NUPLAN por IDIPROC) que
+        `grupo_do` devolve, até o chamador fechar a rodada. As falhas
+        transitórias são reprocessadas antes de retornar.
+
+        Returns:
+            bool: False se a autenticação falhar (nada é processado) ou se a execução for cancelada.
+        """
+        if not self.api.token_valido() and not self.api.autenticar():
+            self.sink.log("Falha ao autenticar na API Sankhya; microlote adiado.", "erro")
+            return False
+        self.total_registros += len(registros)
+        self.telemetria.definir_total(self.total_registros)
+        self.sink.progresso(self.registros_processados, self.total_registros)
+        em_voo: Set[Future] = set()
+
+        def registrar(resultado: ResultadoRegistro):
+            if not self._adiar(resultado):
+                self._registrar_resultado(resultado, *grupo_do(resultado))
+
+        def concluir(resultados: Set[Future]):
+            for futuro in resultados:
+                registrar(futuro.result())
+
+        with ThreadPoolExecutor(self.controle.concorrencia_maxima, thread_name_prefix="op") as executor:
+            try:
+                for registro in registros:
+                    if self.controle.pausado:
+                        concluir(set(wait(em_voo).done))
+                        em_voo = set()
+                        self.sink.log("⏸️ Processamento pausado.", "aviso")
+                    if not self.controle.aguardar_liberacao() or not self._aguardar_disjuntor():
+                        self.cancelado = True
+                        break
+                    self.rodada_atual = registro.RODADA
+                    self.sink.log(f"  [{registro.DATA} braço {registro.BRACO} rodada {registro.RODADA}] Processando NUPLAN: {registro.NUPLAN}...", "info")
+                    while len(em_voo) >= self.controle.concorrencia:
+                        concluidos, em_voo = wait(em_voo, return_when=FIRST_COMPLETED)
+                        concluir(concluidos)
+                    contexto = contextvars.copy_context()
+                    em_voo.add(executor.submit(contexto.run, self._processar_registro, registro, registro.DATA))
+            finally:
+                concluir(set(wait(em_voo).done))
+        self._drenar_retentativas(registrar)
+        return not self.cancelado
+
+    def gerar_lote(self, data: str, rodada: int, braco: int, idiprocs: List[int], nuplan_por_idiproc: Dict[int, Any]):
+        """
+        Fecha uma rodada acumulada por processar_registros: gera o lote e grava o NROLOTE.
+        """
+        self._gerar_lote(data, rodada, braco, idiprocs, nuplan_por_idiproc)
+
+    @staticmethod
+    def _novo_resumo_retentativas() -> Dict[str, int]:
+        # agendadas: novas tentativas enfileiradas; recuperadas/sem_sucesso: planejamentos
+        # que passaram por retentativa e terminaram com ou sem OP.
+        return {"agendadas": 0, "recuperadas": 0, "sem_sucesso": 0}
+
+    @staticmethod
+    def _novo_resumo_data(pendentes: int) -> Dict[str, Any]:
+        return {"pendentes": pendentes, "ops_criadas": 0, "falhas": 0, "duracao_s": 0.0, "abortada": False}
+
+    # --- ETAPAS ---
+    def _iniciar_grupo(self, data: str, rodada: int) -> bool:
+        """
+        Início de uma (data, rodada): renova o token da API apenas se expirado.
+        Retorna False se a autenticação falhar (o processamento é abortado).
+        """
+        self.rodada_atual = rodada
+        self.sink.log(f"--- Iniciando processamento da Rodada: {rodada} (data {data}) ---", "info")
+        self.sink.contadores(self.total_ops_criadas, self.total_falhas, rodada)
+        if not self.api.token_valido() and not self.api.autenticar():
+            self.sink.log(f"Falha ao autenticar para a Rodada {rodada}. Abortando.", "erro")
+            return False
+        return True
+
+    def _aguardar_disjuntor(self) -> bool:
+        """
+        Pausa o processamento enquanto o disjuntor da API estiver aberto, em vez
+        de gastar o prazo de cada OP restante; ao fim de cada espera, sonda com um login.
+        Retorna False se a execução foi cancelada durante a espera.
+        """
+        if disjuntor_api.estado()["estado"] == FECHADO:
+            return True
+        if not disjuntor_api.aguardar(
+                self.api.sondar,
+                lambda segundos: self.sink.log(f"⏸️ API Sankhya indisponível (disjuntor aberto). Nova sonda em {segundos:.0f}s.", "aviso"),
+                self.controle.cancelado):
+            return False
+        self.sink.log("▶️ API Sankhya respondendo novamente. Processamento retomado.", "sucesso")
+        return True
+
+    def _processar_registro(self, registro: Planejamento, data: str, tentativa: int = 1) -> ResultadoRegistro:
+        """
+        Cria a OP de um planejamento e grava o IDIPROC em AD_PLAN.
+        Pode rodar em um worker; o acesso ao banco é serializado por _lock_db.
+        A falha da API é transitória quando a última falha registrada pelas
+        chamadas (resiliencia.coletar_falhas) é transitória.
+        """
+        self.telemetria.op_iniciada()
+        try:
+            with span("planejamento", NUPLAN=registro.NUPLAN, rodada=registro.RODADA):
+                try:
+                    dados_produto_api = {"CODPRODPA": registro.CODPROD, "IDPROC": IDPROC_PADRAO,
+                                         "CODPLP": CODPLP_PADRAO, "TAMLOTE": registro.QTDPLAN}
+                    with coletar_falhas() as falhas:
+                        sucesso, idiproc, mensagem = self.api.criar_ordem_producao(dados_produto_api)
+                    if not (sucesso and idiproc):
+                        return ResultadoRegistro(registro, data, None, f"Erro ao criar OP: {mensagem}", FALHA_API,
+                                                 transitoria=bool(falhas) and falhas[-1] == TRANSITORIA, tentativa=tentativa)
+                    definir_atributo("IDIPROC", idiproc)
+                    with self._lock_db:
+                        gravado = self.db.atualizar_idiproc(registro.NUPLAN, idiproc)
+                    if not gravado:
+                        return ResultadoRegistro(registro, data, None, f"OP {idiproc} criada, mas FALHA ao atualizar banco.",
+                                                 FALHA_BANCO, tentativa=tentativa)
+                    return ResultadoRegistro(registro, data, idiproc, None, tentativa=tentativa)
+                except Exception as e:
+                    logger.error("Erro inesperado no NUPLAN %s", registro.NUPLAN, exc_info=True)
+                    return ResultadoRegistro(registro, data, None, f"Erro inesperado no NUPLAN {registro.NUPLAN}: {e}",
+                                             FALHA_INESPERADA, tentativa=tentativa)
+        finally:
+            self.telemetria.op_concluida()
+
+    def _adiar(self, resultado: ResultadoRegistro) -> bool:
+        """
+        Enfileira para nova tentativa uma falha transitória que ainda tem
+        tentativas, com backoff exponencial e jitter. Retorna False se o
+        resultado é final (sucesso, falha permanente, tentativas esgotadas ou cancelamento).
+        """
+        maximas = APP_CONFIG['retentativas_maximas']
+        if (resultado.idiproc or not resultado.transitoria or resultado.tentativa > maximas
+                or self.controle.cancelado.is_set() or self._descartando_retentativas):
+            return False
+        espera = min(APP_CONFIG['retentativa_espera_maxima'],
+                     APP_CONFIG['retentativa_espera_base'] * 2 ** (resultado.tentativa - 1))
+        # Metade fixa e metade aleatória: as falhas de um mesmo pico não voltam juntas.
+        espera = random.uniform(espera / 2, espera)
+        self._retentativas.append(Retentativa(time.monotonic() + espera, resultado))
+        self.retentativas["agendadas"] += 1
+        self.sink.log(f"    🔁 NUPLAN {resultado.registro.NUPLAN}: {resultado.erro}; nova tentativa "
+                      f"({resultado.tentativa + 1}/{maximas + 1}) em {espera:.1f}s.", "aviso")
+        return True
+
+    def _drenar_retentativas(self, registrar: Callable[[ResultadoRegistro], None]):
+        """
+        Reprocessa, na mesma sessão, a fila de retentativas até esvaziá-la: cada
+        item espera o seu backoff e os prontos são enviados juntos, com a
+        concorrência e a taxa do controle. Uma nova falha transitória volta para
+        a fila (via `registrar`); no cancelamento ou se o novo login falhar, os
+        pendentes viram falha sem gastar as tentativas restantes.
+        """
+        if not self._retentativas:
+            return
+        self.sink.log(f"🔁 Reprocessando {len(self._retentativas)} planejamentos com falha transitória...", "info")
+        cancelado = self.controle.cancelado
+        while self._retentativas:
+            espera = min(item.pronto_em for item in self._retentativas) - time.monotonic()
+            if espera > 0:
+                cancelado.wait(espera)
+            agora = time.monotonic()
+            prontos: List[Retentativa] = []
+            adiados: List[Retentativa] = []
+            for item in self._retentativas:
+                (prontos if cancelado.is_set() or item.pronto_em <= agora else adiados).append(item)
+            self._retentativas = adiados
+            if cancelado.is_set():
+                self.cancelado = True
+                self._descartar_retentativas(prontos, registrar)
+                continue
+
+            # Sessão expirada (status 3/HTTP 401) invalida o token: renova antes de reenviar.
+            if not self.api.token_valido() and not self.api.autenticar():
+                self.sink.log("Falha ao autenticar na API Sankhya; as retentativas pendentes ficam como falha.", "erro")
+                pendentes, self._retentativas = prontos + self._retentativas, []
+                self._descartar_retentativas(pendentes, registrar)
+                return
+            with ThreadPoolExecutor(max(1, self.controle.concorrencia), thread_name_prefix="retentativa") as executor:
+                futuros: List[Future] = []
+                for item in prontos:
+                    if not self.controle.aguardar_liberacao() or not self._aguardar_disjuntor():
+                        self._retentativas.extend(prontos[len(futuros):])
+                        break
+                    anterior = item.resultado
+                    contexto = contextvars.copy_context()
+                    futuros.append(executor.submit(contexto.run, self._processar_registro, anterior.registro,
+                                                   anterior.data, anterior.tentativa + 1))
+                for futuro in futuros:
+                    registrar(futuro.result())
+
+    def _descartar_retentativas(self, itens: List[Retentativa], registrar: Callable[[ResultadoRegistro], None]):
+        # Registra os itens como resultado final: _adiar não os reenfileira durante o descarte.
+        self._descartando_retentativas = True
+        try:
+            for item in itens:
+                # Um item ainda na primeira tentativa não passa pela contagem de _registrar_resultado.
+                if item.resultado.tentativa == 1:
+                    self.retentativas["sem_sucesso"] += 1
+                registrar(item.resultado)
+        finally:
+            self._descartando_retentativas = False
+
+    def _registrar_resultado(self, resultado: ResultadoRegistro, idiprocs_do_grupo: List[int],
+                             nuplan_por_idiproc: Dict[int, Any]):
+        """
+        Atualiza contadores, listas e sink com o resultado de um registro (thread do motor).
+        """
+        nuplan = resultado.registro.NUPLAN
+        resumo_data = self.por_data.setdefault(resultado.data, self._novo_resumo_data(0))
+        if resultado.tentativa > 1:
+            self.retentativas["recuperadas" if resultado.idiproc else "sem_sucesso"] += 1
+        if resultado.idiproc:
+            self.total_ops_criadas += 1
+            resumo_data["ops_criadas"] += 1
+            self.ops_criadas_sucesso.append({"nuplan": nuplan, "idiproc": resultado.idiproc, "tentativas": resultado.tentativa})
+            idiprocs_do_grupo.append(resultado.idiproc)
+            nuplan_por_idiproc[resultado.idiproc] = nuplan
+            self.sink.log(f"    ✅ OP {resultado.idiproc} criada para NUPLAN {nuplan}.", "sucesso")
+            tempo_primeira_op = registrar_primeira_op()
+            if tempo_primeira_op is not None:
+                logger.info("Primeira OP do processo criada %.1fs após a partida.", tempo_primeira_op)
+        else:
+            self.total_falhas += 1
+            resumo_data["falhas"] += 1
+            self.falhas_por_categoria[resultado.categoria] = self.falhas_por_categoria.get(resultado.categoria, 0) + 1
+            self.detalhes_falhas.append({"nuplan": nuplan, "erro": resultado.erro, "categoria": resultado.categoria,
+                                         "transitoria": resultado.transitoria, "tentativas": resultado.tentativa})
+            self.sink.log(f"    ❌ {resultado.erro}", "erro")
+        self.registros_processados += 1
+        self.telemetria.registro_finalizado(bool(resultado.idiproc))
+        self.sink.contadores(self.total_ops_criadas, self.total_falhas, resultado.registro.RODADA)
+        self.sink.progresso(self.registros_processados, self.total_registros)
+
+    def _gerar_lote(self, data: str, rodada: int, braco: int, idiprocs: List[int], nuplan_por_idiproc: Dict[int, Any]):
+        """
+        Gera o lote das OPs criadas em uma (data, braço, rodada) e grava o NROLOTE em AD_PLAN.
+        """
+        if not idiprocs:
+            self.sink.log(f"Nenhuma OP criada na Rodada {rodada} (data {data}), geração de lote ignorada.", "aviso")
+            return
+        with span("lote", data=data, rodada=rodada, ops=len(idiprocs)), self._lock_db:
+            lotes = self.db.gerar_lotes_para_ops(idiprocs, braco)
+            if not lotes:
+                self.sink.log(f"FALHA ao gerar lote para a Rodada {rodada} (data {data}).", "erro")
+            for nro_lote, idiprocs_do_lote in lotes.items():
+                self.sink.log(f"Lote {nro_lote} gerado para a Rodada {rodada} (data {data}).", "sucesso")
+                nuplans_do_lote = [nuplan_por_idiproc[i] for i in idiprocs_do_lote if i in nuplan_por_idiproc]
+                if self.db.atualizar_lote_em_ad_plan(nro_lote, nuplans_do_lote):
+                    self.sink.log(f"AD_PLAN atualizada com o lote {nro_lote}.", "sucesso")
+                else:
+                    self.sink.log("FALHA ao atualizar AD_PLAN com o lote.", "erro")
+
+    def obter_resumo(self) -> Dict[str, Any]:
+        return {"total_ops_criadas": self.total_ops_criadas, "total_falhas": self.total_falhas,
+                "ops_criadas_sucesso": self.ops_criadas_sucesso, "detalhes_falhas": self.detalhes_falhas,
+                "por_data": self.por_data, "falhas_por_categoria": self.falhas_por_categoria,
+                "retentativas": self.retentativas, "cancelado": self.cancelado}
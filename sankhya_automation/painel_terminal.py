@@ -0,0 +1,161 @@
+"""
+Painel de progresso da CLI.
+Em um terminal, um bloco de status (rodada, contadores, vazão e ETA) é
+redesenhado no lugar com taxa de atualização limitada, e apenas os erros viram
+linhas permanentes acima dele. Com a saída redirecionada (arquivo, pipe,
+agendador), imprime um resumo simples a cada intervalo, além dos erros.
+O custo de exibição deixa de crescer com o número de registros.
+"""
+
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+from config import APP_CONFIG
+from interface import InterfaceUsuario
+from motor import SinkProgresso
+
+# Sobe N linhas (início da linha) e limpa até o fim da tela.
+SUBIR_LINHAS = "\x1b[{}F"
+LIMPAR_ATE_O_FIM = "\x1b[J"
+LARGURA_BARRA = 24
+ICONES = {"info": "ℹ️", "sucesso": "✅", "erro": "❌", "aviso": "⚠️"}
+
+
+def formatar_duracao(segundos: Optional[float]) -> str:
+    if segundos is None:
+        return "-"
+    horas, resto = divmod(int(segundos), 3600)
+    minutos, segundos = divmod(resto, 60)
+    return f"{horas}h{minutos:02d}m" if horas else f"{minutos}m{segundos:02d}s"
+
+
+class PainelTerminal(SinkProgresso):
+    """
+    Sink do motor para a CLI. Os eventos apenas atualizam o estado; o desenho
+    acontece no máximo uma vez por intervalo. Um estado ainda não desenhado é
+    exibido no evento seguinte (a telemetria publica a cada poucos segundos)
+    ou em concluir().
+    """
+
+    def __init__(self, saida: Optional[TextIO] = None, relogio: Callable[[], float] = time.monotonic):
+        self.saida = saida or InterfaceUsuario.arquivo_progresso or sys.stdout
+        self.interativo = bool(getattr(self.saida, "isatty", None) and self.saida.isatty())
+        self.intervalo = (1.0 / max(APP_CONFIG['painel_atualizacoes_por_segundo'], 0.1) if self.interativo
+                          else APP_CONFIG['painel_intervalo_resumo'])
+        self._relogio = relogio
+        # Eventos chegam da thread do motor e da thread da telemetria.
+        self._lock = threading.Lock()
+        self._ultimo_desenho = relogio()
+        self._pendente = False
+        self._linhas_desenhadas = 0
+
+        self.ops_criadas = 0
+        self.falhas = 0
+        self.rodada: Optional[int] = None
+        self.processados = 0
+        self.total = 0
+        self.mensagem = ""
+        self._telemetria: Dict[str, Any] = {}
+
+    # --- EVENTOS DO MOTOR ---
+    def log(self, mensagem: str, tipo: str = "info"):
+        with self._lock:
+            texto = mensagem.strip()
+            # Mensagens do motor que já começam com um ícone (✅, ⏸️...) não recebem outro.
+            if texto[:1].isascii():
+                texto = f"{ICONES.get(tipo, ICONES['info'])} {texto}"
+            if tipo == "erro":
+                self._imprimir_permanente(texto)
+                return
+            self.mensagem = texto
+            self._atualizar()
+
+    def contadores(self, ops_criadas: int, falhas: int, rodada: Optional[int]):
+        with self._lock:
+            self.ops_criadas, self.falhas, self.rodada = ops_criadas, falhas, rodada
+            self._atualizar()
+
+    def progresso(self, processados: int, total: int):
+        with self._lock:
+            self.processados, self.total = processados, total
+            self._atualizar()
+
+    def telemetria(self, dados: Dict[str, Any]):
+        with self._lock:
+            self._telemetria = dados
+            self._atualizar()
+
+    def concluir(self):
+        """
+        Desenha o estado final e o deixa na tela; a próxima execução desenha um bloco novo.
+        """
+        with self._lock:
+            if self._pendente or self.interativo:
+                self._desenhar()
+            self._linhas_desenhadas = 0
+            self._telemetria, self.mensagem = {}, ""
+
+    # --- DESENHO ---
+    def _atualizar(self):
+        if self._relogio() - self._ultimo_desenho >= self.intervalo:
+            self._desenhar()
+        else:
+            self._pendente = True
+
+    def _escrever(self, texto: str):
+        self.saida.write(texto)
+        self.saida.flush()
+
+    def _apagar_bloco(self) -> str:
+        if not self._linhas_desenhadas:
+            return ""
+        return SUBIR_LINHAS.format(self._linhas_desenhadas) + LIMPAR_ATE_O_FIM
+
+    def _desenhar(self):
+        self._ultimo_desenho, self._pendente = self._relogio(), False
+        if not self.interativo:
+            self._escrever(self._resumo() + "\n")
+            return
+        # Linhas mais largas que o terminal quebrariam e o bloco não seria apagado por inteiro.
+        largura = max(20, shutil.get_terminal_size().columns - 2)
+        linhas = [linha[:largura] for linha in self._bloco()]
+        self._escrever(self._apagar_bloco() + "\n".join(linhas) + "\n")
+        self._linhas_desenhadas = len(linhas)
+
+    def _imprimir_permanente(self, linha: str):
+        if not self.interativo:
+            self._escrever(linha + "\n")
+            return
+        self._escrever(self._apagar_bloco() + linha + "\n")
+        self._linhas_desenhadas = 0
+        self._desenhar()
+
+    # --- CONTEÚDO ---
+    def _percentual(self) -> int:
+        return min(100, self.processados * 100 // self.total) if self.total else 0
+
+    def _vazao_eta(self) -> List[str]:
+        ops_por_minuto = self._telemetria.get("ops_por_minuto")
+        return [f"{ops_por_minuto:.1f} OPs/min" if ops_por_minuto is not None else "- OPs/min",
+                f"ETA {formatar_duracao(self._telemetria.get('eta_s'))}"]
+
+    def _bloco(self) -> List[str]:
+        preenchido = LARGURA_BARRA * self._percentual() // 100
+        barra = "█" * preenchido + "░" * (LARGURA_BARRA - preenchido)
+        return [
+            f"Rodada {self.rodada if self.rodada is not None else '-'} | "
+            f"{self.processados}/{self.total} ({self._percentual()}%) [{barra}]",
+            " | ".join([f"OPs criadas {self.ops_criadas}", f"falhas {self.falhas}",
+                        f"em voo {self._telemetria.get('em_voo', 0)}", *self._vazao_eta()]),
+            self.mensagem,
+        ]
+
+    def _resumo(self) -> str:
+        return " | ".join([
+            f"[{datetime.now().strftime('%H:%M:%S')}] {self.processados}/{self.total} ({self._percentual()}%)",
+            f"OPs criadas {self.ops_criadas}", f"falhas {self.falhas}",
+            f"rodada {self.rodada if self.rodada is not None else '-'}", *self._vazao_eta()])
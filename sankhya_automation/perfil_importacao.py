@@ -0,0 +1,90 @@
+"""
+Verificação do tempo de importação (partida a frio) dos pontos de entrada.
+Executa cada ponto de entrada em um interpretador novo com `-X importtime`,
+mede o tempo cumulativo de importação e falha (código de saída 1) se o
+orçamento for excedido ou se a CLI importar dependências pesadas na partida.
+
+Uso:
+    python sankhya_automation/perfil_importacao.py [--orcamento-cli MS] [--orcamento-web MS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_CLI = os.path.join(RAIZ, 'sankhya_automation')
+
+# Módulos que não podem ser importados pela CLI antes da coleta dos parâmetros.
+MODULOS_PROIBIDOS_CLI = ("sqlalchemy", "oracledb", "requests")
+
+# Orçamentos padrão (milissegundos) do tempo cumulativo de importação.
+ORCAMENTO_CLI_MS = float(os.getenv('IMPORTTIME_ORCAMENTO_CLI_MS', '300'))
+ORCAMENTO_WEB_MS = float(os.getenv('IMPORTTIME_ORCAMENTO_WEB_MS', '1500'))
+
+
+def medir_importacao(modulo: str, cwd: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Importa `modulo` em um interpretador novo e retorna o tempo total (ms) e o
+    tempo cumulativo (ms) de cada módulo importado por ele.
+    """
+    ambiente = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=cwd, env=ambiente, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        erro = (resultado.stderr.strip().splitlines() or ["erro desconhecido"])[-1]
+        raise RuntimeError(f"Falha ao importar {modulo}: {erro}")
+
+    modulos: Dict[str, float] = {}
+    for linha in resultado.stderr.splitlines():
+        # Formato: "import time: self [us] | cumulative | imported package"
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        partes = linha[len("import time:"):].split("|")
+        if len(partes) != 3:
+            continue
+        modulos[partes[2].strip()] = int(partes[1]) / 1000.0
+    # O total é o tempo cumulativo do próprio ponto de entrada (sem a partida do interpretador).
+    total = modulos.pop(modulo, 0.0)
+    return total, modulos
+
+
+def _maiores(modulos: Dict[str, float], quantidade: int = 10) -> List[Tuple[str, float]]:
+    return sorted(modulos.items(), key=lambda item: item[1], reverse=True)[:quantidade]
+
+
+def verificar(nome: str, modulo: str, cwd: str, orcamento_ms: float, proibidos=()) -> bool:
+    total, modulos = medir_importacao(modulo, cwd)
+    print(f"{nome}: {total:.0f} ms (orçamento {orcamento_ms:.0f} ms)")
+    for modulo_topo, ms in _maiores(modulos):
+        print(f"    {ms:8.1f} ms  {modulo_topo}")
+
+    ok = total <= orcamento_ms
+    if not ok:
+        print(f"  ❌ {nome}: tempo de importação acima do orçamento.")
+    importados = sorted({m.split(".")[0] for m in modulos} & set(proibidos))
+    if importados:
+        print(f"  ❌ {nome}: dependências pesadas importadas na partida: {', '.join(importados)}")
+        ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Verifica o tempo de importação dos pontos de entrada.")
+    parser.add_argument("--orcamento-cli", type=float, default=ORCAMENTO_CLI_MS, help="Orçamento da CLI em ms")
+    parser.add_argument("--orcamento-web", type=float, default=ORCAMENTO_WEB_MS, help="Orçamento da aplicação web em ms")
+    parser.add_argument("--somente-cli", action="store_true", help="Não mede a aplicação web")
+    args = parser.parse_args()
+
+    ok = verificar("CLI (sankhya_automation/main.py)", "main", PASTA_CLI, args.orcamento_cli, MODULOS_PROIBIDOS_CLI)
+    if not args.somente_cli:
+        ok = verificar("Web (main.py)", "main", RAIZ, args.orcamento_web) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Perfilamento sob demanda de uma execução em andamento.
+Um amostrador em thread própria lê, a cada intervalo, a pilha das threads da
+automação (sys._current_frames) e conta as pilhas no formato "colapsado"
+(uma linha `frame;frame;... contagem`), aceito por flamegraph.pl, speedscope
+e inferno. Onde o relógio de CPU por thread existe (Linux), cada amostra é
+classificada como CPU ou espera (lock, I/O, sleep) pela CPU consumida pela
+thread desde a amostra anterior. Também tira snapshots do tracemalloc, com
+o top de alocações por linha e as pilhas de alocação no mesmo formato.
+Nada roda até ser iniciado e o custo é limitado à thread do amostrador.
+"""
+
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import APP_CONFIG
+
+logger = logging.getLogger(__name__)
+
+CPU = "cpu"
+ESPERA = "espera"
+MODOS = ("todos", CPU, ESPERA)
+# Fração do intervalo com CPU consumida acima da qual a amostra conta como CPU.
+LIMIAR_CPU = 0.5
+
+
+def _relogio_cpu(ident: int):
+    """
+    Relógio de CPU da thread (Unix); None onde não existe (Windows).
+    """
+    try:
+        relogio = time.pthread_getcpuclockid(ident)
+        time.clock_gettime(relogio)
+        return relogio
+    except (AttributeError, OSError):
+        return None
+
+
+def _pilha(frame) -> List[str]:
+    pilha = []
+    while frame is not None:
+        codigo = frame.f_code
+        modulo = frame.f_globals.get("__name__", "?")
+        pilha.append(f"{modulo}:{codigo.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    pilha.reverse()
+    return pilha
+
+
+def colapsar(contagens: Dict[Tuple[str, ...], int]) -> str:
+    """
+    Pilhas no formato colapsado, das mais frequentes para as menos.
+    """
+    linhas = [f"{';'.join(pilha)} {contagem}" for pilha, contagem in
+              sorted(contagens.items(), key=lambda item: item[1], reverse=True)]
+    return "\n".join(linhas) + ("\n" if linhas else "")
+
+
+class PerfiladorAmostragem:
+    """
+    Amostrador das threads cujo nome começa com um dos prefixos de
+    `perfilador_threads` (a thread da execução e os workers de OP). Encerra
+    sozinho após `duracao_maxima` segundos, para não ficar ligado esquecido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._amostras: Counter = Counter()
+        self._relogios: Dict[int, Any] = {}
+        self._cpu_anterior: Dict[int, float] = {}
+        self.intervalo = 0.0
+        self.prefixos: Tuple[str, ...] = ()
+        self.inicio: Optional[float] = None
+        self.fim: Optional[float] = None
+        self.total_amostras = 0
+        self.duracao_coleta = 0.0
+
+    @property
+    def ativo(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self, intervalo_ms: Optional[float] = None, duracao_maxima: Optional[float] = None,
+                prefixos: Optional[List[str]] = None) -> bool:
+        """
+        Descarta o perfil anterior e começa a amostrar. Retorna False se já estiver ativo.
+        """
+        with self._lock:
+            if self.ativo:
+                return False
+            self.intervalo = max(1.0, intervalo_ms or APP_CONFIG['perfilador_intervalo_ms']) / 1000
+            self.prefixos = tuple(prefixos or APP_CONFIG['perfilador_threads'])
+            self._amostras = Counter()
+            self._relogios, self._cpu_anterior = {}, {}
+            self.total_amostras, self.duracao_coleta = 0, 0.0
+            self.inicio, self.fim = time.time(), None
+            self._parar.clear()
+            duracao = duracao_maxima or APP_CONFIG['perfilador_duracao_maxima']
+            self._thread = threading.Thread(target=self._laco, args=(duracao,), name="perfilador", daemon=True)
+            self._thread.start()
+        logger.info("Perfilador iniciado (intervalo %.0f ms, threads %s, até %s s).",
+                    self.intervalo * 1000, ",".join(self.prefixos), duracao)
+        return True
+
+    def parar(self) -> bool:
+        """
+        Para a amostragem e mantém o perfil para consulta. Retorna False se não estava ativo.
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return False
+        self._parar.set()
+        thread.join()
+        return True
+
+    def _laco(self, duracao_maxima: float):
+        limite = time.monotonic() + duracao_maxima
+        proprio = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            if time.monotonic() >= limite:
+                logger.info("Perfilador encerrado pela duração máxima (%s s).", duracao_maxima)
+                break
+            inicio = time.perf_counter()
+            self._amostrar(proprio)
+            self.duracao_coleta += time.perf_counter() - inicio
+        self.fim = time.time()
+
+    def _amostrar(self, proprio: int):
+        nomes = {t.ident: t.name for t in threading.enumerate() if t.name.startswith(self.prefixos)}
+        frames = sys._current_frames()
+        with self._lock:
+            for ident, nome in nomes.items():
+                frame = frames.get(ident)
+                if frame is None or ident == proprio:
+                    continue
+                self._amostras[(nome.rstrip("0123456789_-"), self._classificar(ident)) + tuple(_pilha(frame))] += 1
+                self.total_amostras += 1
+
+    def _classificar(self, ident: int) -> str:
+        if ident not in self._relogios:
+            self._relogios[ident] = _relogio_cpu(ident)
+        relogio = self._relogios[ident]
+        if relogio is None:
+            return "?"
+        try:
+            cpu = time.clock_gettime(relogio)
+        except OSError:
+            # A thread terminou entre a enumeração e a leitura.
+            return "?"
+        anterior = self._cpu_anterior.get(ident)
+        self._cpu_anterior[ident] = cpu
+        if anterior is None:
+            return "?"
+        return CPU if cpu - anterior >= self.intervalo * LIMIAR_CPU else ESPERA
+
+    def colapsado(self, modo: str = "todos") -> str:
+        """
+        Perfil no formato colapsado. Em "todos", o segundo frame de cada pilha
+        é a classificação (cpu, espera ou ? sem relógio de CPU); em "cpu" e
+        "espera", apenas as amostras daquela classificação.
+        """
+        with self._lock:
+            amostras = dict(self._amostras)
+        if modo == "todos":
+            return colapsar(amostras)
+        filtradas: Counter = Counter()
+        for (thread, classe, *pilha), contagem in amostras.items():
+            if classe == modo:
+                filtradas[(thread, *pilha)] += contagem
+        return colapsar(filtradas)
+
+    def estado(self, top: int = 20) -> Dict[str, Any]:
+        """
+        Situação do perfilador, amostras por classificação e as funções com
+        mais amostras no topo da pilha (self) e em qualquer posição (total).
+        """
+        with self._lock:
+            amostras = dict(self._amostras)
+        por_classe: Counter = Counter()
+        proprio: Counter = Counter()
+        total: Counter = Counter()
+        for (_, classe, *pilha), contagem in amostras.items():
+            por_classe[classe] += contagem
+            if pilha:
+                proprio[pilha[-1]] += contagem
+            for frame in set(pilha):
+                total[frame] += contagem
+        fim = self.fim if self.fim is not None or self.inicio is None else time.time()
+        return {
+            "ativo": self.ativo,
+            "intervalo_ms": round(self.intervalo * 1000, 1),
+            "threads": list(self.prefixos),
+            "inicio": self.inicio,
+            "duracao_s": round(fim - self.inicio, 3) if self.inicio else 0.0,
+            "amostras": self.total_amostras,
+            "amostras_por_classe": dict(por_classe),
+            # Tempo gasto pelo amostrador coletando pilhas (custo do perfilamento).
+            "custo_coleta_s": round(self.duracao_coleta, 3),
+            "top_proprio": [{"frame": f, "amostras": c} for f, c in proprio.most_common(top)],
+            "top_total": [{"frame": f, "amostras": c} for f, c in total.most_common(top)],
+        }
+
+
+class SnapshotsMemoria:
+    """
+    Snapshots do tracemalloc. O primeiro pedido liga o rastreamento (com
+    `perfilador_frames_memoria` frames por alocação); os seguintes comparam com
+    o snapshot anterior, o que mostra o que cresceu entre dois momentos da execução.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._anterior: Optional[tracemalloc.Snapshot] = None
+        self._ultimo: Optional[tracemalloc.Snapshot] = None
+
+    @staticmethod
+    def _filtrar(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            # As pilhas guardadas pelo próprio amostrador não interessam.
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def capturar(self, top: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(APP_CONFIG['perfilador_frames_memoria'])
+                self._anterior = self._ultimo = None
+                logger.info("tracemalloc iniciado; o próximo snapshot mostra as alocações desde agora.")
+                return {"iniciado": True, "snapshot": False}
+            snapshot = self._filtrar(tracemalloc.take_snapshot())
+            self._anterior, self._ultimo = self._ultimo, snapshot
+        atual, pico = tracemalloc.get_traced_memory()
+        relatorio: Dict[str, Any] = {
+            "iniciado": False,
+            "snapshot": True,
+            "memoria_rastreada_bytes": atual,
+            "pico_bytes": pico,
+            "top_linhas": [{"linha": str(s.traceback), "bytes": s.size, "blocos": s.count}
+                           for s in snapshot.statistics("lineno")[:top]],
+        }
+        if self._anterior is not None:
+            relatorio["crescimento"] = [{"linha": str(s.traceback), "bytes": s.size_diff, "blocos": s.count_diff}
+                                        for s in snapshot.compare_to(self._anterior, "lineno")[:top]]
+        return relatorio
+
+    def colapsado(self) -> Optional[str]:
+        """
+        Bytes alocados e ainda vivos no último snapshot, por pilha de alocação
+        (formato colapsado). None se ainda não houve snapshot.
+        """
+        with self._lock:
+            snapshot = self._ultimo
+        if snapshot is None:
+            return None
+        contagens: Counter = Counter()
+        for estatistica in snapshot.statistics("traceback"):
+            pilha = tuple(f"{frame.filename}:{frame.lineno}" for frame in estatistica.traceback)
+            contagens[pilha] += estatistica.size
+        return colapsar(contagens)
+
+    def parar(self) -> bool:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return False
+            tracemalloc.stop()
+            self._anterior = self._ultimo = None
+        return True
+
+
+perfilador = PerfiladorAmostragem()
+snapshots_memoria = SnapshotsMemoria()
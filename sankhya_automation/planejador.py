@@ -0,0 +1,242 @@
+"""
+Módulo de planejamento (dry-run) das execuções de automação.
+Monta o plano de trabalho por rodada, conta as chamadas à API Sankhya e ao
+banco que a execução fará e estima o tempo total a partir do histórico
+persistido de latências por etapa, da concorrência efetiva (workers limitados
+pela capacidade do pool de sessões) e da taxa máxima de OPs por minuto.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from config import APP_CONFIG
+from metricas import API_LATENCIA, SQL_LATENCIA
+
+logger = logging.getLogger(__name__)
+
+# Etapas executadas para cada planejamento (uma OP).
+ETAPAS_API_POR_REGISTRO = (
+    "LancamentoOrdemProducaoSP.getNovoLancamentoOP",
+    "LancamentoOrdemProducaoSP.inserirProdutoHTML5",
+    "LancamentoOrdemProducaoSP.validarTamanhoLote",
+    "LancamentoOrdemProducaoSP.lancarOrdensDeProducao",
+)
+ETAPAS_SQL_POR_REGISTRO = ("atualizar_idiproc",)
+# Etapas executadas uma vez por rodada (o lote só quando houver OPs criadas).
+ETAPAS_API_POR_RODADA = ()
+ETAPAS_SQL_POR_RODADA = ()
+ETAPAS_SQL_POR_LOTE = ("stp_gerar_rodada_vasap_ext", "buscar_nrolote", "atualizar_lote_em_ad_plan")
+# Etapas executadas uma vez por execução (o token é reaproveitado enquanto válido;
+# o logout só acontece no encerramento do processo). A busca é uma única consulta
+# em streaming para o período inteiro, e não uma por (data, rodada).
+ETAPAS_API_POR_EXECUCAO = ("login",)
+ETAPAS_SQL_POR_EXECUCAO = ("contar_pendentes_por_data_braco_rodada", "buscar_planejamentos")
+
+# Latências assumidas (segundos) enquanto não houver histórico para a etapa.
+LATENCIA_PADRAO_API = 1.0
+LATENCIA_PADRAO_SQL = 0.05
+
+# Peso de uma nova execução na média móvel exponencial do histórico.
+ALFA_HISTORICO = 0.3
+
+
+class HistoricoLatencias:
+    """
+    Histórico persistido (arquivo JSON) da latência média de cada etapa.
+    As chaves têm o formato 'api:<serviço>' ou 'sql:<comando>'.
+    """
+
+    def __init__(self, arquivo: Optional[str] = None):
+        self.arquivo = arquivo or APP_CONFIG['historico_latencias_file']
+        self._lock = threading.Lock()
+        self._etapas: Dict[str, Dict[str, float]] = self._carregar()
+
+    def _carregar(self) -> Dict[str, Dict[str, float]]:
+        if not os.path.exists(self.arquivo):
+            return {}
+        try:
+            with open(self.arquivo, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Erro ao ler o histórico de latências: %s", e)
+            return {}
+
+    def _salvar(self):
+        temporario = self.arquivo + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self._etapas, f, indent=2, sort_keys=True)
+        os.replace(temporario, self.arquivo)
+
+    def media(self, etapa: str, padrao: float) -> float:
+        with self._lock:
+            dados = self._etapas.get(etapa)
+        return dados["media"] if dados else padrao
+
+    def etapas(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._etapas.items()}
+
+    def registrar(self, etapa: str, contagem: int, soma: float):
+        """
+        Incorpora as observações de uma execução à média da etapa.
+        """
+        if contagem <= 0:
+            return
+        media_execucao = soma / contagem
+        with self._lock:
+            dados = self._etapas.get(etapa)
+            if dados is None:
+                self._etapas[etapa] = {"media": media_execucao, "amostras": contagem}
+            else:
+                dados["media"] = ALFA_HISTORICO * media_execucao + (1 - ALFA_HISTORICO) * dados["media"]
+                dados["amostras"] = dados.get("amostras", 0) + contagem
+
+    def registrar_execucao(self, inicio: "InstantaneoLatencias"):
+        """
+        Registra no histórico as latências observadas desde `inicio` e persiste o arquivo.
+        """
+        for etapa, (contagem, soma) in inicio.deltas().items():
+            self.registrar(etapa, contagem, soma)
+        try:
+            with self._lock:
+                self._salvar()
+        except OSError as e:
+            logger.error("Erro ao gravar o histórico de latências: %s", e)
+
+
+class InstantaneoLatencias:
+    """
+    Fotografia dos histogramas de latência no início de uma execução.
+    """
+
+    def __init__(self):
+        self.api: Dict[Tuple[str, ...], Tuple[int, float]] = API_LATENCIA.instantaneo()
+        self.sql: Dict[Tuple[str, ...], Tuple[int, float]] = SQL_LATENCIA.instantaneo()
+
+    def deltas(self) -> Dict[str, Tuple[int, float]]:
+        """
+        (contagem, soma em segundos) observadas em cada etapa desde a fotografia,
+        com chaves 'api:<serviço>' ou 'sql:<comando>'.
+        """
+        resultado: Dict[str, Tuple[int, float]] = {}
+        for prefixo, histograma, anterior in (("api", API_LATENCIA, self.api), ("sql", SQL_LATENCIA, self.sql)):
+            for rotulos, (contagem, soma) in histograma.instantaneo().items():
+                contagem_antes, soma_antes = anterior.get(rotulos, (0, 0.0))
+                if contagem > contagem_antes:
+                    resultado[f"{prefixo}:{rotulos[0]}"] = (contagem - contagem_antes, soma - soma_antes)
+        return resultado
+
+
+historico = HistoricoLatencias()
+
+
+def _custo(etapas_api, etapas_sql) -> float:
+    return (sum(historico.media(f"api:{e}", LATENCIA_PADRAO_API) for e in etapas_api)
+            + sum(historico.media(f"sql:{e}", LATENCIA_PADRAO_SQL) for e in etapas_sql))
+
+
+def concorrencia_efetiva(concorrencia: Optional[int] = None, capacidade_sessoes: Optional[int] = None) -> int:
+    """
+    OPs em voo ao mesmo tempo: os workers configurados, limitados pelas vagas
+    do pool de sessões quando houver um (cada OP arrenda uma sessão).
+    """
+    concorrencia = max(1, concorrencia or APP_CONFIG['max_workers'])
+    if capacidade_sessoes:
+        concorrencia = min(concorrencia, capacidade_sessoes)
+    return concorrencia
+
+
+def montar_plano(pendentes_por_rodada: Dict[int, int], rodada_inicial: int, rodada_final: int,
+                 concorrencia: Optional[int] = None, capacidade_sessoes: Optional[int] = None,
+                 ops_por_minuto: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Monta o plano de trabalho e a estimativa de tempo de uma execução.
+
+    Args:
+        pendentes_por_rodada (Dict[int, int]): Quantidade de planejamentos pendentes por rodada.
+        rodada_inicial (int): Rodada inicial do range
+        rodada_final (int): Rodada final do range
+        concorrencia (Optional[int]): Planejamentos processados em paralelo; padrão APP_CONFIG['max_workers'].
+        capacidade_sessoes (Optional[int]): Vagas do pool de sessões da API; None com uma sessão única.
+        ops_por_minuto (Optional[float]): Taxa máxima de OPs; padrão APP_CONFIG['ops_por_minuto'] (0 = sem limite).
+
+    Returns:
+        Dict[str, Any]: Plano por rodada, totais de chamadas e tempo estimado em segundos.
+    """
+    return montar_plano_periodo({None: pendentes_por_rodada}, rodada_inicial, rodada_final,
+                                concorrencia, capacidade_sessoes, ops_por_minuto)
+
+
+def montar_plano_periodo(pendentes_por_data: Dict[Optional[str], Dict[int, int]], rodada_inicial: int,
+                         rodada_final: int, concorrencia: Optional[int] = None,
+                         capacidade_sessoes: Optional[int] = None,
+                         ops_por_minuto: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Monta o plano de uma execução que cobre várias datas. Cada (data, rodada)
+    com pendências é um grupo próprio (login quando necessário e lote); as
+    etapas por execução, inclusive a busca em streaming, são contadas uma única vez.
+
+    Args:
+        pendentes_por_data (Dict[Optional[str], Dict[int, int]]): {data: {rodada: quantidade}}.
+            A chave None indica uma execução de data única (as linhas não recebem 'data').
+
+    Returns:
+        Dict[str, Any]: Mesmo formato de montar_plano; cada rodada traz a 'data' correspondente.
+    """
+    concorrencia = concorrencia_efetiva(concorrencia, capacidade_sessoes)
+    if ops_por_minuto is None:
+        ops_por_minuto = APP_CONFIG['ops_por_minuto']
+    custo_registro = _custo(ETAPAS_API_POR_REGISTRO, ETAPAS_SQL_POR_REGISTRO)
+    custo_rodada = _custo(ETAPAS_API_POR_RODADA, ETAPAS_SQL_POR_RODADA)
+    custo_lote = _custo((), ETAPAS_SQL_POR_LOTE)
+
+    rodadas = []
+    total_registros = total_api = 0
+    total_db = len(ETAPAS_SQL_POR_EXECUCAO)
+    total_api += len(ETAPAS_API_POR_EXECUCAO)
+    tempo_total = _custo(ETAPAS_API_POR_EXECUCAO, ETAPAS_SQL_POR_EXECUCAO)
+
+    for data, pendentes_por_rodada in pendentes_por_data.items():
+        for rodada in range(rodada_inicial, rodada_final + 1):
+            registros = pendentes_por_rodada.get(rodada, 0)
+            chamadas_api = chamadas_db = 0
+            tempo = 0.0
+            # Rodadas sem pendências são puladas pela execução (sem login nem busca).
+            if registros:
+                chamadas_api = len(ETAPAS_API_POR_RODADA) + registros * len(ETAPAS_API_POR_REGISTRO)
+                chamadas_db = len(ETAPAS_SQL_POR_RODADA) + registros * len(ETAPAS_SQL_POR_REGISTRO) + len(ETAPAS_SQL_POR_LOTE)
+                # Os planejamentos de uma rodada são distribuídos entre os workers,
+                # sem passar da taxa máxima de OPs por minuto.
+                ondas = -(-registros // concorrencia)
+                tempo_ops = ondas * custo_registro
+                if ops_por_minuto > 0:
+                    tempo_ops = max(tempo_ops, registros * 60.0 / ops_por_minuto)
+                tempo = custo_rodada + tempo_ops + custo_lote
+            linha = {
+                "rodada": rodada,
+                "registros": registros,
+                "chamadas_api": chamadas_api,
+                "chamadas_db": chamadas_db,
+                "tempo_estimado_s": round(tempo, 1),
+            }
+            if data is not None:
+                linha = {"data": data, **linha}
+            rodadas.append(linha)
+            total_registros += registros
+            total_api += chamadas_api
+            total_db += chamadas_db
+            tempo_total += tempo
+
+    return {
+        "rodadas": rodadas,
+        "total_registros": total_registros,
+        "total_chamadas_api": total_api,
+        "total_chamadas_db": total_db,
+        "concorrencia": concorrencia,
+        "ops_por_minuto": ops_por_minuto,
+        "tempo_estimado_s": round(tempo_total, 1),
+        "baseado_em_historico": bool(historico.etapas()),
+    }
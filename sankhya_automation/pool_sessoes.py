@@ -0,0 +1,139 @@
+"""
+Módulo do pool de sessões da API Sankhya.
+O ERP serializa as requisições de cada sessão (mgeSession/usuário); com
+vários conjuntos de credenciais, cada um com o próprio ciclo de vida do
+token e um limite de OPs simultâneas, as OPs são distribuídas entre as
+sessões. O pool expõe a mesma interface usada pelo motor (SankhyaAPI).
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metricas import SESSAO_DURACAO, SESSAO_EM_USO, SESSAO_ESPERA, SESSAO_OPS
+from resiliencia import registrar_natureza_falha, TRANSITORIA
+
+logger = logging.getLogger(__name__)
+
+
+class SessaoPool:
+    """
+    Uma sessão do pool: a instância de SankhyaAPI de um conjunto de
+    credenciais e o número de OPs em andamento nela.
+    """
+
+    def __init__(self, api, limite: int):
+        self.api = api
+        self.nome: str = api.nome
+        self.limite = max(1, limite)
+        self.em_uso = 0
+        self.ops_criadas = 0
+        self.falhas = 0
+        # Renovação do token serializada por sessão.
+        self.lock_token = threading.Lock()
+        SESSAO_EM_USO.definir(0, self.nome)
+
+    def estado(self) -> Dict[str, Any]:
+        return {"nome": self.nome, "limite": self.limite, "em_uso": self.em_uso,
+                "ops_criadas": self.ops_criadas, "falhas": self.falhas, "token_valido": self.api.token_valido()}
+
+
+class PoolSessoes:
+    """
+    Pool de sessões da API Sankhya. Cada OP arrenda a sessão com menor
+    ocupação relativa que ainda tenha vaga; sem vaga, espera a próxima liberação.
+    """
+
+    def __init__(self, fabrica_api: Callable[[Dict[str, Any]], Any], credenciais: List[Dict[str, Any]]):
+        if not credenciais:
+            raise ValueError("O pool de sessões exige ao menos um conjunto de credenciais.")
+        self.sessoes = [SessaoPool(fabrica_api(credencial), credencial.get('max_concorrentes', 1))
+                        for credencial in credenciais]
+        self.nome = "pool"
+        self._condicao = threading.Condition()
+
+    @property
+    def capacidade(self) -> int:
+        return sum(sessao.limite for sessao in self.sessoes)
+
+    @contextmanager
+    def arrendar(self):
+        """
+        Arrenda uma sessão pelo tempo do bloco (devolvida ao sair, mesmo com erro).
+        """
+        inicio = time.perf_counter()
+        with self._condicao:
+            while True:
+                livres = [s for s in self.sessoes if s.em_uso < s.limite]
+                if livres:
+                    sessao = min(livres, key=lambda s: s.em_uso / s.limite)
+                    break
+                self._condicao.wait()
+            sessao.em_uso += 1
+            SESSAO_EM_USO.definir(sessao.em_uso, sessao.nome)
+        SESSAO_ESPERA.observar(time.perf_counter() - inicio)
+        try:
+            yield sessao
+        finally:
+            with self._condicao:
+                sessao.em_uso -= 1
+                SESSAO_EM_USO.definir(sessao.em_uso, sessao.nome)
+                self._condicao.notify()
+
+    def _garantir_token(self, sessao: SessaoPool) -> bool:
+        with sessao.lock_token:
+            return sessao.api.token_valido() or sessao.api.autenticar()
+
+    # --- INTERFACE DA SankhyaAPI ---
+    def criar_ordem_producao(self, dados_produto: Dict[str, Any]) -> Tuple[bool, Optional[int], str]:
+        with self.arrendar() as sessao:
+            inicio = time.perf_counter()
+            try:
+                if not self._garantir_token(sessao):
+                    registrar_natureza_falha(TRANSITORIA)
+                    resultado = (False, None, f"Falha ao autenticar a sessão '{sessao.nome}' da API Sankhya.")
+                else:
+                    resultado = sessao.api.criar_ordem_producao(dados_produto)
+            except Exception:
+                SESSAO_OPS.incrementar(sessao.nome, "erro")
+                sessao.falhas += 1
+                raise
+            finally:
+                SESSAO_DURACAO.observar(time.perf_counter() - inicio, sessao.nome)
+            sucesso = resultado[0] and resultado[1]
+            SESSAO_OPS.incrementar(sessao.nome, "sucesso" if sucesso else "falha")
+            if sucesso:
+                sessao.ops_criadas += 1
+            else:
+                sessao.falhas += 1
+            return resultado
+
+    def autenticar(self) -> bool:
+        """
+        Autentica as sessões com token expirado. Basta uma sessão válida para seguir.
+        """
+        resultados = [self._garantir_token(sessao) for sessao in self.sessoes]
+        for sessao, ok in zip(self.sessoes, resultados):
+            if not ok:
+                logger.error("Falha ao autenticar a sessão '%s' do pool.", sessao.nome)
+        return any(resultados)
+
+    def token_valido(self) -> bool:
+        return all(sessao.api.token_valido() for sessao in self.sessoes)
+
+    def sondar(self) -> bool:
+        """Sonda do disjuntor: um login na primeira sessão."""
+        return self.sessoes[0].api.sondar()
+
+    def testar_conexao(self) -> bool:
+        return all(sessao.api.testar_conexao() for sessao in self.sessoes)
+
+    def logout(self):
+        for sessao in self.sessoes:
+            sessao.api.logout()
+
+    def estado(self) -> Dict[str, Any]:
+        with self._condicao:
+            return {"capacidade": self.capacidade, "sessoes": [sessao.estado() for sessao in self.sessoes]}
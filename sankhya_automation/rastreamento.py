@@ -0,0 +1,164 @@
+"""
+Módulo de rastreamento (tracing) leve em processo.
+Abre spans aninhados por planejamento, chamada à API e comando SQL, grava os
+spans finalizados em um arquivo JSON rotativo (um span por linha, campos no
+formato OTLP) e mantém os spans dos últimos jobs em memória para a linha do
+tempo do dashboard.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from config import APP_CONFIG
+from log_assincrono import criar_handler_assincrono
+
+logger = logging.getLogger(__name__)
+
+# Logger dedicado à gravação dos spans, isolado do log da aplicação.
+_trace_logger = logging.getLogger("sankhya.traces")
+_trace_logger.propagate = False
+
+MAX_JOBS_EM_MEMORIA = 5
+MAX_SPANS_POR_JOB = 20000
+
+_span_atual: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("span_atual", default=None)
+
+
+class Span:
+    """
+    Intervalo de tempo nomeado, com atributos, pertencente a um trace (job).
+    """
+    __slots__ = ("nome", "trace_id", "span_id", "parent_id", "inicio_ns", "fim_ns", "atributos", "status")
+
+    def __init__(self, nome: str, trace_id: str, parent_id: Optional[str], atributos: Dict[str, Any]):
+        self.nome = nome
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.inicio_ns = time.time_ns()
+        self.fim_ns: Optional[int] = None
+        self.atributos = atributos
+        self.status = "OK"
+
+    def para_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.nome,
+            "startTimeUnixNano": self.inicio_ns,
+            "endTimeUnixNano": self.fim_ns,
+            "attributes": self.atributos,
+            "status": self.status,
+        }
+
+
+class _FormatadorSpan(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.args, default=str, ensure_ascii=False)
+
+
+class Rastreador:
+    """
+    Coleta os spans dos jobs de automação.
+    """
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._handler_configurado = False
+
+    def _configurar_arquivo(self):
+        if self._handler_configurado:
+            return
+        self._handler_configurado = True
+        try:
+            handler = RotatingFileHandler(
+                APP_CONFIG['trace_file'],
+                maxBytes=APP_CONFIG['trace_max_bytes'],
+                backupCount=APP_CONFIG['trace_backups'],
+                encoding='utf-8'
+            )
+            handler.setFormatter(_FormatadorSpan())
+            # A serialização e a escrita acontecem na thread do listener.
+            _trace_logger.addHandler(criar_handler_assincrono(handler))
+            _trace_logger.setLevel(logging.INFO)
+        except OSError as e:
+            logger.error("Não foi possível abrir o arquivo de traces: %s", e)
+
+    def iniciar_job(self, trace_id: str):
+        """
+        Registra um novo job (trace), descartando os mais antigos da memória.
+        """
+        self._configurar_arquivo()
+        with self._lock:
+            self._jobs[trace_id] = []
+            while len(self._jobs) > MAX_JOBS_EM_MEMORIA:
+                self._jobs.popitem(last=False)
+
+    def _finalizar(self, span: Span):
+        with self._lock:
+            spans = self._jobs.get(span.trace_id)
+            if spans is not None and len(spans) < MAX_SPANS_POR_JOB:
+                spans.append(span)
+        if _trace_logger.handlers:
+            _trace_logger.info("span", span.para_dict())
+
+    @contextmanager
+    def span(self, nome: str, trace_id: Optional[str] = None, **atributos):
+        """
+        Abre um span filho do span atual (ou a raiz do trace `trace_id`).
+        Sem span atual e sem `trace_id`, não faz nada.
+        """
+        pai = _span_atual.get()
+        if pai is None and trace_id is None:
+            yield None
+            return
+        span = Span(nome, trace_id or pai.trace_id, pai.span_id if pai else None, atributos)
+        token = _span_atual.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.status = "ERROR"
+            span.atributos["erro"] = str(e)
+            raise
+        finally:
+            _span_atual.reset(token)
+            span.fim_ns = time.time_ns()
+            self._finalizar(span)
+
+    def spans_do_job(self, trace_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            spans = self._jobs.get(trace_id)
+            if spans is None:
+                return None
+            spans = list(spans)
+        return [s.para_dict() for s in spans]
+
+    def ultimo_job(self) -> Optional[str]:
+        with self._lock:
+            return next(reversed(self._jobs), None)
+
+
+rastreador = Rastreador()
+
+
+def span(nome: str, trace_id: Optional[str] = None, **atributos):
+    return rastreador.span(nome, trace_id, **atributos)
+
+
+def definir_atributo(chave: str, valor: Any):
+    """
+    Define um atributo no span atual, se houver.
+    """
+    atual = _span_atual.get()
+    if atual is not None:
+        atual.atributos[chave] = valor
@@ -0,0 +1,158 @@
+"""
+Reconciliação entre AD_PLAN e TPRIPROC depois de uma execução.
+Encontra as inconsistências de uma data e braço com poucas consultas por
+conjunto — OPs criadas cujo IDIPROC não foi gravado em AD_PLAN, planejamentos
+com IDIPROC mas sem NROLOTE (ou com NROLOTE diferente do da OP) e IDIPROCs sem
+OP — e corrige as reparáveis com comandos em massa no banco, sem chamar a API.
+O vínculo das OPs órfãs a planejamentos é heurístico (ver PAREAMENTO_ORFAS) e
+só é gravado quando pedido explicitamente (`vincular_orfas`).
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+
+from config import APP_CONFIG
+from motor import IDPROC_PADRAO
+
+logger = logging.getLogger(__name__)
+
+# OP pareada a um único planejamento pendente: grava o IDIPROC apenas com vincular_orfas.
+IDIPROC_NAO_GRAVADO = "idiproc_nao_gravado"
+# OP sem planejamento pendente correspondente (ou com mais de um candidato).
+OP_SEM_PLANEJAMENTO = "op_sem_planejamento"
+# Lote gerado para a OP, mas NROLOTE não gravado em AD_PLAN: copia de TPRIPROC.
+NROLOTE_NAO_GRAVADO = "nrolote_nao_gravado"
+# NROLOTE de AD_PLAN diferente do da OP: prevalece o de TPRIPROC.
+NROLOTE_DIVERGENTE = "nrolote_divergente"
+# OP sem lote em nenhum dos lados: o lote é gerado pela procedure, por rodada.
+SEM_LOTE = "sem_lote"
+# NROLOTE em AD_PLAN, mas a OP não está em lote.
+LOTE_SEM_OP = "lote_sem_op"
+# IDIPROC gravado em AD_PLAN sem OP em TPRIPROC.
+OP_INEXISTENTE = "op_inexistente"
+
+CATEGORIAS = (IDIPROC_NAO_GRAVADO, OP_SEM_PLANEJAMENTO, NROLOTE_NAO_GRAVADO, NROLOTE_DIVERGENTE,
+              SEM_LOTE, LOTE_SEM_OP, OP_INEXISTENTE)
+REPARAVEIS = frozenset({IDIPROC_NAO_GRAVADO, NROLOTE_NAO_GRAVADO, NROLOTE_DIVERGENTE, SEM_LOTE})
+
+# Descrição do pareamento OP órfã → planejamento, devolvida no relatório.
+PAREAMENTO_ORFAS = (
+    "Heurístico: a OP órfã é pareada ao planejamento pendente da data com o mesmo produto e quantidade, "
+    "na ordem de IDIPROC e NUPLAN, quando há tantas OPs quanto pendentes. Não há chave que ligue a OP ao "
+    "NUPLAN: uma OP manual do mesmo produto ou planejamentos iguais em rodadas diferentes podem ser "
+    "pareados errado. Confira os pares antes de gravá-los com vincular_orfas."
+)
+
+
+def _classificar_lote(divergencia: Dict[str, Any]) -> str:
+    if not divergencia["OP_EXISTE"]:
+        return OP_INEXISTENTE
+    if divergencia["NROLOTE_OP"] is not None:
+        return NROLOTE_NAO_GRAVADO if divergencia["NROLOTE_PLAN"] is None else NROLOTE_DIVERGENTE
+    return SEM_LOTE if divergencia["NROLOTE_PLAN"] is None else LOTE_SEM_OP
+
+
+def reconciliar(db, data_planejamento: str, braco: int, corrigir: bool = True,
+                vincular_orfas: bool = False) -> Dict[str, Any]:
+    """
+    Reconcilia AD_PLAN e TPRIPROC para uma data (YYYY-MM-DD) e braço.
+
+    Os pares OP órfã → planejamento (idiproc_nao_gravado) vêm de um pareamento
+    heurístico e, por padrão, são apenas relatados; com `corrigir` e
+    `vincular_orfas`, são gravados primeiro, e as OPs que ainda não têm lote
+    aparecem na consulta de divergências de lote da mesma reconciliação.
+    Sem `corrigir`, apenas relata (as OPs órfãs pareadas não são reavaliadas
+    quanto ao lote). Uma correção que falha no banco não interrompe as
+    demais, mas a reconciliação termina sem sucesso, com o erro no relatório.
+
+    Returns:
+        Dict[str, Any]: Relatório com as divergências por categoria, os totais,
+        os corrigidos por categoria e as que continuam pendentes.
+    """
+    inicio = time.perf_counter()
+    divergencias: Dict[str, List[Dict[str, Any]]] = {categoria: [] for categoria in CATEGORIAS}
+    vincular_orfas = corrigir and vincular_orfas
+    corrigidos: Dict[str, int] = {categoria: 0 for categoria in CATEGORIAS if categoria in REPARAVEIS
+                                  and (vincular_orfas or categoria != IDIPROC_NAO_GRAVADO)}
+    relatorio: Dict[str, Any] = {"data": data_planejamento, "braco": braco, "corrigir": corrigir,
+                                 "vincular_orfas": vincular_orfas, "pareamento_orfas": PAREAMENTO_ORFAS,
+                                 "sucesso": False, "divergencias": divergencias, "corrigidos": corrigidos}
+
+    orfas = db.buscar_ops_sem_planejamento(data_planejamento, braco, IDPROC_PADRAO,
+                                           APP_CONFIG['reconciliacao_janela_dias'])
+    if orfas is None:
+        relatorio["erro"] = "Falha ao consultar as OPs sem planejamento."
+        return relatorio
+    for orfa in orfas:
+        categoria = IDIPROC_NAO_GRAVADO if orfa["NUPLAN"] is not None else OP_SEM_PLANEJAMENTO
+        divergencias[categoria].append({"idiproc": orfa["IDIPROC"], "nuplan": orfa["NUPLAN"], "rodada": orfa["RODADA"],
+                                        "codprod": orfa["CODPROD"], "quantidade": orfa["QTD"]})
+    falhas: List[str] = []
+    if vincular_orfas and divergencias[IDIPROC_NAO_GRAVADO]:
+        vinculados = db.vincular_idiprocs([(d["nuplan"], d["idiproc"]) for d in divergencias[IDIPROC_NAO_GRAVADO]])
+        if vinculados is None:
+            falhas.append("Falha ao gravar os IDIPROCs das OPs sem planejamento.")
+        else:
+            corrigidos[IDIPROC_NAO_GRAVADO] = vinculados
+
+    lote = db.buscar_divergencias_lote(data_planejamento, braco)
+    if lote is None:
+        relatorio["erro"] = "Falha ao consultar as divergências de lote."
+        return relatorio
+    for divergencia in lote:
+        divergencias[_classificar_lote(divergencia)].append({
+            "nuplan": divergencia["NUPLAN"], "rodada": divergencia["RODADA"], "idiproc": divergencia["IDIPROC"],
+            "nrolote_plan": divergencia["NROLOTE_PLAN"], "nrolote_op": divergencia["NROLOTE_OP"]})
+
+    if corrigir:
+        copiar = [d["nuplan"] for categoria in (NROLOTE_NAO_GRAVADO, NROLOTE_DIVERGENTE) for d in divergencias[categoria]]
+        atualizados = db.copiar_nrolote_de_tpriproc(copiar)
+        if atualizados is None:
+            falhas.append("Falha ao copiar o NROLOTE de TPRIPROC para AD_PLAN.")
+        else:
+            # O MERGE não distingue as categorias; a contagem é atribuída na ordem da lista.
+            corrigidos[NROLOTE_NAO_GRAVADO] = min(atualizados, len(divergencias[NROLOTE_NAO_GRAVADO]))
+            corrigidos[NROLOTE_DIVERGENTE] = atualizados - corrigidos[NROLOTE_NAO_GRAVADO]
+        corrigidos[SEM_LOTE], falhas_lote = _gerar_lotes_pendentes(db, braco, divergencias[SEM_LOTE])
+        falhas.extend(falhas_lote)
+
+    totais = {categoria: len(itens) for categoria, itens in divergencias.items()}
+    relatorio.update({
+        "sucesso": not falhas,
+        "totais": totais,
+        "total": sum(totais.values()),
+        "total_corrigido": sum(corrigidos.values()),
+        "pendentes": sum(totais.values()) - sum(corrigidos.values()),
+        "duracao_s": round(time.perf_counter() - inicio, 3),
+    })
+    if falhas:
+        relatorio["erro"] = " ".join(falhas)
+    logger.info("Reconciliação da data %s, braço %s: %s divergências, %s corrigidas.",
+                data_planejamento, braco, relatorio["total"], relatorio["total_corrigido"])
+    return relatorio
+
+
+def _gerar_lotes_pendentes(db, braco: int, sem_lote: List[Dict[str, Any]]) -> Tuple[int, List[str]]:
+    """
+    Gera, com uma chamada da procedure por rodada, o lote das OPs sem lote e
+    grava o NROLOTE em AD_PLAN. Retorna a quantidade de planejamentos
+    corrigidos e as mensagens das rodadas que falharam.
+    """
+    por_rodada: Dict[int, Dict[int, Any]] = {}
+    for divergencia in sem_lote:
+        por_rodada.setdefault(divergencia["rodada"], {})[divergencia["idiproc"]] = divergencia["nuplan"]
+    corrigidos = 0
+    falhas: List[str] = []
+    for rodada, nuplan_por_idiproc in sorted(por_rodada.items()):
+        lotes = db.gerar_lotes_para_ops(list(nuplan_por_idiproc), braco)
+        if not lotes:
+            logger.error("Reconciliação: falha ao gerar o lote da rodada %s (braço %s).", rodada, braco)
+            falhas.append(f"Falha ao gerar o lote da rodada {rodada}.")
+        for nrolote, idiprocs in lotes.items():
+            nuplans = [nuplan_por_idiproc[i] for i in idiprocs if i in nuplan_por_idiproc]
+            if db.atualizar_lote_em_ad_plan(nrolote, nuplans):
+                corrigidos += len(nuplans)
+            else:
+                falhas.append(f"Falha ao gravar o lote {nrolote} da rodada {rodada} em AD_PLAN.")
+    return corrigidos, falhas
@@ -0,0 +1,271 @@
+"""
+Módulo de resiliência das chamadas à API Sankhya.
+Implementa o prazo total (deadline) de cada OP, propagado pelas etapas via
+contextvars, a natureza (transitória ou permanente) das falhas de uma OP,
+coletada da mesma forma, e um disjuntor (circuit breaker) que abre após falhas
+consecutivas, suspende as chamadas e libera uma única sonda após a espera.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import APP_CONFIG
+from metricas import DISJUNTOR_ESTADO, DISJUNTOR_ABERTURAS
+
+logger = logging.getLogger(__name__)
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+# Valor exportado na métrica de estado do disjuntor.
+_VALOR_ESTADO = {FECHADO: 0, MEIO_ABERTO: 1, ABERTO: 2}
+# Intervalo máximo entre as verificações de cancelamento enquanto outra thread sonda.
+ESPERA_RESULTADO_SONDA = 0.5
+
+# Natureza de uma falha: a transitória (timeout, rede, 5xx/429, disjuntor aberto,
+# sessão expirada) pode dar certo em uma nova tentativa; a permanente, não.
+TRANSITORIA = "transitoria"
+PERMANENTE = "permanente"
+
+_prazo_atual: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("prazo_atual", default=None)
+_falhas_atuais: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("falhas_atuais", default=None)
+
+
+class PrazoEsgotado(Exception):
+    """
+    O prazo total da operação terminou antes da próxima etapa.
+    """
+
+
+@contextmanager
+def prazo(segundos: float):
+    """
+    Define o prazo total (em segundos a partir de agora) das chamadas feitas
+    dentro do bloco. Um prazo externo mais curto prevalece.
+    """
+    limite = time.monotonic() + segundos
+    externo = _prazo_atual.get()
+    token = _prazo_atual.set(limite if externo is None else min(limite, externo))
+    try:
+        yield
+    finally:
+        _prazo_atual.reset(token)
+
+
+def prazo_restante() -> Optional[float]:
+    """
+    Segundos restantes do prazo atual, ou None fora de um bloco `prazo`.
+    """
+    limite = _prazo_atual.get()
+    return None if limite is None else limite - time.monotonic()
+
+
+def timeout_da_chamada(conexao: float, leitura: float) -> Tuple[float, float]:
+    """
+    Timeout (conexão, leitura) de uma chamada HTTP, limitado ao prazo restante.
+
+    Raises:
+        PrazoEsgotado: Se o prazo atual já terminou.
+    """
+    restante = prazo_restante()
+    if restante is None:
+        return conexao, leitura
+    if restante <= 0:
+        raise PrazoEsgotado("Prazo total da operação esgotado.")
+    return min(conexao, restante), min(leitura, restante)
+
+
+@contextmanager
+def coletar_falhas():
+    """
+    Coleta, em ordem, a natureza das falhas das chamadas feitas dentro do bloco
+    (uma lista de TRANSITORIA/PERMANENTE); a última decide se vale tentar de novo.
+    """
+    falhas: List[str] = []
+    token = _falhas_atuais.set(falhas)
+    try:
+        yield falhas
+    finally:
+        _falhas_atuais.reset(token)
+
+
+def registrar_natureza_falha(natureza: str):
+    """
+    Registra a natureza de uma falha no bloco `coletar_falhas` atual (se houver).
+    """
+    falhas = _falhas_atuais.get()
+    if falhas is not None:
+        falhas.append(natureza)
+
+
+class Disjuntor:
+    """
+    Disjuntor de chamadas a um serviço externo.
+
+    Fechado: as chamadas passam e as falhas consecutivas são contadas.
+    Aberto: as chamadas são recusadas até o fim da espera.
+    Meio aberto: uma única chamada (a sonda) é liberada; sucesso fecha o
+    disjuntor e falha o reabre com a espera dobrada (até o máximo).
+    Falhas de chamadas que já estavam em andamento quando o disjuntor abriu
+    são apenas contadas: não dobram a espera nem adiam a sonda.
+    """
+
+    def __init__(self, nome: str, limite_falhas: int, espera_segundos: float, espera_maxima_segundos: float):
+        self.nome = nome
+        self.limite_falhas = max(1, limite_falhas)
+        self.espera_segundos = espera_segundos
+        self.espera_maxima_segundos = max(espera_segundos, espera_maxima_segundos)
+        self._estado = FECHADO
+        self._falhas_consecutivas = 0
+        self._espera_atual = espera_segundos
+        self._aberto_ate = 0.0
+        self._sonda_em_andamento = False
+        self._ouvintes: List[Callable[[Dict[str, Any]], None]] = []
+        # Reentrante: os ouvintes podem consultar o estado durante a notificação.
+        self._lock = threading.RLock()
+        # Sinalizada quando a sonda em andamento termina (com sucesso ou falha).
+        self._sonda_concluida = threading.Condition(self._lock)
+        DISJUNTOR_ESTADO.definir(_VALOR_ESTADO[FECHADO], nome)
+
+    def _estado_efetivo(self) -> str:
+        if self._estado == ABERTO and time.monotonic() >= self._aberto_ate:
+            return MEIO_ABERTO
+        return self._estado
+
+    def permitir(self) -> bool:
+        """
+        Indica se uma chamada pode ser feita agora. No estado meio aberto,
+        libera apenas a primeira chamada (a sonda).
+        """
+        with self._lock:
+            estado = self._estado_efetivo()
+            if estado == FECHADO:
+                return True
+            if estado == MEIO_ABERTO and not self._sonda_em_andamento:
+                self._sonda_em_andamento = True
+                self._mudar_estado(MEIO_ABERTO)
+                return True
+            return False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._falhas_consecutivas = 0
+            self._sonda_em_andamento = False
+            self._sonda_concluida.notify_all()
+            if self._estado != FECHADO:
+                self._espera_atual = self.espera_segundos
+                self._mudar_estado(FECHADO)
+                logger.info("Disjuntor '%s' fechado: serviço respondendo novamente.", self.nome)
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas_consecutivas += 1
+            if self._sonda_em_andamento:
+                self._reabrir_apos_sonda()
+            elif self._estado == FECHADO and self._falhas_consecutivas >= self.limite_falhas:
+                self._abrir()
+
+    def _reabrir_apos_sonda(self):
+        # A sonda falhou: reabre com espera maior.
+        self._sonda_em_andamento = False
+        self._espera_atual = min(self._espera_atual * 2, self.espera_maxima_segundos)
+        self._abrir()
+        self._sonda_concluida.notify_all()
+
+    def _abrir(self):
+        self._aberto_ate = time.monotonic() + self._espera_atual
+        DISJUNTOR_ABERTURAS.incrementar(self.nome)
+        self._mudar_estado(ABERTO)
+        logger.warning("Disjuntor '%s' aberto após %s falhas consecutivas; nova sonda em %.0fs.",
+                       self.nome, self._falhas_consecutivas, self._espera_atual)
+
+    def _mudar_estado(self, estado: str):
+        self._estado = estado
+        DISJUNTOR_ESTADO.definir(_VALOR_ESTADO[estado], self.nome)
+        instantaneo = self._instantaneo()
+        for ouvinte in list(self._ouvintes):
+            try:
+                ouvinte(instantaneo)
+            except Exception as e:
+                logger.error("Erro ao notificar mudança do disjuntor: %s", e)
+
+    def _instantaneo(self) -> Dict[str, Any]:
+        estado = self._estado_efetivo()
+        return {
+            "nome": self.nome,
+            "estado": estado,
+            "falhas_consecutivas": self._falhas_consecutivas,
+            "sonda_em_s": round(max(0.0, self._aberto_ate - time.monotonic()), 1) if estado == ABERTO else 0.0,
+        }
+
+    def estado(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._instantaneo()
+
+    def segundos_para_sonda(self) -> float:
+        with self._lock:
+            return max(0.0, self._aberto_ate - time.monotonic()) if self._estado_efetivo() == ABERTO else 0.0
+
+    def adicionar_ouvinte(self, ouvinte: Callable[[Dict[str, Any]], None]):
+        """
+        Registra uma função chamada (com o estado) a cada mudança de estado.
+        """
+        self._ouvintes.append(ouvinte)
+
+    def aguardar(self, sonda: Callable[[], bool], ao_aguardar: Optional[Callable[[float], None]] = None,
+                 cancelado: Optional[threading.Event] = None) -> bool:
+        """
+        Pausa enquanto o disjuntor estiver aberto: espera o fim de cada janela e
+        executa `sonda` (uma chamada barata que passa pelo disjuntor) até ele fechar.
+
+        Args:
+            sonda: Chamada de teste; seu resultado é registrado pelo próprio cliente.
+            ao_aguardar: Notificado com os segundos de espera antes de cada pausa.
+            cancelado: Evento que interrompe a espera.
+
+        Returns:
+            bool: True quando o disjuntor está fechado; False se a espera foi cancelada.
+        """
+        while True:
+            with self._lock:
+                estado = self._estado_efetivo()
+                if estado == MEIO_ABERTO and self._sonda_em_andamento:
+                    # Outra thread está sondando: aguarda o resultado em vez de sondar de novo.
+                    self._sonda_concluida.wait(ESPERA_RESULTADO_SONDA)
+                    if cancelado is not None and cancelado.is_set():
+                        return False
+                    continue
+            if estado == FECHADO:
+                return True
+            espera = self.segundos_para_sonda()
+            if espera > 0:
+                if ao_aguardar:
+                    ao_aguardar(espera)
+                if cancelado is not None:
+                    if cancelado.wait(espera):
+                        return False
+                else:
+                    time.sleep(espera)
+                continue
+            sucesso = sonda()
+            with self._lock:
+                # A sonda pode não ter passado pelo disjuntor (ex.: falha antes da requisição).
+                nao_registrada = self._estado_efetivo() == MEIO_ABERTO and not self._sonda_em_andamento
+                if nao_registrada and not sucesso:
+                    self._falhas_consecutivas += 1
+                    self._reabrir_apos_sonda()
+            if nao_registrada and sucesso:
+                self.registrar_sucesso()
+
+
+disjuntor_api = Disjuntor(
+    "sankhya_api",
+    APP_CONFIG['disjuntor_falhas'],
+    APP_CONFIG['disjuntor_espera'],
+    APP_CONFIG['disjuntor_espera_maxima'],
+)
@@ -5,60 +5,128 @@ Módulo para integração com a API Sankhya.
 import logging
 import requests
 import json
+import time
 from typing import Dict, Any, Optional, Tuple, List
 from datetime import datetime
 from config import SANKHYA_CONFIG, APP_CONFIG
+from metricas import medir_api, API_ERROS
+from rastreamento import definir_atributo
+from log_assincrono import log_diagnostico
+from resiliencia import (disjuntor_api, prazo, timeout_da_chamada, PrazoEsgotado, registrar_natureza_falha,
+                         TRANSITORIA, PERMANENTE)
 
 # ... (código anterior da classe SankhyaAPI) ...
 logger = logging.getLogger(__name__)
 
 RESOURCE_ID = "br.com.sankhya.prod.OrdensProducaoHTML"
+# Status do serviço Sankhya para sessão expirada/não autorizada (resolvido por um novo login).
+STATUS_SESSAO_EXPIRADA = "3"
+# Respostas HTTP 4xx que uma nova tentativa pode resolver (as demais são permanentes).
+HTTP_TRANSITORIOS = frozenset({401, 408, 429})
+# Serviços que efetivam a OP: uma falha depois do envio (timeout de leitura, 5xx) é
+# ambígua — a OP pode ter sido lançada — e não é repetida (a reconciliação a encontra).
+SERVICOS_NAO_IDEMPOTENTES = frozenset({"LancamentoOrdemProducaoSP.lancarOrdensDeProducao"})
+
+
+def _registrar_falha_apos_envio(service_name: str):
+    registrar_natureza_falha(PERMANENTE if service_name in SERVICOS_NAO_IDEMPOTENTES else TRANSITORIA)
+
+
+class CircuitoAberto(requests.exceptions.ConnectionError):
+    """Chamada recusada localmente: o disjuntor da API Sankhya está aberto."""
+
+
+class PrazoOpEsgotado(requests.exceptions.Timeout):
+    """O prazo total da OP terminou antes da chamada."""
+
 
 class SankhyaAPI:
-    def __init__(self):
-        # Carrega as configurações essenciais no construtor
+    def __init__(self, credencial: Optional[Dict[str, Any]] = None):
+        # Carrega as configurações essenciais no construtor; `credencial` é um
+        # conjunto do pool de sessões (padrão: as credenciais do SANKHYA_CONFIG).
+        self.credencial: Dict[str, Any] = credencial or SANKHYA_CONFIG
+        self.nome: str = self.credencial.get('nome') or self.credencial.get('username') or "padrao"
         self.bearer_token: Optional[str] = None
-        self.client_token: Optional[str] = SANKHYA_CONFIG.get('client_token')
-        self.mge_session: Optional[str] = SANKHYA_CONFIG.get('mge_session')
-        self.session = requests.Session()
-        self.session.timeout = APP_CONFIG.get('timeout', 60)
-        logger.info("Instância da SankhyaAPI criada.")
-        self.timeout = int(APP_CONFIG.get('timeout', 120))
+        self.token_obtido_em: Optional[float] = None
+        self.client_token: Optional[str] = self.credencial.get('client_token')
+        self.mge_session: Optional[str] = self.credencial.get('mge_session')
+        self.session = self._criar_sessao()
+        logger.info("Instância da SankhyaAPI criada (sessão '%s').", self.nome)
+
+    @staticmethod
+    def _criar_sessao():
+        """
+        Sessão HTTP da instância: a real, a real com gravação (SANKHYA_GRAVAR) ou
+        a reprodução de uma gravação (SANKHYA_REPRODUZIR).
+        """
+        if APP_CONFIG['sankhya_reproduzir']:
+            from gravacao_api import SessaoReproducao
+            return SessaoReproducao(APP_CONFIG['sankhya_reproduzir'], APP_CONFIG['sankhya_reproduzir_velocidade'])
+        if APP_CONFIG['sankhya_gravar']:
+            from gravacao_api import SessaoGravadora
+            return SessaoGravadora(requests.Session(), APP_CONFIG['sankhya_gravar'])
+        return requests.Session()
+
+    def _post(self, url: str, leitura: Optional[float] = None, **kwargs) -> requests.Response:
+        """
+        POST com timeouts separados de conexão e leitura (limitados ao prazo da OP
+        em andamento) e protegido pelo disjuntor. Erros de rede, timeouts e
+        respostas 5xx/429 contam como falha do serviço.
+        """
+        try:
+            timeout = timeout_da_chamada(APP_CONFIG['connect_timeout'], leitura or APP_CONFIG['read_timeout'])
+        except PrazoEsgotado as e:
+            raise PrazoOpEsgotado(str(e)) from e
+        if not disjuntor_api.permitir():
+            raise CircuitoAberto("Disjuntor da API Sankhya aberto; chamada não enviada.")
+        try:
+            response = self.session.post(url, timeout=timeout, **kwargs)
+        except requests.RequestException:
+            disjuntor_api.registrar_falha()
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            disjuntor_api.registrar_falha()
+        else:
+            disjuntor_api.registrar_sucesso()
+        return response
 
     def autenticar(self) -> bool:
         """Etapa 1: Realiza autenticação para obter o bearerToken."""
         logger.info("Iniciando nova autenticação na API Sankhya...")
         
         # Valida as configurações carregadas no construtor
-        if not all([self.client_token, self.mge_session]):
+        # Na reprodução de uma gravação, as credenciais não são necessárias.
+        if not all([self.client_token, self.mge_session]) and not getattr(self.session, 'reproduzindo', False):
             logger.error("Erro Crítico: SANKHYA_CLIENT_TOKEN ou SANKHYA_MGE_SESSION não estão definidos na configuração.")
             return False
 
         headers = {
             'token': self.client_token,
-            'appkey': SANKHYA_CONFIG['app_key'],
-            'username': SANKHYA_CONFIG['username'],
-            'password': SANKHYA_CONFIG['password']
+            'appkey': self.credencial['app_key'],
+            'username': self.credencial['username'],
+            'password': self.credencial['password']
         }
         try:
-            response = self.session.post(SANKHYA_CONFIG['login_url'], headers=headers)
-            response.raise_for_status()
-            data = response.json()
+            with medir_api("login"):
+                response = self._post(SANKHYA_CONFIG['login_url'], headers=headers)
+                response.raise_for_status()
+                data = response.json()
             
             self.bearer_token = data.get("bearerToken")
             
             if self.bearer_token:
+                self.token_obtido_em = time.monotonic()
                 logger.info("Autenticação realizada com sucesso (bearerToken obtido e armazenado).")
                 return True
             else:
                 error_msg = data.get('statusMessage', 'bearerToken não encontrado na resposta de login.')
-                logger.error(f"Falha na autenticação: {error_msg}")
+                logger.error("Falha na autenticação: %s", error_msg)
                 return False
         except requests.RequestException as e:
-            logger.error(f"Erro na requisição de autenticação: {e}", exc_info=True)
+            logger.error("Erro na requisição de autenticação: %s", e, exc_info=True)
             return False
         except json.JSONDecodeError:
-            logger.error(f"Falha ao decodificar a resposta JSON da autenticação. Resposta recebida: {response.text}")
+            logger.error("Falha ao decodificar a resposta JSON da autenticação. Resposta recebida: %s", response.text)
             return False
     def _executar_chamada_api(self, service_name: str, payload: Dict) -> Optional[Dict]:
         """
@@ -66,32 +134,62 @@ class SankhyaAPI:
         """
         if not self.bearer_token:
             logger.error("Tentativa de chamada à API sem bearerToken.")
+            registrar_natureza_falha(TRANSITORIA)
             return None
 
         params = {"serviceName": service_name, "outputType": "json", "mgeSession": self.mge_session, "resourceID": RESOURCE_ID}
         headers = {'Authorization': f'Bearer {self.bearer_token}', 'Content-Type': 'application/json'}
         
         try:
-            # --- MELHORIA ADICIONADA AQUI ---
-            # Passa explicitamente o timeout para a requisição.
-            response = self.session.post(
-                SANKHYA_CONFIG['gateway_url'], 
-                headers=headers, 
-                params=params, 
-                json=payload,
-                timeout=self.timeout 
-            )
-            response.raise_for_status()
-            return response.json()
+            # Timeouts de conexão/leitura, prazo da OP e disjuntor aplicados em _post.
+            with medir_api(service_name):
+                response = self._post(
+                    SANKHYA_CONFIG['gateway_url'], 
+                    headers=headers, 
+                    params=params, 
+                    json=payload
+                )
+                response.raise_for_status()
+                data = response.json()
+            if data.get("status") != "1":
+                API_ERROS.incrementar(service_name, "status")
+                if data.get("status") == STATUS_SESSAO_EXPIRADA:
+                    self._invalidar_token()
+                    registrar_natureza_falha(TRANSITORIA)
+                else:
+                    registrar_natureza_falha(PERMANENTE)
+            return data
 
         except json.JSONDecodeError:
-            logger.error(f"Falha ao decodificar JSON do serviço '{service_name}'. Status: {response.status_code}, Resposta: {response.text}")
+            # Em geral, uma página de erro do gateway no lugar do JSON.
+            logger.error("Falha ao decodificar JSON do serviço '%s'. Status: %s, Resposta: %s", service_name, response.status_code, response.text)
+            _registrar_falha_apos_envio(service_name)
+            return None
+        except PrazoOpEsgotado:
+            logger.error("Prazo da OP esgotado antes do serviço '%s'.", service_name)
+            registrar_natureza_falha(TRANSITORIA)
+            return None
+        except requests.exceptions.ConnectTimeout:
+            logger.error("Timeout de conexão ao chamar o serviço '%s'.", service_name)
+            registrar_natureza_falha(TRANSITORIA)
             return None
         except requests.exceptions.Timeout:
-            logger.error(f"Timeout ao chamar o serviço '{service_name}'. O servidor não respondeu a tempo.")
+            logger.error("Timeout ao chamar o serviço '%s'. O servidor não respondeu a tempo.", service_name)
+            _registrar_falha_apos_envio(service_name)
+            return None
+        except CircuitoAberto:
+            logger.error("Serviço '%s' não chamado: disjuntor da API aberto.", service_name)
+            registrar_natureza_falha(TRANSITORIA)
             return None
         except requests.RequestException as e:
-            logger.error(f"Erro de requisição no serviço '{service_name}': {e}", exc_info=True)
+            logger.error("Erro de requisição no serviço '%s': %s", service_name, e, exc_info=True)
+            status = e.response.status_code if e.response is not None else None
+            if status == 401:
+                self._invalidar_token()
+            if status is not None and status < 500 and status not in HTTP_TRANSITORIOS:
+                registrar_natureza_falha(PERMANENTE)
+            else:
+                _registrar_falha_apos_envio(service_name)
             return None
 
     # O restante dos métodos (_get_new_nulop, _inserir_produto, etc.) não precisa de alteração,
@@ -105,10 +203,10 @@ class SankhyaAPI:
         
         if data and data.get("status") == "1":
             nulop = data.get("responseBody", {}).get("lancamento", {}).get("nulop")
-            logger.info(f"Rascunho NULOP {nulop} criado com sucesso.")
+            logger.info("Rascunho NULOP %s criado com sucesso.", nulop)
             return int(nulop)
         elif data:
-            logger.error(f"Erro ao obter NULOP: {data.get('statusMessage')}")
+            logger.error("Erro ao obter NULOP: %s", data.get('statusMessage'))
         return None
     # ... (métodos _get_new_nulop, _inserir_produto, _validar_lote, _lancar_op, criar_ordem_producao continuam iguais) ...
     def _get_new_nulop(self) -> Optional[int]:
@@ -120,16 +218,16 @@ class SankhyaAPI:
         
         if data and data.get("status") == "1":
             nulop = data.get("responseBody", {}).get("lancamento", {}).get("nulop")
-            logger.info(f"Rascunho NULOP {nulop} criado com sucesso.")
+            logger.info("Rascunho NULOP %s criado com sucesso.", nulop)
             return int(nulop)
         elif data:
             status_message = data.get('statusMessage', 'Nenhuma mensagem de status específica foi encontrada.')
-            logger.error(f"Erro ao obter NULOP: {status_message}")
-            logger.error(f"Resposta completa da API (diagnóstico): {json.dumps(data, indent=2)}")
+            logger.error("Erro ao obter NULOP: %s", status_message)
+            log_diagnostico(logger, "Resposta completa da API (diagnóstico)", data)
         return None
 
     def _inserir_produto(self, nulop: int, dados_produto: Dict[str, Any]) -> bool:
-        logger.info(f"Inserindo produto no NULOP {nulop}...")
+        logger.info("Inserindo produto no NULOP %s...", nulop)
         service_name = "LancamentoOrdemProducaoSP.inserirProdutoHTML5"
         payload = {"serviceName": service_name, "requestBody": {"params": {
             "nulop": str(nulop), "codprod": str(dados_produto.get("CODPRODPA")), "idproc": str(dados_produto.get("IDPROC")),
@@ -144,8 +242,8 @@ class SankhyaAPI:
             return True
         elif data:
             status_message = data.get('statusMessage', 'Nenhuma mensagem de status específica foi encontrada.')
-            logger.error(f"Erro ao inserir produto: {status_message}")
-            logger.error(f"Resposta completa da API (diagnóstico): {json.dumps(data, indent=2)}")
+            logger.error("Erro ao inserir produto: %s", status_message)
+            log_diagnostico(logger, "Resposta completa da API (diagnóstico)", data)
         return False
 
     def _validar_lote(self, dados_produto: Dict[str, Any]) -> bool:
@@ -156,21 +254,22 @@ class SankhyaAPI:
         payload = {"serviceName": service_name, "requestBody": {"params": {"tamLote": str(dados_produto.get("TAMLOTE")), "multiploIdeal": "0", "minLote": "0"}}}
         headers = {'Authorization': f'Bearer {self.bearer_token}', 'Content-Type': 'application/json'}
         try:
-            response = self.session.post(SANKHYA_CONFIG['gateway_url'], headers=headers, params=params, json=payload)
-            response.raise_for_status()
-            data = response.json()
+            with medir_api(service_name):
+                response = self._post(SANKHYA_CONFIG['gateway_url'], headers=headers, params=params, json=payload)
+                response.raise_for_status()
+                data = response.json()
             if data.get("status") == "1":
                 logger.info("Validação de lote OK.")
                 return True
             else:
-                logger.warning(f"Aviso na validação do lote: {data.get('statusMessage')}")
+                logger.warning("Aviso na validação do lote: %s", data.get('statusMessage'))
                 return True # Continua mesmo com avisos
         except requests.RequestException as e:
-            logger.error(f"Erro na requisição de validação de lote: {e}", exc_info=True)
+            logger.error("Erro na requisição de validação de lote: %s", e, exc_info=True)
             return False
 
     def _lancar_op(self, nulop: int) -> Optional[int]:
-        logger.info(f"Finalizando e lançando a OP para o NULOP {nulop}...")
+        logger.info("Finalizando e lançando a OP para o NULOP %s...", nulop)
         service_name = "LancamentoOrdemProducaoSP.lancarOrdensDeProducao"
         payload = {"serviceName": service_name, "requestBody": {"params": {"nulop": str(nulop), "ignorarWarnings": "N"}}}
         
@@ -180,22 +279,30 @@ class SankhyaAPI:
             ordens = data.get("responseBody", {}).get("ordens", {}).get("ordem", [])
             if isinstance(ordens, dict): ordens = [ordens]
             id_op = ordens[0].get("$")
-            logger.info(f"Ordem de Produção {id_op} lançada com sucesso!")
+            logger.info("Ordem de Produção %s lançada com sucesso!", id_op)
             return int(id_op)
         elif data:
             # --- MELHORIA DE LOG APLICADA AQUI ---
             # Tenta obter a mensagem de status, mas se não existir, informa e mostra a resposta completa.
             status_message = data.get('statusMessage', 'Nenhuma mensagem de status específica foi encontrada.')
-            logger.error(f"Erro ao lançar OP: {status_message}")
-            logger.error(f"Resposta completa da API (diagnóstico): {json.dumps(data, indent=2)}")
+            logger.error("Erro ao lançar OP: %s", status_message)
+            log_diagnostico(logger, "Resposta completa da API (diagnóstico)", data)
         # Se 'data' for None (erro de conexão/timeout), a mensagem já foi logada em _executar_chamada_api
         return None
 
     def criar_ordem_producao(self, dados_produto: Dict[str, Any]) -> Tuple[bool, Optional[int], str]:
-        """Orquestra o fluxo completo de criação de uma Ordem de Produção."""
+        """
+        Orquestra o fluxo completo de criação de uma Ordem de Produção.
+        Todas as etapas compartilham o prazo total APP_CONFIG['prazo_op'].
+        """
+        with prazo(APP_CONFIG['prazo_op']):
+            return self._criar_ordem_producao(dados_produto)
+
+    def _criar_ordem_producao(self, dados_produto: Dict[str, Any]) -> Tuple[bool, Optional[int], str]:
         nulop = self._get_new_nulop()
         if not nulop:
             return False, None, "Falha ao criar o rascunho (NULOP)."
+        definir_atributo("NULOP", nulop)
 
         if not self._inserir_produto(nulop, dados_produto):
             return False, None, "Falha ao inserir o produto no rascunho."
@@ -220,7 +327,7 @@ class SankhyaAPI:
         Returns:
             Optional[str]: O número da rodada gerado, ou None em caso de falha.
         """
-        logger.info(f"Acionando 'Gerar Rodada Vasap' para {len(idiprocs)} OPs...")
+        logger.info("Acionando 'Gerar Rodada Vasap' para %s OPs...", len(idiprocs))
         
         # Monta o payload conforme a imagem fornecida
         service_name = "ActionButtonsSP.executeSTP"
@@ -245,11 +352,12 @@ class SankhyaAPI:
         params = {"serviceName": service_name, "outputType": "json", "mgeSession": self.mge_session}
 
         try:
-            response = self.session.post(SANKHYA_CONFIG['gateway_url'], headers=headers, params=params, json=payload)
-            response.raise_for_status()
-            data = response.json()
+            with medir_api(service_name):
+                response = self._post(SANKHYA_CONFIG['gateway_url'], headers=headers, params=params, json=payload)
+                response.raise_for_status()
+                data = response.json()
             
-            logger.debug(f"Resposta completa de gerar_rodada_vasap: {json.dumps(data, indent=2)}")
+            log_diagnostico(logger, "Resposta completa de gerar_rodada_vasap", data, logging.DEBUG)
 
             if data.get("status") == "1":
                 # A resposta de um botão de ação geralmente vem em 'pendingArgs' ou 'pk'
@@ -268,17 +376,17 @@ class SankhyaAPI:
                         numero_rodada = match.group(1)
 
                 if numero_rodada:
-                    logger.info(f"Rodada Vasap número '{numero_rodada}' gerada com sucesso.")
+                    logger.info("Rodada Vasap número '%s' gerada com sucesso.", numero_rodada)
                     return str(numero_rodada)
                 else:
                     logger.warning("Ação 'Gerar Rodada' executada, mas não foi possível extrair o número da rodada da resposta.")
                     # Retorna um valor padrão ou None, dependendo da regra de negócio
                     return None
             else:
-                logger.error(f"Erro ao acionar 'Gerar Rodada': {data.get('statusMessage')}")
+                logger.error("Erro ao acionar 'Gerar Rodada': %s", data.get('statusMessage'))
                 return None
         except requests.RequestException as e:
-            logger.error(f"Erro na requisição para 'Gerar Rodada': {e}", exc_info=True)
+            logger.error("Erro na requisição para 'Gerar Rodada': %s", e, exc_info=True)
             return None
 
     def logout(self):
@@ -294,22 +402,38 @@ class SankhyaAPI:
         headers = {'Authorization': f'Bearer {self.bearer_token}'}
         
         try:
-            response = self.session.post(SANKHYA_CONFIG['gateway_url'], headers=headers, params=params, json={}, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            with medir_api(service_name):
+                response = self._post(SANKHYA_CONFIG['gateway_url'], leitura=10, headers=headers, params=params, json={})
+                response.raise_for_status()
+                data = response.json()
             
             if data.get("status") == "1":
                 logger.info("Logout da API Sankhya realizado com sucesso.")
             else:
-                logger.warning(f"Resposta de logout não foi status 1. Mensagem: {data.get('statusMessage')}")
+                logger.warning("Resposta de logout não foi status 1. Mensagem: %s", data.get('statusMessage'))
 
         except requests.RequestException as e:
-            logger.error(f"Erro na requisição de logout: {e}.")
+            logger.error("Erro na requisição de logout: %s.", e)
         finally:
             # CORREÇÃO: Apenas o bearer_token deve ser limpo. As outras configurações são fixas.
             self.bearer_token = None
+            self.token_obtido_em = None
             logger.info("Token de sessão local limpo.")
 
+    def _invalidar_token(self):
+        # Sessão recusada pelo servidor antes do TTL: token_valido() passa a exigir um novo login.
+        self.bearer_token = None
+        self.token_obtido_em = None
+
+    def token_valido(self) -> bool:
+        """Indica se há um bearerToken obtido há menos de APP_CONFIG['token_ttl'] segundos."""
+        return (self.bearer_token is not None and self.token_obtido_em is not None
+                and time.monotonic() - self.token_obtido_em < APP_CONFIG['token_ttl'])
+
+    def sondar(self) -> bool:
+        """Sonda do disjuntor: um login (chamada barata que renova o token)."""
+        return self.autenticar()
+
     def testar_conexao(self) -> bool:
         """Testa a conexão realizando uma autenticação e um logout em sequência."""
         if self.autenticar():
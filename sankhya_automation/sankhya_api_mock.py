@@ -2,6 +2,7 @@
 import logging
 import random
 import time
+from resiliencia import registrar_natureza_falha, TRANSITORIA, PERMANENTE
 
 logger = logging.getLogger(__name__)
 
@@ -10,10 +11,12 @@ class SankhyaAPI:
     Mock da classe SankhyaAPI para teste sem conexão real
     """
     
-    def __init__(self):
+    def __init__(self, credencial=None):
+        self.credencial = credencial or {}
+        self.nome = self.credencial.get('nome', 'mock')
         self.authenticated = False
         self.session_id = None
-        logger.info("Mock SankhyaAPI inicializado")
+        logger.info("Mock SankhyaAPI inicializado (sessão '%s')", self.nome)
 
     def testar_conexao(self) -> bool:
         """Mock do teste de conexão"""
@@ -27,6 +30,14 @@ class SankhyaAPI:
         self.session_id = f"mock_session_{int(time.time())}"
         return True
 
+    def token_valido(self) -> bool:
+        """Mock da validade do token"""
+        return self.authenticated
+
+    def sondar(self) -> bool:
+        """Mock da sonda do disjuntor"""
+        return self.autenticar()
+
     def logout(self):
         """Mock do logout"""
         logger.info("Mock: Fazendo logout da API Sankhya...")
@@ -45,7 +56,12 @@ class SankhyaAPI:
             # Gerar um IDIPROC mock
             idiproc = random.randint(100000, 999999)
             return True, idiproc, f"OP {idiproc} criada com sucesso"
+        elif random.random() < 0.5:
+            # Simular falha transitória ocasional (reprocessada na mesma execução)
+            registrar_natureza_falha(TRANSITORIA)
+            return False, None, "Timeout simulado na criação da OP"
         else:
-            # Simular falha ocasional
+            # Simular falha permanente ocasional
+            registrar_natureza_falha(PERMANENTE)
             return False, None, "Erro simulado na criação da OP"
 
@@ -0,0 +1,169 @@
+"""
+Módulo de telemetria ao vivo de uma execução do motor.
+Uma thread publica, em cadência fixa, a vazão (média móvel exponencial de
+OPs criadas com sucesso por minuto), o ETA dos planejamentos ainda pendentes,
+as OPs em voo e o p95 de latência de cada etapa (API e SQL) na janela recente. A cadência independe
+do ritmo das OPs, então o custo de publicação é constante.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from config import APP_CONFIG
+from metricas import API_LATENCIA, SQL_LATENCIA
+
+logger = logging.getLogger(__name__)
+
+ETAPAS = (("api", API_LATENCIA), ("sql", SQL_LATENCIA))
+
+
+class TelemetriaExecucao:
+    """
+    Telemetria de uma execução. As OPs em voo são contadas pelos workers
+    (op_iniciada/op_concluida, uma vez por tentativa) e os planejamentos
+    finalizados pelo motor (registro_finalizado, uma vez por planejamento, já
+    depois das retentativas); a thread de publicação faz os cálculos.
+    """
+
+    def __init__(self):
+        self.cadencia = APP_CONFIG['telemetria_cadencia']
+        self.constante_ewma = APP_CONFIG['telemetria_ewma']
+        self.total = 0
+        self.processados = 0
+        self.ops_criadas = 0
+        self.em_voo = 0
+        self.ops_por_minuto: Optional[float] = None
+        self.serie: Deque[float] = deque(maxlen=APP_CONFIG['telemetria_pontos'])
+        # Leituras dos histogramas de latência: a mais antiga delimita a janela do p95.
+        self._leituras: Deque[Dict[str, Dict[Tuple[str, ...], List[int]]]] = deque(
+            maxlen=max(2, math.ceil(APP_CONFIG['telemetria_janela'] / self.cadencia) + 1))
+        self._ultimo: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- CICLO DE VIDA ---
+    def iniciar(self, publicar: Callable[[Dict[str, Any]], None]):
+        """
+        Zera a telemetria e inicia a publicação periódica.
+        """
+        self.parar()
+        with self._lock:
+            self.total = self.processados = self.ops_criadas = self.em_voo = 0
+            self.ops_por_minuto = None
+            self.serie.clear()
+            self._leituras.clear()
+            self._ultimo = {}
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._laco, args=(publicar,), name="telemetria", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """
+        Encerra a publicação (a thread publica uma última vez antes de sair).
+        """
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join()
+            self._thread = None
+
+    def _laco(self, publicar: Callable[[Dict[str, Any]], None]):
+        self._ler_latencias()
+        anterior, criadas_antes = time.monotonic(), 0
+        while not self._parar.wait(self.cadencia):
+            anterior, criadas_antes = self._publicar(publicar, anterior, criadas_antes)
+        self._publicar(publicar, anterior, criadas_antes)
+
+    # --- CONTADORES (workers e motor) ---
+    def definir_total(self, total: int):
+        """
+        Total de planejamentos da execução (as retentativas não o alteram).
+        """
+        self.total = total
+
+    def op_iniciada(self):
+        with self._lock:
+            self.em_voo += 1
+
+    def op_concluida(self):
+        with self._lock:
+            self.em_voo -= 1
+
+    def registro_finalizado(self, op_criada: bool):
+        """
+        Planejamento com resultado final: OP criada ou falha sem nova tentativa.
+        """
+        with self._lock:
+            self.processados += 1
+            if op_criada:
+                self.ops_criadas += 1
+
+    # --- CÁLCULOS (thread de publicação) ---
+    def _publicar(self, publicar: Callable[[Dict[str, Any]], None], anterior: float,
+                  criadas_antes: int) -> Tuple[float, int]:
+        agora = time.monotonic()
+        with self._lock:
+            processados, ops_criadas, em_voo = self.processados, self.ops_criadas, self.em_voo
+        intervalo = agora - anterior
+        if intervalo > 0:
+            # Falhas e tentativas repetidas não contam como vazão.
+            taxa = (ops_criadas - criadas_antes) * 60.0 / intervalo
+            if self.ops_por_minuto is None:
+                self.ops_por_minuto = taxa
+            else:
+                # Média móvel exponencial com peso proporcional ao tempo decorrido.
+                alfa = 1.0 - math.exp(-intervalo / self.constante_ewma)
+                self.ops_por_minuto += alfa * (taxa - self.ops_por_minuto)
+            self.serie.append(round(self.ops_por_minuto, 2))
+
+        # Planejamentos ainda sem resultado final, inclusive os que aguardam retentativa.
+        restantes = max(0, self.total - processados)
+        eta = restantes * 60.0 / self.ops_por_minuto if restantes and self.ops_por_minuto else None
+        dados = {
+            "ops_por_minuto": round(self.ops_por_minuto or 0.0, 2),
+            "eta_s": round(eta) if eta is not None else (0 if not restantes else None),
+            "em_voo": em_voo,
+            "processados": processados,
+            "ops_criadas": ops_criadas,
+            "total": self.total,
+            "p95_etapas": self._p95_etapas(),
+            "serie": list(self.serie),
+        }
+        with self._lock:
+            self._ultimo = dados
+        try:
+            publicar(dados)
+        except Exception as e:
+            logger.error("Erro ao publicar a telemetria da execução: %s", e)
+        return agora, ops_criadas
+
+    def _ler_latencias(self) -> Dict[str, Dict[Tuple[str, ...], List[int]]]:
+        leitura = {prefixo: histograma.contagens() for prefixo, histograma in ETAPAS}
+        self._leituras.append(leitura)
+        return leitura
+
+    def _p95_etapas(self) -> Dict[str, float]:
+        """
+        p95 (segundos) de cada etapa com observações na janela recente.
+        """
+        inicio = self._leituras[0]
+        atual = self._ler_latencias()
+        p95: Dict[str, float] = {}
+        for prefixo, histograma in ETAPAS:
+            for rotulos, contagens in atual[prefixo].items():
+                antes = inicio[prefixo].get(rotulos, [0] * len(contagens))
+                valor = histograma.percentil([c - a for c, a in zip(contagens, antes)], 0.95)
+                if valor is not None:
+                    p95[f"{prefixo}:{rotulos[0]}"] = valor
+        return p95
+
+    def ultimo(self) -> Dict[str, Any]:
+        """
+        Última publicação (instantâneo para quem entra na sala do job).
+        """
+        with self._lock:
+            return dict(self._ultimo)
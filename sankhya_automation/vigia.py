@@ -0,0 +1,225 @@
+"""
+Modo vigia: processamento contínuo dos planejamentos inseridos em AD_PLAN.
+Sonda a tabela a partir de uma marca d'água de NUPLAN, cria as OPs dos
+registros novos em microlotes (com a mesma conexão de banco e sessão da API,
+mantidas aquecidas) e fecha cada (data, braço, rodada) — gerando o lote —
+depois de um período sem registros novos para ela. Sem novidades, o
+intervalo entre sondagens dobra até o máximo configurado.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import APP_CONFIG
+from historico_execucoes import historico_execucoes
+from modelos import Planejamento
+
+logger = logging.getLogger(__name__)
+
+RODADA_MAXIMA = 9999
+
+CHAVE_RODADA = Tuple[str, int, int]  # (data, braço, rodada)
+
+
+@dataclass(slots=True)
+class RodadaAberta:
+    """
+    OPs criadas de uma (data, braço, rodada) que ainda aguardam o lote.
+    """
+    data: str
+    braco: int
+    rodada: int
+    ultima_chegada: float
+    inicio: datetime = field(default_factory=datetime.now)
+    recebidos: int = 0
+    falhas: int = 0
+    duracao_s: float = 0.0
+    idiprocs: List[int] = field(default_factory=list)
+    nuplan_por_idiproc: Dict[int, Any] = field(default_factory=dict)
+    falhas_por_categoria: Dict[str, int] = field(default_factory=dict)
+
+
+class VigiaPlanejamentos:
+    """
+    Laço do modo vigia sobre um MotorAutomacao já conectado. Roda até o
+    cancelamento (motor.controle.cancelar()) ou até ficar ocioso por
+    `ocioso_maximo` segundos; ao sair, fecha as rodadas abertas.
+
+    Além da marca d'água, uma varredura completa periódica reprocessa os
+    pendentes com NUPLAN abaixo dela (falhas anteriores e registros
+    confirmados fora da ordem do NUPLAN).
+    """
+
+    def __init__(self, motor, data_inicial: str, bracos: Optional[List[int]] = None,
+                 rodada_inicial: int = 1, rodada_final: int = RODADA_MAXIMA,
+                 relogio: Callable[[], float] = time.monotonic):
+        self.motor = motor
+        self.data_inicial = data_inicial
+        self.bracos = bracos
+        self.rodada_inicial = rodada_inicial
+        self.rodada_final = rodada_final
+        self.microlote = APP_CONFIG['vigia_microlote']
+        self.intervalo = APP_CONFIG['vigia_intervalo']
+        self.intervalo_maximo = max(self.intervalo, APP_CONFIG['vigia_intervalo_maximo'])
+        self.fechamento_rodada = APP_CONFIG['vigia_fechamento_rodada']
+        self.varredura = APP_CONFIG['vigia_varredura']
+        self.ocioso_maximo = APP_CONFIG['vigia_ocioso_maximo']
+        self._relogio = relogio
+
+        self.marca = 0
+        self.sondagens = 0
+        self.rodadas_fechadas = 0
+        self.abertas: Dict[CHAVE_RODADA, RodadaAberta] = {}
+
+    # --- LAÇO ---
+    def executar(self) -> str:
+        """
+        Executa o laço de sondagem.
+
+        Returns:
+            str: Motivo do encerramento: 'cancelada' ou 'ociosa'.
+        """
+        controle = self.motor.controle
+        controle.reiniciar()
+        self.motor.cancelado = False
+        self.motor.sink.log(
+            f"👀 Modo vigia iniciado (desde {self.data_inicial}, braços {self.bracos or 'todos'}, "
+            f"microlote {self.microlote}, intervalo {self.intervalo:g}-{self.intervalo_maximo:g}s).", "info")
+
+        intervalo = self.intervalo
+        ultima_novidade = self._relogio()
+        # A primeira sondagem é uma varredura completa: pega o que já estava pendente.
+        proxima_varredura = ultima_novidade
+        cursor_varredura: Optional[int] = None
+        motivo = "cancelada"
+        self.motor.telemetria.iniciar(self.motor.sink.telemetria)
+        try:
+            while not controle.cancelado.is_set():
+                agora = self._relogio()
+                if cursor_varredura is None and agora >= proxima_varredura:
+                    cursor_varredura, proxima_varredura = 0, agora + self.varredura
+                em_varredura = cursor_varredura is not None
+
+                registros = self._buscar(cursor_varredura if em_varredura else self.marca)
+                if registros is None:
+                    intervalo = min(intervalo * 2, self.intervalo_maximo)
+                    controle.cancelado.wait(intervalo)
+                    continue
+                pagina_cheia = len(registros) >= self.microlote
+                if registros:
+                    if not self._processar(registros):
+                        if controle.cancelado.is_set():
+                            break
+                        # Falha de autenticação: a marca não avança e a sondagem é repetida.
+                        intervalo = min(intervalo * 2, self.intervalo_maximo)
+                        controle.cancelado.wait(intervalo)
+                        continue
+                    self.marca = max(self.marca, registros[-1].NUPLAN)
+                    intervalo, ultima_novidade = self.intervalo, self._relogio()
+                if em_varredura:
+                    cursor_varredura = registros[-1].NUPLAN if pagina_cheia else None
+
+                self._fechar_rodadas_silenciosas()
+
+                if pagina_cheia or cursor_varredura is not None:
+                    continue
+                if not registros:
+                    if self.ocioso_maximo and not self.abertas and self._relogio() - ultima_novidade >= self.ocioso_maximo:
+                        motivo = "ociosa"
+                        break
+                    espera, intervalo = intervalo, min(intervalo * 2, self.intervalo_maximo)
+                else:
+                    espera = self.intervalo
+                controle.cancelado.wait(self._limitar_espera(espera))
+        finally:
+            for chave in list(self.abertas):
+                self._fechar_rodada(chave)
+            self.motor.telemetria.parar()
+            self.motor.sink.log(
+                f"👀 Modo vigia encerrado ({motivo}): {self.sondagens} sondagens, "
+                f"{self.rodadas_fechadas} rodadas fechadas, marca NUPLAN {self.marca}.", "info")
+            self.motor.sink.concluir()
+        self.motor.cancelado = motivo == "cancelada"
+        return motivo
+
+    def _buscar(self, nuplan_apos: int) -> Optional[List[Planejamento]]:
+        self.sondagens += 1
+        db = self.motor.db
+        registros = db.buscar_planejamentos_novos(nuplan_apos, self.data_inicial, self.rodada_inicial,
+                                                  self.rodada_final, self.bracos, self.microlote)
+        if registros is None:
+            self.motor.sink.log("Falha ao sondar AD_PLAN; nova tentativa com intervalo maior.", "aviso")
+            if not db.sondar():
+                db.disconnect()
+                db.connect()
+        return registros
+
+    def _processar(self, registros: List[Planejamento]) -> bool:
+        agora = self._relogio()
+        for registro in registros:
+            chave = (registro.DATA, registro.BRACO, registro.RODADA)
+            rodada = self.abertas.get(chave)
+            if rodada is None:
+                rodada = self.abertas[chave] = RodadaAberta(*chave, ultima_chegada=agora)
+                self.motor.sink.log(f"--- Rodada {registro.RODADA} aberta (data {registro.DATA}, braço {registro.BRACO}) ---", "info")
+            rodada.ultima_chegada = agora
+            rodada.recebidos += 1
+        self.motor.sink.log(f"{len(registros)} planejamentos novos (NUPLAN {registros[0].NUPLAN}-{registros[-1].NUPLAN}).", "info")
+
+        def grupo_do(resultado) -> Tuple[List[int], Dict[int, Any]]:
+            registro = resultado.registro
+            rodada = self.abertas[(registro.DATA, registro.BRACO, registro.RODADA)]
+            if not resultado.idiproc:
+                rodada.falhas += 1
+                rodada.falhas_por_categoria[resultado.categoria] = rodada.falhas_por_categoria.get(resultado.categoria, 0) + 1
+            return rodada.idiprocs, rodada.nuplan_por_idiproc
+
+        inicio = time.perf_counter()
+        processado = self.motor.processar_registros(registros, grupo_do)
+        duracao = time.perf_counter() - inicio
+        # O tempo de processamento do microlote é dividido entre as rodadas pela quantidade de registros.
+        for registro in registros:
+            self.abertas[(registro.DATA, registro.BRACO, registro.RODADA)].duracao_s += duracao / len(registros)
+        return processado
+
+    # --- FECHAMENTO DAS RODADAS ---
+    def _limitar_espera(self, espera: float) -> float:
+        # Acorda a tempo de fechar a próxima rodada silenciosa.
+        if not self.abertas:
+            return espera
+        proximo_fechamento = min(r.ultima_chegada for r in self.abertas.values()) + self.fechamento_rodada
+        return max(0.0, min(espera, proximo_fechamento - self._relogio()))
+
+    def _fechar_rodadas_silenciosas(self):
+        agora = self._relogio()
+        for chave, rodada in list(self.abertas.items()):
+            if agora - rodada.ultima_chegada >= self.fechamento_rodada:
+                self._fechar_rodada(chave)
+
+    def _fechar_rodada(self, chave: CHAVE_RODADA):
+        rodada = self.abertas.pop(chave)
+        self.motor.sink.log(f"Rodada {rodada.rodada} (data {rodada.data}, braço {rodada.braco}) fechada: "
+                            f"{len(rodada.idiprocs)} OPs criadas, {rodada.falhas} falhas.", "info")
+        self.motor.gerar_lote(rodada.data, rodada.rodada, rodada.braco, rodada.idiprocs, rodada.nuplan_por_idiproc)
+        self.rodadas_fechadas += 1
+        ops_criadas = len(rodada.idiprocs)
+        historico_execucoes.registrar({
+            "job_id": None, "origem": "vigia",
+            "inicio": rodada.inicio.isoformat(timespec="seconds"),
+            "fim": datetime.now().isoformat(timespec="seconds"),
+            "duracao_s": round(rodada.duracao_s, 3),
+            "parametros": {"data_inicial": rodada.data, "data_final": rodada.data, "braco": rodada.braco,
+                           "rodada_inicial": rodada.rodada, "rodada_final": rodada.rodada,
+                           "concorrencia": self.motor.controle.concorrencia},
+            "status": "concluida",
+            "pendentes": rodada.recebidos,
+            "processados": ops_criadas + rodada.falhas,
+            "ops_criadas": ops_criadas,
+            "falhas": rodada.falhas,
+            "ops_por_segundo": round(ops_criadas / rodada.duracao_s, 4) if rodada.duracao_s > 0 else 0.0,
+            "falhas_por_categoria": rodada.falhas_por_categoria,
+            "latencias": {},
+        })
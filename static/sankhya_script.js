@@ -1,6 +1,7 @@
 class SankhyaAutomation {
     constructor() {
         this.isProcessing = false;
+        this.jobId = null; // Job acompanhado (sala do Socket.IO)
         this.socket = null; // Soquete será inicializado depois
         this.initializeEventListeners();
         this.connectSocket();
@@ -13,10 +14,17 @@ class SankhyaAutomation {
         // Ouve por eventos do servidor
         this.socket.on('connect', () => {
             console.log('Conectado ao servidor WebSocket.');
+            // Em uma reconexão (ou recarga da página), volta para a sala do job
+            // e recebe o instantâneo em vez de esperar pelo próximo evento.
+            this.socket.emit('entrar_job', { job_id: this.jobId });
+        });
+
+        this.socket.on('snapshot', (data) => {
+            this.aplicarInstantaneo(data);
         });
 
         this.socket.on('log_update', (data) => {
-            this.addLogMessage(data.message, data.type);
+            this.addLogMessage(data.message, data.type, data.hora);
         });
 
         this.socket.on('counters_update', (data) => {
@@ -27,11 +35,26 @@ class SankhyaAutomation {
             this.updateProgress(data.current, data.total);
         });
 
-        this.socket.on('process_finished', () => {
+        this.socket.on('disjuntor_update', (data) => {
+            this.atualizarDisjuntor(data);
+        });
+
+        this.socket.on('controle_update', (data) => {
+            this.atualizarControle(data);
+        });
+
+        this.socket.on('telemetria_update', (data) => {
+            this.atualizarTelemetria(data);
+        });
+
+        this.socket.on('process_finished', (data) => {
             this.addLogMessage('🎉 Automação concluída!', 'success');
             this.exibirResumoFinal();
+            this.carregarTimeline(data && data.job_id);
+            this.carregarHistorico();
             this.isProcessing = false;
             this.showButton('processar-automacao-btn');
+            this.hideSection('controle-execucao');
         });
     }
 
@@ -39,11 +62,18 @@ class SankhyaAutomation {
         document.getElementById('verificar-conexoes-btn').addEventListener('click', () => this.verificarConexoes());
         document.getElementById('buscar-planejamentos-btn').addEventListener('click', () => this.buscarPlanejamentos());
         document.getElementById('processar-automacao-btn').addEventListener('click', () => this.iniciarAutomacao());
+        document.getElementById('pausar-btn').addEventListener('click', () => this.controlarExecucao('pausar'));
+        document.getElementById('retomar-btn').addEventListener('click', () => this.controlarExecucao('retomar'));
+        document.getElementById('cancelar-btn').addEventListener('click', () => this.controlarExecucao('cancelar'));
+        document.getElementById('ajustar-btn').addEventListener('click', () => this.controlarExecucao('ajustar', {
+            concorrencia: parseInt(document.getElementById('controle-concorrencia').value),
+            ops_por_minuto: parseFloat(document.getElementById('controle-taxa').value) || 0
+        }));
     }
 
-    addLogMessage(message, type = 'info') {
+    addLogMessage(message, type = 'info', hora = null) {
         const logContainer = document.getElementById('sankhya-log');
-        const timestamp = new Date().toLocaleTimeString();
+        const timestamp = hora || new Date().toLocaleTimeString();
         const typeClass = `status-${type}`;
         
         const logEntry = document.createElement('div');
@@ -75,6 +105,112 @@ class SankhyaAutomation {
         document.getElementById('rodada-atual').textContent = currentRodada;
     }
 
+    atualizarDisjuntor(estado) {
+        // Faixa visível apenas enquanto o disjuntor da API não estiver fechado.
+        const painel = document.getElementById('disjuntor-status');
+        if (!estado || estado.estado === 'fechado') {
+            painel.classList.add('hidden');
+            return;
+        }
+        const textos = {
+            aberto: `Disjuntor da API aberto após ${estado.falhas_consecutivas} falhas consecutivas. Processamento pausado; nova sonda em ${Math.round(estado.sonda_em_s)}s.`,
+            meio_aberto: 'Disjuntor da API meio aberto: sondando a API Sankhya...'
+        };
+        document.getElementById('disjuntor-texto').textContent = textos[estado.estado] || estado.estado;
+        painel.classList.toggle('text-red-300', estado.estado === 'aberto');
+        painel.classList.toggle('text-yellow-300', estado.estado === 'meio_aberto');
+        painel.classList.remove('hidden');
+    }
+
+    aplicarInstantaneo(snapshot) {
+        // Estado compacto do job enviado pelo servidor ao entrar na sala
+        if (!snapshot || !snapshot.encontrado) return;
+        this.jobId = snapshot.job_id;
+        const logContainer = document.getElementById('sankhya-log');
+        logContainer.innerHTML = '';
+        snapshot.log.forEach(linha => this.addLogMessage(linha.message, linha.type, linha.hora));
+        this.showSection('sankhya-progress-section');
+        this.updateCounters(snapshot.contadores.ops_criadas, snapshot.contadores.ops_falhas, snapshot.contadores.rodada_atual);
+        this.updateProgress(snapshot.progresso.current, snapshot.progresso.total);
+        this.atualizarDisjuntor(snapshot.disjuntor);
+        this.atualizarTelemetria(snapshot.telemetria);
+        if (snapshot.em_andamento) {
+            this.isProcessing = true;
+            this.hideButton('processar-automacao-btn');
+            this.showSection('controle-execucao');
+            this.atualizarControle(snapshot.controle);
+        }
+    }
+
+    atualizarTelemetria(dados) {
+        // Vazão (média móvel exponencial), ETA, OPs em voo e p95 por etapa, publicados em cadência fixa
+        if (!dados || dados.ops_por_minuto === undefined) return;
+        const formatarTempo = (s) => {
+            if (s === null || s === undefined) return '-';
+            const h = Math.floor(s / 3600), m = Math.floor((s % 3600) / 60), seg = s % 60;
+            return h ? `${h}h${String(m).padStart(2, '0')}m` : m ? `${m}m${String(seg).padStart(2, '0')}s` : `${seg}s`;
+        };
+        document.getElementById('telemetria-vazao').textContent = dados.ops_por_minuto.toFixed(1);
+        document.getElementById('telemetria-eta').textContent = formatarTempo(dados.eta_s);
+        document.getElementById('telemetria-em-voo').textContent = dados.em_voo;
+        const etapas = Object.entries(dados.p95_etapas || {}).sort((a, b) => b[1] - a[1]);
+        document.getElementById('telemetria-p95').textContent = etapas.length
+            ? 'p95 (janela recente): ' + etapas.map(([etapa, s]) => `${etapa} ${s < 1 ? Math.round(s * 1000) + 'ms' : s + 's'}`).join(' · ')
+            : '';
+
+        // Sparkline da vazão: escala vertical pelo maior valor da série
+        const serie = dados.serie || [];
+        const maximo = Math.max(...serie, 1);
+        const passo = serie.length > 1 ? 160 / (serie.length - 1) : 0;
+        const pontos = serie.map((v, i) => `${(i * passo).toFixed(1)},${(27 - (v / maximo) * 26).toFixed(1)}`).join(' ');
+        document.querySelector('#telemetria-sparkline polyline').setAttribute('points', pontos);
+        this.showSection('telemetria-painel');
+    }
+
+    atualizarControle(estado) {
+        if (!estado || !estado.estado) return;
+        const textos = { executando: 'Executando', pausado: 'Pausado', cancelando: 'Cancelando...' };
+        const taxa = estado.ops_por_minuto ? `${estado.ops_por_minuto} OPs/min` : 'sem limite de taxa';
+        document.getElementById('controle-estado').textContent =
+            `${textos[estado.estado] || estado.estado} · concorrência ${estado.concorrencia} · ${taxa}`;
+        document.getElementById('controle-concorrencia').max = estado.concorrencia_maxima;
+        document.getElementById('pausar-btn').classList.toggle('hidden', estado.estado !== 'executando');
+        document.getElementById('retomar-btn').classList.toggle('hidden', estado.estado !== 'pausado');
+    }
+
+    async carregarControle() {
+        // Valores atuais de concorrência e taxa nos campos de ajuste
+        try {
+            const response = await fetch('/api/sankhya/controle');
+            const estado = await response.json();
+            if (!estado.sucesso) return;
+            document.getElementById('controle-concorrencia').value = estado.concorrencia;
+            document.getElementById('controle-taxa').value = estado.ops_por_minuto;
+            this.showSection('controle-execucao');
+            this.atualizarControle(estado);
+        } catch (error) {
+            console.error('Erro ao carregar o controle da execução:', error);
+        }
+    }
+
+    async controlarExecucao(acao, corpo = null) {
+        try {
+            const response = await fetch(`/api/sankhya/controle/${acao}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(corpo || {})
+            });
+            const result = await response.json();
+            if (!result.sucesso) {
+                this.addLogMessage('❌ ' + result.erro, 'error');
+                return;
+            }
+            this.atualizarControle(result);
+        } catch (error) {
+            this.addLogMessage('❌ Erro ao controlar a execução: ' + error.message, 'error');
+        }
+    }
+
     async verificarConexoes() {
         this.addLogMessage('Resetando estado da aplicação...', 'info');
         try {
@@ -84,6 +220,7 @@ class SankhyaAutomation {
             this.hideButton('processar-automacao-btn');
             this.hideSection('sankhya-progress-section');
             this.hideSection('sankhya-resumo-section');
+            this.hideSection('telemetria-painel');
             this.updateCounters(0, 0, '-');
             this.updateProgress(0, 0);
             this.addLogMessage('Estado resetado. Verificando conexões...', 'info');
@@ -91,6 +228,7 @@ class SankhyaAutomation {
             const response = await fetch('/api/sankhya/verificar_conexoes', { method: 'POST' });
             const result = await response.json();
 
+            this.atualizarDisjuntor(result.disjuntor);
             if (result.sucesso) {
                 this.addLogMessage('✅ ' + result.mensagem, 'success');
                 this.showButton('buscar-planejamentos-btn');
@@ -104,12 +242,13 @@ class SankhyaAutomation {
 
     async buscarPlanejamentos() {
         const dataPlaneamento = document.getElementById('data-planejamento').value;
+        const dataFinal = document.getElementById('data-final').value || null;
         const braco = parseInt(document.getElementById('braco-sankhya').value);
         const rodadaInicial = parseInt(document.getElementById('rodada-inicial').value);
         const rodadaFinal = parseInt(document.getElementById('rodada-final').value);
 
-        if (!dataPlaneamento || rodadaInicial > rodadaFinal) {
-            this.addLogMessage('❌ Verifique os parâmetros (data e rodadas).', 'error');
+        if (!dataPlaneamento || rodadaInicial > rodadaFinal || (dataFinal && dataFinal < dataPlaneamento)) {
+            this.addLogMessage('❌ Verifique os parâmetros (datas e rodadas).', 'error');
             return;
         }
 
@@ -118,13 +257,14 @@ class SankhyaAutomation {
             const response = await fetch('/api/sankhya/buscar_planejamentos', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ data_planejamento: dataPlaneamento, braco, rodada_inicial: rodadaInicial, rodada_final: rodadaFinal })
+                body: JSON.stringify({ data_planejamento: dataPlaneamento, data_final: dataFinal, braco, rodada_inicial: rodadaInicial, rodada_final: rodadaFinal, dry_run: true })
             });
             const result = await response.json();
 
             if (result.sucesso) {
                 if (result.total > 0) {
                     this.addLogMessage(`✅ Encontrados ${result.total} planejamentos pendentes.`, 'success');
+                    this.exibirPlano(result);
                     this.showButton('processar-automacao-btn');
                 } else {
                     this.addLogMessage('⚠️ Nenhum planejamento pendente encontrado.', 'warning');
@@ -138,6 +278,17 @@ class SankhyaAutomation {
         }
     }
 
+    exibirPlano(plano) {
+        const minutos = (plano.tempo_estimado_s / 60).toFixed(1);
+        const origem = plano.baseado_em_historico ? 'histórico de latências' : 'latências padrão (sem histórico)';
+        this.addLogMessage(`📋 Plano: ${plano.total_chamadas_api} chamadas à API, ${plano.total_chamadas_db} ao banco, concorrência ${plano.concorrencia}.`, 'info');
+        plano.rodadas.filter(r => r.registros > 0).forEach(r => {
+            const data = r.data ? `Data ${r.data}, ` : '';
+            this.addLogMessage(`&nbsp;&nbsp;${data}Rodada ${r.rodada}: ${r.registros} planejamentos, ~${r.tempo_estimado_s}s`, 'info');
+        });
+        this.addLogMessage(`⏱️ Tempo estimado: ~${minutos} min (${origem}).`, 'info');
+    }
+
     async iniciarAutomacao() {
         if (this.isProcessing) {
             this.addLogMessage('⚠️ Automação já está em andamento.', 'warning');
@@ -148,9 +299,11 @@ class SankhyaAutomation {
         this.hideButton('processar-automacao-btn');
         this.showSection('sankhya-progress-section');
         this.hideSection('sankhya-resumo-section'); // Esconde resumo antigo
+        this.hideSection('sankhya-timeline-section');
         this.addLogMessage('🚀 Enviando comando para iniciar automação...', 'info');
 
         const dataPlaneamento = document.getElementById('data-planejamento').value;
+        const dataFinal = document.getElementById('data-final').value || null;
         const braco = parseInt(document.getElementById('braco-sankhya').value);
         const rodadaInicial = parseInt(document.getElementById('rodada-inicial').value);
         const rodadaFinal = parseInt(document.getElementById('rodada-final').value);
@@ -160,7 +313,7 @@ class SankhyaAutomation {
             const response = await fetch('/api/sankhya/iniciar_automacao_stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ data_planejamento: dataPlaneamento, braco, rodada_inicial: rodadaInicial, rodada_final: rodadaFinal })
+                body: JSON.stringify({ data_planejamento: dataPlaneamento, data_final: dataFinal, braco, rodada_inicial: rodadaInicial, rodada_final: rodadaFinal })
             });
 
             const result = await response.json();
@@ -168,8 +321,12 @@ class SankhyaAutomation {
                 this.addLogMessage(`❌ Falha ao iniciar automação: ${result.mensagem}`, 'error');
                 this.isProcessing = false;
                 this.showButton('processar-automacao-btn');
+                return;
             }
-            // Se sucesso, o frontend agora apenas espera por eventos WebSocket
+            // Se sucesso, entra na sala do job e passa a receber os eventos WebSocket
+            this.jobId = result.job_id;
+            this.socket.emit('entrar_job', { job_id: this.jobId });
+            this.carregarControle();
         } catch (error) {
             this.addLogMessage('❌ Erro ao enviar comando de início: ' + error.message, 'error');
             this.isProcessing = false;
@@ -194,15 +351,116 @@ class SankhyaAutomation {
                         <h3 class="text-lg font-semibold text-red-400 mb-3"><i class="fas fa-exclamation-triangle mr-2"></i>Falhas (${resumo.total_falhas})</h3>
                         <div class="max-h-40 overflow-y-auto">${resumo.detalhes_falhas.length > 0 ? resumo.detalhes_falhas.map(f => `<div class="text-sm text-gray-300 mb-2"><div class="font-medium">NUPLAN: ${f.nuplan}</div><div class="text-red-300 text-xs">${f.erro}</div></div>`).join('') : '<div class="text-sm text-gray-400">Nenhuma falha</div>'}</div>
                     </div>
-                </div>`;
+                </div>${this.renderizarResumoPorData(resumo.por_data)}`;
         } catch (error) {
             this.addLogMessage('❌ Erro ao carregar resumo: ' + error.message, 'error');
         }
     }
+
+    renderizarResumoPorData(porData) {
+        // Só exibe a tabela por data em execuções que cobrem um período.
+        const datas = Object.keys(porData || {}).sort();
+        if (datas.length < 2) return '';
+        const linhas = datas.map(d => `<tr><td class="pr-6">${d}</td><td class="pr-6">${porData[d].pendentes}</td><td class="pr-6 text-green-400">${porData[d].ops_criadas}</td><td class="text-red-400">${porData[d].falhas}</td></tr>`).join('');
+        return `
+                <div class="bg-gray-700 p-4 rounded-lg mt-6">
+                    <h3 class="text-lg font-semibold text-purple-300 mb-3"><i class="fas fa-calendar-alt mr-2"></i>Resumo por Data</h3>
+                    <table class="text-sm text-gray-300"><thead><tr class="text-gray-400"><th class="pr-6 text-left">Data</th><th class="pr-6 text-left">Pendentes</th><th class="pr-6 text-left">OPs</th><th class="text-left">Falhas</th></tr></thead><tbody>${linhas}</tbody></table>
+                </div>`;
+    }
+
+    async carregarHistorico() {
+        // Últimas execuções e vazão por dia (histórico persistente no servidor)
+        try {
+            const [respostaExecucoes, respostaTendencias] = await Promise.all([
+                fetch('/api/sankhya/historico?limite=10'),
+                fetch('/api/sankhya/historico/tendencias?dias=30')
+            ]);
+            const execucoes = await respostaExecucoes.json();
+            const tendencias = await respostaTendencias.json();
+            if (!execucoes.sucesso || execucoes.execucoes.length === 0) return;
+            this.renderizarHistorico(execucoes.execucoes, tendencias);
+            this.showSection('sankhya-historico-section');
+        } catch (error) {
+            console.error('Erro ao carregar o histórico de execuções:', error);
+        }
+    }
+
+    renderizarHistorico(execucoes, tendencias) {
+        const formatar = (v) => (v === null || v === undefined) ? '-' : (v * 60).toFixed(1);
+        if (tendencias && tendencias.sucesso) {
+            const dias = tendencias.por_dia.map(d => `${d.data.slice(5)}: ${formatar(d.ops_por_segundo)}`).join(' · ');
+            document.getElementById('historico-tendencia').innerHTML = `
+                <div>OPs/min (últimos ${tendencias.dias} dias) — anterior: <b>${formatar(tendencias.ops_por_segundo_anterior)}</b>, recente: <b>${formatar(tendencias.ops_por_segundo_recente)}</b></div>
+                <div class="text-xs text-gray-400 mt-1">${dias}</div>`;
+        }
+        const cores = { concluida: 'text-green-400', cancelada: 'text-yellow-400', abortada: 'text-red-400', erro: 'text-red-400' };
+        const linhas = execucoes.map(e => {
+            const p = e.parametros || {};
+            const periodo = p.data_inicial === p.data_final ? p.data_inicial : `${p.data_inicial} a ${p.data_final}`;
+            const categorias = Object.entries(e.falhas_por_categoria || {}).map(([c, n]) => `${c}: ${n}`).join(', ');
+            return `<tr><td class="pr-4">${e.inicio.replace('T', ' ')}</td><td class="pr-4">${e.origem}</td><td class="pr-4">${periodo} B${p.braco} R${p.rodada_inicial}-${p.rodada_final}</td><td class="pr-4 ${cores[e.status] || ''}">${e.status}</td><td class="pr-4 text-green-400">${e.ops_criadas}</td><td class="pr-4 text-red-400" title="${categorias}">${e.falhas}</td><td class="pr-4">${formatar(e.ops_por_segundo)}</td><td>${e.duracao_s.toFixed(1)}s</td></tr>`;
+        }).join('');
+        document.getElementById('historico-content').innerHTML = `
+            <table class="text-sm text-gray-300 w-full"><thead><tr class="text-gray-400 text-left"><th class="pr-4">Início</th><th class="pr-4">Origem</th><th class="pr-4">Parâmetros</th><th class="pr-4">Status</th><th class="pr-4">OPs</th><th class="pr-4">Falhas</th><th class="pr-4">OPs/min</th><th>Duração</th></tr></thead><tbody>${linhas}</tbody></table>`;
+    }
+
+    async carregarTimeline(jobId) {
+        try {
+            const url = jobId ? `/api/sankhya/timeline/${jobId}` : '/api/sankhya/timeline';
+            const response = await fetch(url);
+            const result = await response.json();
+            if (!result.sucesso) return;
+            this.renderizarTimeline(result.spans);
+            this.showSection('sankhya-timeline-section');
+        } catch (error) {
+            this.addLogMessage('❌ Erro ao carregar linha do tempo: ' + error.message, 'error');
+        }
+    }
+
+    renderizarTimeline(spans) {
+        // Uma linha por rodada/planejamento/lote; chamadas à API e ao banco
+        // aparecem como segmentos dentro da linha do span pai.
+        const MAX_LINHAS = 500;
+        const container = document.getElementById('timeline-content');
+        if (!spans || spans.length === 0) {
+            container.innerHTML = '<div class="text-gray-400">Nenhum span registrado.</div>';
+            return;
+        }
+        const inicio = Math.min(...spans.map(s => s.startTimeUnixNano));
+        const fim = Math.max(...spans.map(s => s.endTimeUnixNano));
+        const duracao = Math.max(fim - inicio, 1);
+        const pct = (ns) => ((ns - inicio) / duracao * 100).toFixed(3);
+
+        const filhosPorPai = {};
+        spans.forEach(s => { (filhosPorPai[s.parentSpanId] = filhosPorPai[s.parentSpanId] || []).push(s); });
+        const linhas = spans
+            .filter(s => ['rodada', 'planejamento', 'lote'].includes(s.name))
+            .sort((a, b) => a.startTimeUnixNano - b.startTimeUnixNano)
+            .slice(0, MAX_LINHAS);
+
+        const html = linhas.map(linha => {
+            const attrs = linha.attributes || {};
+            const rotulo = linha.name === 'planejamento'
+                ? `R${attrs.rodada} NUPLAN ${attrs.NUPLAN}${attrs.IDIPROC ? ' → ' + attrs.IDIPROC : ''}`
+                : `${linha.name} ${attrs.rodada ?? ''}`;
+            const segundos = ((linha.endTimeUnixNano - linha.startTimeUnixNano) / 1e9).toFixed(2);
+            const base = `<div class="timeline-barra timeline-ocioso" style="left:${pct(linha.startTimeUnixNano)}%;width:${(pct(linha.endTimeUnixNano) - pct(linha.startTimeUnixNano)).toFixed(3)}%"></div>`;
+            const segmentos = (filhosPorPai[linha.spanId] || []).map(f => {
+                const classe = f.status === 'ERROR' ? 'timeline-erro' : (f.name.startsWith('sql') ? 'timeline-sql' : 'timeline-api');
+                const largura = (pct(f.endTimeUnixNano) - pct(f.startTimeUnixNano)).toFixed(3);
+                const titulo = `${f.name} (${((f.endTimeUnixNano - f.startTimeUnixNano) / 1e6).toFixed(0)} ms)`;
+                return `<div class="timeline-barra ${classe}" title="${titulo}" style="left:${pct(f.startTimeUnixNano)}%;width:${largura}%"></div>`;
+            }).join('');
+            return `<div class="timeline-linha"><div class="timeline-rotulo" title="${rotulo} (${segundos}s)">${rotulo}</div><div class="timeline-trilho">${base}${segmentos}</div></div>`;
+        }).join('');
+        container.innerHTML = html;
+    }
 }
 
 document.addEventListener('DOMContentLoaded', () => {
     const sankhyaApp = new SankhyaAutomation();
+    sankhyaApp.carregarHistorico();
     const today = new Date().toISOString().split('T')[0];
     document.getElementById('data-planejamento').value = today;
 });
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""
+Configuração comum dos testes: os módulos de sankhya_automation usam imports
+planos (from config import ...), e os arquivos gravados pela aplicação
+(históricos) vão para um diretório temporário.
+"""
+
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "sankhya_automation"))
+
+_TEMPORARIO = tempfile.mkdtemp(prefix="sankhya-testes-")
+os.environ.setdefault("HISTORICO_EXECUCOES_DB", os.path.join(_TEMPORARIO, "historico_execucoes.db"))
+os.environ.setdefault("HISTORICO_LATENCIAS_FILE", os.path.join(_TEMPORARIO, "historico_latencias.json"))
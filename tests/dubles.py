@@ -0,0 +1,250 @@
+"""
+Dublês compartilhados pelos testes.
+"""
+
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from sqlalchemy.exc import InvalidRequestError
+
+from resiliencia import registrar_natureza_falha, TRANSITORIA
+
+# Tamanho máximo de SYS.ODCINUMBERLIST (VARRAY(32767) OF NUMBER).
+LIMITE_ODCINUMBERLIST = 32767
+
+Resposta = Union[List[tuple], int, Callable[[Any], Union[List[tuple], int]]]
+
+
+class ColecaoOracle(list):
+    """
+    Coleção criada por DbObjectType.newobject(); recusa elementos além do limite do VARRAY.
+    """
+
+    def extend(self, valores):
+        valores = list(valores)
+        if len(self) + len(valores) > LIMITE_ODCINUMBERLIST:
+            raise ValueError("DPY-2039: given index exceeds the maximum allowed for the collection")
+        super().extend(valores)
+
+
+class ResultadoDuplo:
+    def __init__(self, linhas: List[tuple], rowcount: int):
+        self._linhas = linhas
+        self.rowcount = rowcount
+
+    def __iter__(self):
+        return iter(self._linhas)
+
+    def fetchone(self):
+        return self._linhas[0] if self._linhas else None
+
+    def scalar(self):
+        return self._linhas[0][0] if self._linhas else None
+
+    def partitions(self, tamanho: int):
+        # Uma exceção entre as linhas simula uma falha no meio da busca (ex.: ORA-01555).
+        particao = []
+        for linha in self._linhas:
+            if isinstance(linha, Exception):
+                if particao:
+                    yield particao
+                raise linha
+            particao.append(linha)
+            if len(particao) == tamanho:
+                yield particao
+                particao = []
+        if particao:
+            yield particao
+
+    def close(self):
+        pass
+
+
+class TransacaoDupla:
+    def __init__(self, conexao: "ConexaoAutobegin"):
+        self._conexao = conexao
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traceback):
+        if tipo is None:
+            self._conexao.commit()
+        else:
+            self._conexao.rollback()
+        return False
+
+
+class ConexaoAutobegin:
+    """
+    Dublê de sqlalchemy.engine.Connection com a semântica de transações do
+    SQLAlchemy 2.x: todo execute() inicia uma transação implícita (autobegin)
+    se não houver uma, e begin() com uma transação aberta levanta
+    InvalidRequestError. Os comandos só contam como gravados após commit().
+
+    `respostas` associa um trecho do SQL às linhas devolvidas (lista), ao
+    rowcount (int) ou a uma função dos parâmetros que devolve um dos dois.
+    """
+
+    def __init__(self, respostas: Optional[Dict[str, Resposta]] = None):
+        self.respostas = respostas or {}
+        self.executados: List[str] = []
+        self.confirmados: List[str] = []
+        self._pendentes: Optional[List[str]] = None
+        self.fechada = False
+        driver = SimpleNamespace(gettype=lambda nome: SimpleNamespace(newobject=ColecaoOracle))
+        self.connection = SimpleNamespace(driver_connection=driver)
+
+    def in_transaction(self) -> bool:
+        return self._pendentes is not None
+
+    def begin(self) -> TransacaoDupla:
+        if self._pendentes is not None:
+            raise InvalidRequestError("This connection has already initialized a SQLAlchemy Transaction() object "
+                                      "via begin() or autobegin; can't call begin() here unless rollback() or "
+                                      "commit() is called first.")
+        self._pendentes = []
+        return TransacaoDupla(self)
+
+    def execution_options(self, **_opcoes) -> "ConexaoAutobegin":
+        return self
+
+    def execute(self, sql, parametros=None) -> ResultadoDuplo:
+        if self._pendentes is None:
+            self._pendentes = []
+        texto = " ".join(str(sql).split())
+        self.executados.append(texto)
+        self._pendentes.append(texto)
+        for trecho, resposta in self.respostas.items():
+            if trecho in texto:
+                if callable(resposta):
+                    resposta = resposta(parametros)
+                if isinstance(resposta, int):
+                    return ResultadoDuplo([], resposta)
+                return ResultadoDuplo(list(resposta), len(resposta))
+        return ResultadoDuplo([], 0)
+
+    def commit(self):
+        self.confirmados.extend(self._pendentes or [])
+        self._pendentes = None
+
+    def rollback(self):
+        self._pendentes = None
+
+    def close(self):
+        self._pendentes = None
+        self.fechada = True
+
+    def __enter__(self) -> "ConexaoAutobegin":
+        return self
+
+    def __exit__(self, tipo, valor, traceback):
+        self.close()
+        return False
+
+    def confirmado(self, trecho: str) -> bool:
+        return any(trecho in sql for sql in self.confirmados)
+
+
+class EngineDupla:
+    """
+    Dublê de sqlalchemy.Engine: cada connect() entrega uma nova ConexaoAutobegin
+    com as mesmas `respostas`, como uma conexão emprestada do pool.
+    """
+
+    def __init__(self, respostas: Optional[Dict[str, Resposta]] = None):
+        self.respostas = respostas or {}
+        self.conexoes: List[ConexaoAutobegin] = []
+
+    def connect(self) -> ConexaoAutobegin:
+        conexao = ConexaoAutobegin(self.respostas)
+        self.conexoes.append(conexao)
+        return conexao
+
+
+# Item do roteiro da ApiRoteiro: falha transitória que também invalida o token (status 3).
+SESSAO_EXPIRADA = "sessao_expirada"
+
+
+class ApiRoteiro:
+    """
+    Dublê da SankhyaAPI. Cada chamada de criar_ordem_producao consome um item
+    do roteiro: None (sucesso), TRANSITORIA/PERMANENTE (falha com essa
+    natureza) ou SESSAO_EXPIRADA; com o roteiro vazio, todas dão certo.
+    """
+
+    nome = "roteiro"
+
+    def __init__(self, roteiro: Iterable[Optional[str]] = (), autenticacao_ok: bool = True):
+        self.roteiro = list(roteiro)
+        self.autenticacao_ok = autenticacao_ok
+        self.token = True
+        self.chamadas = 0
+        self.autenticacoes = 0
+        self._proximo_idiproc = 1000
+        self._lock = threading.Lock()
+
+    def token_valido(self) -> bool:
+        return self.token
+
+    def autenticar(self) -> bool:
+        self.autenticacoes += 1
+        self.token = self.autenticacao_ok
+        return self.autenticacao_ok
+
+    def sondar(self) -> bool:
+        return self.autenticar()
+
+    def criar_ordem_producao(self, dados: Dict[str, Any]):
+        with self._lock:
+            self.chamadas += 1
+            item = self.roteiro.pop(0) if self.roteiro else None
+            if item is None:
+                self._proximo_idiproc += 1
+                return True, self._proximo_idiproc, "ok"
+            if item == SESSAO_EXPIRADA:
+                self.token = False
+                item = TRANSITORIA
+        registrar_natureza_falha(item)
+        return False, None, f"falha {item}"
+
+
+class BancoFalso:
+    """
+    Dublê da OracleDatabase para o motor: serve os `planejamentos` pendentes
+    e grava IDIPROCs e lotes em memória.
+    """
+
+    def __init__(self, planejamentos: Iterable[Any] = (), grava_idiproc: bool = True):
+        self.planejamentos = list(planejamentos)
+        self.grava_idiproc = grava_idiproc
+        self.idiprocs: Dict[Any, int] = {}
+        self.lotes: Dict[int, List[Any]] = {}
+
+    def contar_planejamentos_por_data_rodada(self, data_inicial: str, data_final: str, braco: int,
+                                             rodada_inicial: int, rodada_final: int) -> Dict[str, Dict[int, int]]:
+        contagem: Dict[str, Dict[int, int]] = {}
+        for registro in self.planejamentos:
+            por_rodada = contagem.setdefault(registro.DATA, {})
+            por_rodada[registro.RODADA] = por_rodada.get(registro.RODADA, 0) + 1
+        return contagem
+
+    def iterar_planejamentos(self, data_planejamento: str, braco: int, rodada_inicial: int, rodada_final: int,
+                             tamanho_lote: Optional[int] = None, data_final: Optional[str] = None):
+        registros = sorted(self.planejamentos, key=lambda r: (r.DATA, r.RODADA, r.NUPLAN))
+        tamanho = tamanho_lote or 3
+        for inicio in range(0, len(registros), tamanho):
+            yield registros[inicio:inicio + tamanho]
+
+    def atualizar_idiproc(self, nuplan, idiproc) -> bool:
+        if self.grava_idiproc:
+            self.idiprocs[nuplan] = idiproc
+        return self.grava_idiproc
+
+    def gerar_lotes_para_ops(self, idiprocs: List[int], braco: int) -> Dict[int, List[int]]:
+        return {len(self.lotes) + 1: list(idiprocs)}
+
+    def atualizar_lote_em_ad_plan(self, nrolote: int, nuplans: List[Any]) -> bool:
+        self.lotes[nrolote] = list(nuplans)
+        return True
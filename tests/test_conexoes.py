@@ -0,0 +1,47 @@
+"""
+Verificação de conexões: depois de um aquecimento com falha, o estado em cache
+volta na hora e um único reaquecimento roda em segundo plano.
+"""
+
+import threading
+
+from conexoes import GerenciadorConexoes
+
+
+class BancoLento:
+    def __init__(self, liberar: threading.Event):
+        self.connection = None
+        self.liberar = liberar
+        self.tentativas = 0
+
+    def connect(self):
+        self.tentativas += 1
+        if self.tentativas == 1:
+            return False
+        self.liberar.wait(5)
+        self.connection = object()
+        return True
+
+    def sondar(self):
+        return True
+
+
+class ApiValida:
+    def token_valido(self):
+        return True
+
+
+def test_estado_com_falha_reaquece_em_segundo_plano_uma_vez():
+    liberar = threading.Event()
+    banco = BancoLento(liberar)
+    gerenciador = GerenciadorConexoes(lambda: banco, ApiValida)
+    gerenciador._aquecer()
+    gerenciador._pronto.set()
+
+    estados = [gerenciador.estado(timeout=0) for _ in range(5)]
+
+    assert all(not e["sucesso"] for e in estados)
+    assert banco.tentativas == 2
+    liberar.set()
+    gerenciador._reaquecimento.join(5)
+    assert gerenciador.estado(timeout=0)["sucesso"]
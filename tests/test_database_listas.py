@@ -0,0 +1,57 @@
+"""
+Listas enviadas como SYS.ODCINUMBERLIST (VARRAY(32767)): acima da capacidade
+do tipo, os comandos são divididos em blocos dentro da mesma transação.
+"""
+
+import pytest
+
+from database import MAXIMO_LISTA_NUMERICA, OracleDatabase
+from tests.dubles import ConexaoAutobegin, LIMITE_ODCINUMBERLIST
+
+
+def _banco() -> OracleDatabase:
+    db = OracleDatabase()
+    db.connection = ConexaoAutobegin({
+        "NROLOTE FROM TPRIPROC": lambda parametros: [(idiproc, 77) for idiproc in parametros["idiproc_list"]],
+        "UPDATE AD_PLAN SET NROLOTE": lambda parametros: len(parametros["nuplan_list"]),
+        "MERGE INTO AD_PLAN": lambda parametros: len(parametros["nuplan_list"]),
+    })
+    return db
+
+
+def _comandos(db: OracleDatabase, trecho: str) -> int:
+    return sum(trecho in sql for sql in db.connection.confirmados)
+
+
+def test_limite_igual_ao_do_tipo():
+    assert MAXIMO_LISTA_NUMERICA == LIMITE_ODCINUMBERLIST
+
+
+def test_lista_acima_da_capacidade_e_recusada():
+    db = _banco()
+    with pytest.raises(ValueError):
+        db._lista_numerica(list(range(MAXIMO_LISTA_NUMERICA + 1)))
+    assert len(db._lista_numerica(list(range(MAXIMO_LISTA_NUMERICA)))) == MAXIMO_LISTA_NUMERICA
+
+
+def test_atualizar_lote_divide_em_blocos():
+    db = _banco()
+    nuplans = list(range(MAXIMO_LISTA_NUMERICA * 2 + 10))
+    assert db.atualizar_lote_em_ad_plan(77, nuplans)
+    assert _comandos(db, "UPDATE AD_PLAN SET NROLOTE") == 3
+
+
+def test_copiar_nrolote_soma_os_blocos():
+    db = _banco()
+    nuplans = list(range(MAXIMO_LISTA_NUMERICA + 1))
+    assert db.copiar_nrolote_de_tpriproc(nuplans) == len(nuplans)
+    assert _comandos(db, "MERGE INTO AD_PLAN") == 2
+
+
+def test_busca_do_lote_divide_em_blocos(monkeypatch):
+    # Um único bloco da procedure com mais IDIPROCs do que cabem na coleção.
+    monkeypatch.setattr(OracleDatabase, "_dividir_argumento_procedure", staticmethod(lambda lista, _maximo: [lista]))
+    db = _banco()
+    idiprocs = list(range(MAXIMO_LISTA_NUMERICA + 5))
+    assert db.gerar_lotes_para_ops(idiprocs, 1) == {77: idiprocs}
+    assert _comandos(db, "NROLOTE FROM TPRIPROC") == 2
@@ -0,0 +1,68 @@
+"""
+Transações da OracleDatabase sob o autobegin do SQLAlchemy 2.x: as escritas
+com transação explícita precisam funcionar depois de qualquer leitura na
+mesma conexão.
+"""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import InvalidRequestError
+
+from database import OracleDatabase
+from tests.dubles import ConexaoAutobegin
+
+
+def _lotes(parametros):
+    return [(idiproc, 77) for idiproc in parametros["idiproc_list"]]
+
+
+def _banco(**respostas) -> OracleDatabase:
+    db = OracleDatabase()
+    db.connection = ConexaoAutobegin({
+        "NROLOTE FROM TPRIPROC": _lotes,
+        "UPDATE AD_PLAN SET NROLOTE": lambda parametros: len(parametros["nuplan_list"]),
+        **respostas,
+    })
+    return db
+
+
+def test_dubles_reproduz_o_autobegin_do_sqlalchemy():
+    with create_engine("sqlite://").connect() as conexao:
+        conexao.execute(text("SELECT 1"))
+        with pytest.raises(InvalidRequestError):
+            conexao.begin()
+    dubles = ConexaoAutobegin()
+    dubles.execute(text("SELECT 1"))
+    with pytest.raises(InvalidRequestError):
+        dubles.begin()
+
+
+def test_sondagem_do_vigia_nao_deixa_transacao_aberta():
+    db = _banco(**{"NUPLAN > :nuplan_apos": [(10, 500, 2.0, 1, "2025-07-20", 1)]})
+    registros = db.buscar_planejamentos_novos(0, "2025-07-20", 1, 5)
+    assert [r.NUPLAN for r in registros] == [10]
+    assert not db.connection.in_transaction()
+
+
+def test_lote_apos_sondagem_sem_novidades():
+    db = _banco()
+    assert db.buscar_planejamentos_novos(0, "2025-07-20", 1, 5) == []
+    assert db.gerar_lotes_para_ops([101, 102], 1) == {77: [101, 102]}
+    assert db.atualizar_lote_em_ad_plan(77, [10, 11])
+    assert db.connection.confirmado("STP_GERAR_RODADA_VASAP_EXT")
+    assert db.connection.confirmado("UPDATE AD_PLAN SET NROLOTE")
+
+
+def test_lote_apos_leitura_sem_commit():
+    db = _banco(**{"COUNT(*)": [(1, 3)]})
+    db.connection.execute(text("SELECT RODADA, COUNT(*) FROM AD_PLAN GROUP BY RODADA"))
+    assert db.connection.in_transaction()
+    assert db.gerar_lotes_para_ops([101], 1) == {77: [101]}
+    assert db.connection.confirmado("STP_GERAR_RODADA_VASAP_EXT")
+
+
+def test_falha_na_procedure_desfaz_a_transacao():
+    db = _banco(**{"NROLOTE FROM TPRIPROC": []})
+    assert db.gerar_lotes_para_ops([101], 1) == {}
+    assert not db.connection.confirmado("STP_GERAR_RODADA_VASAP_EXT")
+    assert not db.connection.in_transaction()
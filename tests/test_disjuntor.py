@@ -0,0 +1,136 @@
+"""
+Transições do disjuntor: fechado → aberto após o limite de falhas, meio
+aberto ao fim da espera com uma única sonda, e fechado ou reaberto (com a
+espera dobrada) conforme o resultado da sonda.
+"""
+
+import threading
+import time
+
+from resiliencia import ABERTO, Disjuntor, FECHADO, MEIO_ABERTO
+
+ESPERA = 0.05
+
+
+def _disjuntor() -> Disjuntor:
+    return Disjuntor("teste", limite_falhas=3, espera_segundos=ESPERA, espera_maxima_segundos=ESPERA * 3)
+
+
+def _estado(disjuntor: Disjuntor) -> str:
+    return disjuntor.estado()["estado"]
+
+
+def test_abre_apos_o_limite_de_falhas_consecutivas():
+    disjuntor = _disjuntor()
+    disjuntor.registrar_falha()
+    disjuntor.registrar_falha()
+    disjuntor.registrar_sucesso()
+    disjuntor.registrar_falha()
+    disjuntor.registrar_falha()
+    assert _estado(disjuntor) == FECHADO and disjuntor.permitir()
+
+    disjuntor.registrar_falha()
+    assert _estado(disjuntor) == ABERTO
+    assert not disjuntor.permitir()
+
+
+def test_meio_aberto_libera_uma_unica_sonda():
+    disjuntor = _disjuntor()
+    for _ in range(3):
+        disjuntor.registrar_falha()
+    time.sleep(ESPERA * 1.5)
+
+    assert _estado(disjuntor) == MEIO_ABERTO
+    assert disjuntor.permitir()
+    assert not disjuntor.permitir()
+
+    disjuntor.registrar_sucesso()
+    assert _estado(disjuntor) == FECHADO
+    assert disjuntor.permitir()
+
+
+def test_sonda_com_falha_reabre_com_espera_dobrada():
+    disjuntor = _disjuntor()
+    for _ in range(3):
+        disjuntor.registrar_falha()
+    time.sleep(ESPERA * 1.5)
+    assert disjuntor.permitir()
+
+    disjuntor.registrar_falha()
+    assert _estado(disjuntor) == ABERTO
+    assert ESPERA < disjuntor.segundos_para_sonda() <= ESPERA * 2
+
+
+def test_ouvintes_recebem_cada_transicao():
+    disjuntor = _disjuntor()
+    estados = []
+    disjuntor.adicionar_ouvinte(lambda instantaneo: estados.append(instantaneo["estado"]))
+    for _ in range(3):
+        disjuntor.registrar_falha()
+    time.sleep(ESPERA * 1.5)
+    disjuntor.permitir()
+    disjuntor.registrar_sucesso()
+    assert estados == [ABERTO, MEIO_ABERTO, FECHADO]
+
+
+def test_aguardar_sonda_ate_fechar_e_respeita_cancelamento():
+    disjuntor = _disjuntor()
+    for _ in range(3):
+        disjuntor.registrar_falha()
+    sondas = []
+
+    def sonda():
+        # A primeira sonda falha (reabre); a segunda fecha o disjuntor.
+        sondas.append(disjuntor.permitir())
+        sucesso = len(sondas) > 1
+        disjuntor.registrar_sucesso() if sucesso else disjuntor.registrar_falha()
+        return sucesso
+
+    assert disjuntor.aguardar(sonda)
+    assert sondas == [True, True]
+    assert _estado(disjuntor) == FECHADO
+
+    for _ in range(3):
+        disjuntor.registrar_falha()
+    cancelado = threading.Event()
+    cancelado.set()
+    assert not disjuntor.aguardar(sonda, cancelado=cancelado)
+
+
+def test_falhas_atrasadas_apos_a_abertura_nao_dobram_a_espera():
+    disjuntor = _disjuntor()
+    for _ in range(3):
+        disjuntor.registrar_falha()
+    # Chamadas que já estavam em voo (8 workers) falham depois da abertura.
+    workers = [threading.Thread(target=disjuntor.registrar_falha) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert _estado(disjuntor) == ABERTO
+    assert disjuntor.estado()["falhas_consecutivas"] == 11
+    assert disjuntor.segundos_para_sonda() <= ESPERA
+    time.sleep(ESPERA * 1.5)
+    assert _estado(disjuntor) == MEIO_ABERTO
+
+
+def test_aguardar_nao_sonda_enquanto_outra_sonda_esta_em_andamento():
+    disjuntor = _disjuntor()
+    for _ in range(3):
+        disjuntor.registrar_falha()
+    time.sleep(ESPERA * 1.5)
+    # Outra thread (um worker) levou a vaga da sonda.
+    assert disjuntor.permitir()
+    sondas = []
+    resultado = []
+    espera = threading.Thread(target=lambda: resultado.append(disjuntor.aguardar(lambda: sondas.append(1) or False)),
+                              daemon=True)
+    espera.start()
+    time.sleep(ESPERA * 2)
+    assert sondas == [] and espera.is_alive()
+
+    disjuntor.registrar_sucesso()
+    espera.join(timeout=1)
+    assert resultado == [True]
+    assert sondas == []
@@ -0,0 +1,81 @@
+"""
+Gravação e reprodução do tráfego da API: várias sessões gravando no mesmo
+arquivo .gz produzem uma gravação legível, com origem de tempo comum, que a
+sessão de reprodução devolve na ordem gravada.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+import gravacao_api
+from gravacao_api import fechar_gravacoes, ler_gravacao, MASCARA, SessaoGravadora, SessaoReproducao
+
+
+class SessaoEco:
+    """Sessão HTTP falsa: responde com o serviço e a ordem da chamada."""
+
+    def __init__(self):
+        self.chamadas = 0
+
+    def post(self, url, timeout=None, params=None, **kwargs):
+        self.chamadas += 1
+        resposta = requests.Response()
+        resposta.status_code = 200
+        resposta.headers["Content-Type"] = "application/json"
+        corpo = {"status": "1", "servico": (params or {}).get("serviceName"), "n": self.chamadas,
+                 "responseBody": {"bearerToken": "segredo"}}
+        resposta._content = json.dumps(corpo).encode()
+        return resposta
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    yield str(tmp_path / "gravacao.jsonl.gz")
+    fechar_gravacoes()
+
+
+def test_sessoes_compartilham_o_gravador(arquivo):
+    primeira = SessaoGravadora(SessaoEco(), arquivo)
+    time.sleep(0.05)
+    segunda = SessaoGravadora(SessaoEco(), arquivo)
+
+    primeira.post("http://erp", params={"serviceName": "A"})
+    segunda.post("http://erp", params={"serviceName": "B"})
+    fechar_gravacoes()
+
+    registros = ler_gravacao(arquivo)
+    assert [r["servico"] for r in registros] == ["A", "B"]
+    # Mesma origem de tempo: a troca posterior não pode parecer anterior.
+    assert registros[1]["inicio_s"] >= registros[0]["inicio_s"]
+    assert len(gravacao_api._gravadores) == 0
+
+
+def test_gravacao_concorrente_em_gz_e_reproducao(arquivo):
+    sessoes = [SessaoGravadora(SessaoEco(), arquivo) for _ in range(4)]
+
+    def chamar(sessao, indice):
+        for _ in range(50):
+            sessao.post("http://erp", params={"serviceName": f"S{indice}"}, json={"password": "x"})
+
+    threads = [threading.Thread(target=chamar, args=(s, i)) for i, s in enumerate(sessoes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    fechar_gravacoes()
+
+    registros = ler_gravacao(arquivo)
+    assert len(registros) == 200
+    assert all(r["corpo"] == {"password": MASCARA} for r in registros)
+    assert all(r["resposta"]["responseBody"]["bearerToken"] == MASCARA for r in registros)
+
+    reproducao = SessaoReproducao(arquivo, velocidade=0)
+    gravados = [r["resposta"]["n"] for r in registros if r["servico"] == "S2"]
+    reproduzidos = [reproducao.post("http://erp", params={"serviceName": "S2"}).json()["n"] for _ in range(50)]
+    assert reproduzidos == gravados
+    with pytest.raises(requests.ConnectionError):
+        reproducao.post("http://erp", params={"serviceName": "inexistente"})
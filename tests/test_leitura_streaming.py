@@ -0,0 +1,67 @@
+"""
+Leitura em streaming dos planejamentos: o cursor usa uma conexão própria do
+pool (as gravações dos workers fazem commit na conexão principal) e uma falha
+no meio da leitura encerra a execução com erro, depois de gerar o lote das
+OPs já criadas.
+"""
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import motor as modulo_motor
+from database import OracleDatabase
+from modelos import Planejamento
+from motor import MotorAutomacao
+from resiliencia import disjuntor_api
+from tests.dubles import ApiRoteiro, BancoFalso, ConexaoAutobegin, EngineDupla
+
+LINHAS = [(nuplan, 500, 1.0, 1, "2025-07-20") for nuplan in range(1, 6)]
+ORA_01555 = OperationalError("SELECT", {}, Exception("ORA-01555: snapshot too old"))
+
+
+def _banco(linhas) -> OracleDatabase:
+    db = OracleDatabase()
+    db.connection = ConexaoAutobegin()
+    db.engine = EngineDupla({"FROM AD_PLAN": linhas})
+    return db
+
+
+def test_cursor_usa_conexao_propria():
+    db = _banco(LINHAS)
+    lotes = list(db.iterar_planejamentos("2025-07-20", 1, 1, 1, tamanho_lote=2))
+
+    assert [len(lote) for lote in lotes] == [2, 2, 1]
+    assert db.connection.executados == []
+    assert len(db.engine.conexoes) == 1 and db.engine.conexoes[0].fechada
+
+
+def test_falha_no_meio_da_leitura_e_propagada():
+    db = _banco(LINHAS[:2] + [ORA_01555] + LINHAS[2:])
+    iterador = db.iterar_planejamentos("2025-07-20", 1, 1, 1, tamanho_lote=2)
+
+    assert len(next(iterador)) == 2
+    with pytest.raises(OperationalError):
+        next(iterador)
+    assert db.engine.conexoes[0].fechada
+
+
+class BancoLeituraInterrompida(BancoFalso):
+    def iterar_planejamentos(self, *args, **kwargs):
+        yield self.planejamentos[:2]
+        raise ORA_01555
+
+
+def test_execucao_termina_com_erro_e_gera_o_lote_das_ops_criadas(monkeypatch):
+    monkeypatch.setitem(modulo_motor.APP_CONFIG, "retentativas_maximas", 0)
+    disjuntor_api.registrar_sucesso()
+    registrados = []
+    monkeypatch.setattr(modulo_motor.historico_execucoes, "registrar", registrados.append)
+    db = BancoLeituraInterrompida([Planejamento(n, 500, 1.0, 1, "2025-07-20") for n in range(1, 6)])
+    motor = MotorAutomacao(db, ApiRoteiro(), concorrencia=1)
+
+    with pytest.raises(OperationalError):
+        motor.executar_periodo("2025-07-20", "2025-07-20", 1, 1, 1)
+
+    assert list(db.lotes.values()) == [[1, 2]]
+    assert registrados[0]["status"] == "erro"
+    assert registrados[0]["processados"] == 2
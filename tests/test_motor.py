@@ -0,0 +1,97 @@
+"""
+Motor compartilhado pela CLI e pela web: cada (data, rodada) fecha com o
+lote das OPs criadas gravado em AD_PLAN, com qualquer concorrência, e o
+sink recebe o progresso da execução.
+"""
+
+import pytest
+
+import motor as modulo_motor
+from modelos import Planejamento
+from motor import MotorAutomacao, SinkProgresso
+from resiliencia import disjuntor_api, PERMANENTE
+from tests.dubles import ApiRoteiro, BancoFalso
+
+
+class SinkRegistro(SinkProgresso):
+    def __init__(self):
+        self.logs = []
+        self.progressos = []
+        self.concluido = False
+
+    def log(self, mensagem, tipo="info"):
+        self.logs.append((tipo, mensagem))
+
+    def progresso(self, processados, total):
+        self.progressos.append((processados, total))
+
+    def concluir(self):
+        self.concluido = True
+
+
+@pytest.fixture(autouse=True)
+def disjuntor_fechado(monkeypatch):
+    monkeypatch.setitem(modulo_motor.APP_CONFIG, "retentativas_maximas", 0)
+    disjuntor_api.registrar_sucesso()
+
+
+def _planejamentos():
+    return [Planejamento(nuplan, 500, 1.0, rodada, data)
+            for nuplan, (data, rodada) in enumerate(
+                [("2025-07-20", 1)] * 4 + [("2025-07-20", 2)] * 3 + [("2025-07-21", 1)] * 5, start=1)]
+
+
+@pytest.mark.parametrize("concorrencia", [1, 4])
+def test_cada_rodada_fecha_com_o_lote_gravado(concorrencia):
+    db, sink = BancoFalso(_planejamentos()), SinkRegistro()
+    motor = MotorAutomacao(db, ApiRoteiro(), sink, concorrencia=concorrencia)
+
+    assert motor.executar_periodo("2025-07-20", "2025-07-21", 1, 1, 2)
+
+    assert motor.total_ops_criadas == 12
+    assert sorted(len(nuplans) for nuplans in db.lotes.values()) == [3, 4, 5]
+    assert sorted(n for nuplans in db.lotes.values() for n in nuplans) == list(range(1, 13))
+    assert {data: resumo["ops_criadas"] for data, resumo in motor.por_data.items()} == {"2025-07-20": 7, "2025-07-21": 5}
+    assert sink.progressos[-1] == (12, 12)
+    assert sink.concluido
+
+
+def test_falha_fica_fora_do_lote():
+    db = BancoFalso(_planejamentos()[:4])
+    motor = MotorAutomacao(db, ApiRoteiro([None, PERMANENTE]), concorrencia=1)
+
+    assert motor.executar_periodo("2025-07-20", "2025-07-20", 1, 1, 1)
+
+    assert list(db.lotes.values()) == [[1, 3, 4]]
+    assert motor.total_falhas == 1
+    assert motor.detalhes_falhas[0]["nuplan"] == 2
+    assert sum(motor.falhas_por_categoria.values()) == 1
+
+
+def test_cancelamento_gera_o_lote_das_ops_criadas():
+    db, sink = BancoFalso(_planejamentos()), SinkRegistro()
+    motor = MotorAutomacao(db, ApiRoteiro(), sink, concorrencia=1)
+
+    def cancelar_na_segunda_op(processados, total):
+        if processados == 2:
+            motor.controle.cancelar()
+
+    sink.progresso = cancelar_na_segunda_op
+
+    assert not motor.executar_periodo("2025-07-20", "2025-07-21", 1, 1, 2)
+
+    assert motor.cancelado
+    assert list(db.lotes.values()) == [[1, 2]]
+
+
+def test_falha_na_autenticacao_aborta_sem_criar_ops():
+    api = ApiRoteiro(autenticacao_ok=False)
+    api.token = False
+    db = BancoFalso(_planejamentos())
+    motor = MotorAutomacao(db, api)
+
+    assert not motor.executar_periodo("2025-07-20", "2025-07-21", 1, 1, 2)
+
+    assert api.chamadas == 0
+    assert not db.lotes
+    assert motor.por_data["2025-07-20"]["abortada"]
@@ -0,0 +1,49 @@
+"""
+Rotas de administração do perfilador: exigem o token e validam o corpo antes
+de ligar o amostrador.
+"""
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_socketio")
+
+import main
+from perfilador import perfilador
+
+TOKEN = "segredo"
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    monkeypatch.setitem(main.APP_CONFIG, "perfilador_token", TOKEN)
+    yield main.app.test_client()
+    perfilador.parar()
+
+
+def _iniciar(cliente, corpo, token=TOKEN):
+    return cliente.post("/api/admin/perfil/iniciar", json=corpo, headers={"X-Admin-Token": token})
+
+
+def test_rotas_sem_token_configurado_nao_existem(monkeypatch):
+    monkeypatch.setitem(main.APP_CONFIG, "perfilador_token", "")
+    assert _iniciar(main.app.test_client(), {}).status_code == 404
+
+
+def test_token_errado_e_recusado(cliente):
+    assert _iniciar(cliente, {}, token="outro").status_code == 401
+    assert not perfilador.ativo
+
+
+@pytest.mark.parametrize("threads", ["automacao", 5, [1, 2], ["op", None], [""], {"op": 1}])
+def test_threads_invalidas_retornam_400(cliente, threads):
+    resposta = _iniciar(cliente, {"threads": threads})
+    assert resposta.status_code == 400
+    assert not perfilador.ativo
+
+
+def test_threads_validas_iniciam_o_amostrador(cliente):
+    resposta = _iniciar(cliente, {"threads": ["automacao", "op"], "intervalo_ms": 5})
+    assert resposta.status_code == 200
+    assert resposta.get_json()["threads"] == ["automacao", "op"]
+    assert _iniciar(cliente, {}).status_code == 409
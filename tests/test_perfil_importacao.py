@@ -0,0 +1,21 @@
+"""
+Orçamento de partida a frio da CLI: o script de verificação roda em um
+interpretador novo com `-X importtime` e precisa terminar com sucesso.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(RAIZ, "sankhya_automation", "perfil_importacao.py")
+
+
+def test_cli_dentro_do_orcamento_e_sem_dependencias_pesadas():
+    resultado = subprocess.run([sys.executable, SCRIPT, "--somente-cli"], cwd=RAIZ,
+                               capture_output=True, text=True, timeout=60)
+    assert resultado.returncode == 0, resultado.stdout + resultado.stderr
@@ -0,0 +1,58 @@
+"""
+Estimativa do dry-run: etapas por execução e concorrência efetiva.
+"""
+
+import pytest
+
+import planejador
+from planejador import concorrencia_efetiva, HistoricoLatencias, montar_plano
+
+
+@pytest.fixture(autouse=True)
+def historico_vazio(monkeypatch, tmp_path):
+    # Sem histórico, cada etapa custa a latência padrão.
+    monkeypatch.setattr(planejador, "historico", HistoricoLatencias(str(tmp_path / "latencias.json")))
+    monkeypatch.setitem(planejador.APP_CONFIG, "max_workers", 1)
+    monkeypatch.setitem(planejador.APP_CONFIG, "ops_por_minuto", 0.0)
+
+
+def test_execucao_conta_login_contagem_e_busca_uma_vez():
+    plano = montar_plano({}, 1, 1)
+    assert plano["total_chamadas_api"] == 1
+    assert plano["total_chamadas_db"] == 2
+    assert plano["tempo_estimado_s"] == pytest.approx(planejador.LATENCIA_PADRAO_API + 2 * planejador.LATENCIA_PADRAO_SQL, abs=0.1)
+
+
+def test_busca_em_streaming_nao_e_cobrada_por_rodada():
+    pendentes = {"2025-07-20": {1: 2, 2: 2}, "2025-07-21": {1: 2}}
+    plano = planejador.montar_plano_periodo(pendentes, 1, 2)
+    por_lote = len(planejador.ETAPAS_SQL_POR_LOTE)
+
+    # Por grupo: o IDIPROC de cada OP e o lote; a busca e a contagem uma vez.
+    assert [r["chamadas_db"] for r in plano["rodadas"] if r["registros"]] == [2 + por_lote] * 3
+    assert plano["total_chamadas_db"] == 2 + 3 * (2 + por_lote)
+
+
+def test_concorrencia_limitada_pelo_pool_de_sessoes():
+    assert concorrencia_efetiva() == 1
+    assert concorrencia_efetiva(8) == 8
+    assert concorrencia_efetiva(8, capacidade_sessoes=3) == 3
+    assert concorrencia_efetiva(2, capacidade_sessoes=3) == 2
+
+
+def test_tempo_dividido_pela_concorrencia_efetiva():
+    serial = montar_plano({1: 40}, 1, 1)["rodadas"][0]["tempo_estimado_s"]
+    paralelo = montar_plano({1: 40}, 1, 1, concorrencia=8)["rodadas"][0]["tempo_estimado_s"]
+    pool = montar_plano({1: 40}, 1, 1, concorrencia=8, capacidade_sessoes=4)
+
+    custo_registro = 4 * planejador.LATENCIA_PADRAO_API + planejador.LATENCIA_PADRAO_SQL
+    assert serial - paralelo == pytest.approx((40 - 5) * custo_registro, abs=0.2)
+    assert pool["concorrencia"] == 4
+    assert pool["rodadas"][0]["tempo_estimado_s"] == pytest.approx(paralelo + 5 * custo_registro, abs=0.2)
+
+
+def test_taxa_maxima_limita_o_tempo():
+    plano = montar_plano({1: 40}, 1, 1, concorrencia=8, ops_por_minuto=60)
+    # 40 OPs a 1 por segundo levam ao menos 40 s, mais busca e lote.
+    assert plano["rodadas"][0]["tempo_estimado_s"] >= 40
+    assert plano["ops_por_minuto"] == 60
@@ -0,0 +1,100 @@
+"""
+Reconciliação AD_PLAN × TPRIPROC com a OracleDatabase real sobre uma conexão
+com autobegin: classificação das divergências, correções em massa depois das
+leituras e falhas de escrita relatadas como falha.
+"""
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import reconciliacao
+from database import OracleDatabase
+from tests.dubles import ConexaoAutobegin
+
+ORFAS = [
+    (5001, 500, 1.0, 11, 1),        # pareada ao NUPLAN 11: idiproc_nao_gravado
+    (5002, 600, 2.0, None, None),   # sem par único: op_sem_planejamento
+]
+DIVERGENCIAS_LOTE = [
+    (20, 1, 3001, None, 55, 1),     # nrolote_nao_gravado
+    (21, 1, 3002, 54, 55, 1),       # nrolote_divergente
+    (22, 2, 3003, None, None, 1),   # sem_lote
+    (23, 2, 3004, 56, None, 1),     # lote_sem_op
+    (24, 2, 3005, None, None, 0),   # op_inexistente
+]
+
+
+def _banco(**respostas) -> OracleDatabase:
+    db = OracleDatabase()
+    db.connection = ConexaoAutobegin({
+        "FROM ORFAS O": ORFAS,
+        "LEFT JOIN TPRIPROC P ON P.IDIPROC = A.IDIPROC": DIVERGENCIAS_LOTE,
+        "UPDATE AD_PLAN SET IDIPROC": lambda parametros: len(parametros),
+        "MERGE INTO AD_PLAN": lambda parametros: len(parametros["nuplan_list"]),
+        "NROLOTE FROM TPRIPROC": lambda parametros: [(i, 88) for i in parametros["idiproc_list"]],
+        "UPDATE AD_PLAN SET NROLOTE": lambda parametros: len(parametros["nuplan_list"]),
+        **respostas,
+    })
+    return db
+
+
+def test_relatorio_classifica_sem_gravar():
+    db = _banco()
+    relatorio = reconciliacao.reconciliar(db, "2025-07-20", 1, corrigir=False)
+
+    assert relatorio["sucesso"]
+    assert relatorio["totais"] == {categoria: 1 for categoria in reconciliacao.CATEGORIAS}
+    assert relatorio["divergencias"][reconciliacao.IDIPROC_NAO_GRAVADO][0]["nuplan"] == 11
+    assert relatorio["total_corrigido"] == 0
+    assert relatorio["pendentes"] == len(reconciliacao.CATEGORIAS)
+    assert not any(sql.startswith(("UPDATE", "MERGE", "BEGIN")) for sql in db.connection.executados)
+
+
+def test_pares_heuristicos_sao_apenas_relatados_por_padrao():
+    db = _banco()
+    relatorio = reconciliacao.reconciliar(db, "2025-07-20", 1)
+
+    assert relatorio["sucesso"], relatorio.get("erro")
+    assert not relatorio["vincular_orfas"]
+    assert relatorio["pareamento_orfas"] == reconciliacao.PAREAMENTO_ORFAS
+    assert reconciliacao.IDIPROC_NAO_GRAVADO not in relatorio["corrigidos"]
+    assert relatorio["pendentes"] == len(reconciliacao.CATEGORIAS) - len(reconciliacao.REPARAVEIS) + 1
+    assert not any("SET IDIPROC" in sql for sql in db.connection.executados)
+    assert db.connection.confirmado("MERGE INTO AD_PLAN")
+
+
+def test_corrige_as_reparaveis_depois_das_leituras():
+    db = _banco()
+    relatorio = reconciliacao.reconciliar(db, "2025-07-20", 1, vincular_orfas=True)
+
+    assert relatorio["sucesso"], relatorio.get("erro")
+    assert relatorio["corrigidos"] == {categoria: 1 for categoria in reconciliacao.CATEGORIAS
+                                       if categoria in reconciliacao.REPARAVEIS}
+    assert relatorio["pendentes"] == len(reconciliacao.CATEGORIAS) - len(reconciliacao.REPARAVEIS)
+    for comando in ("UPDATE AD_PLAN SET IDIPROC", "MERGE INTO AD_PLAN",
+                    "STP_GERAR_RODADA_VASAP_EXT", "UPDATE AD_PLAN SET NROLOTE"):
+        assert db.connection.confirmado(comando), comando
+
+
+def test_falha_de_escrita_nao_conta_como_zero_corrigidos():
+    def merge_com_deadlock(_parametros):
+        raise SQLAlchemyError("ORA-00060: deadlock detected while waiting for resource")
+
+    db = _banco(**{"MERGE INTO AD_PLAN": merge_com_deadlock})
+    relatorio = reconciliacao.reconciliar(db, "2025-07-20", 1, vincular_orfas=True)
+
+    assert not relatorio["sucesso"]
+    assert "NROLOTE" in relatorio["erro"]
+    # As demais correções independentes continuam sendo aplicadas e relatadas.
+    assert relatorio["corrigidos"][reconciliacao.IDIPROC_NAO_GRAVADO] == 1
+    assert relatorio["corrigidos"][reconciliacao.SEM_LOTE] == 1
+    assert relatorio["corrigidos"][reconciliacao.NROLOTE_DIVERGENTE] == 0
+    assert not db.connection.confirmado("MERGE INTO AD_PLAN")
+
+
+def test_falha_ao_gerar_lote_pendente_e_relatada():
+    db = _banco(**{"NROLOTE FROM TPRIPROC": []})
+    relatorio = reconciliacao.reconciliar(db, "2025-07-20", 1)
+
+    assert not relatorio["sucesso"]
+    assert "rodada 2" in relatorio["erro"]
+    assert relatorio["corrigidos"][reconciliacao.SEM_LOTE] == 0
@@ -0,0 +1,108 @@
+"""
+Fila de retentativas do motor: só falhas transitórias da API voltam, o token
+é renovado antes do reenvio e uma falha no login não gasta as tentativas.
+Na SankhyaAPI, a sessão expirada invalida o token local.
+"""
+
+import json
+
+import pytest
+import requests
+
+import motor as modulo_motor
+from modelos import Planejamento
+from motor import MotorAutomacao
+from resiliencia import coletar_falhas, disjuntor_api, PERMANENTE, TRANSITORIA
+from sankhya_api import SankhyaAPI
+from tests.dubles import ApiRoteiro, BancoFalso, SESSAO_EXPIRADA
+
+
+@pytest.fixture(autouse=True)
+def retentativas_rapidas(monkeypatch):
+    monkeypatch.setitem(modulo_motor.APP_CONFIG, "retentativas_maximas", 2)
+    monkeypatch.setitem(modulo_motor.APP_CONFIG, "retentativa_espera_base", 0.001)
+    monkeypatch.setitem(modulo_motor.APP_CONFIG, "retentativa_espera_maxima", 0.001)
+    disjuntor_api.registrar_sucesso()
+
+
+def _processar(api: ApiRoteiro, db: BancoFalso = None) -> MotorAutomacao:
+    motor = MotorAutomacao(db or BancoFalso(), api, concorrencia=1)
+    idiprocs, nuplan_por_idiproc = [], {}
+    registros = [Planejamento(10, 500, 1.0, 1, "2025-07-20", 1)]
+    assert motor.processar_registros(registros, lambda _resultado: (idiprocs, nuplan_por_idiproc))
+    return motor
+
+
+def test_sessao_expirada_renova_o_token_antes_de_reenviar():
+    api = ApiRoteiro([SESSAO_EXPIRADA])
+    motor = _processar(api)
+
+    assert api.autenticacoes == 1
+    assert api.chamadas == 2
+    assert motor.total_ops_criadas == 1
+    assert motor.ops_criadas_sucesso[0]["tentativas"] == 2
+    assert motor.retentativas == {"agendadas": 1, "recuperadas": 1, "sem_sucesso": 0}
+
+
+def test_falha_no_login_encerra_a_fila_sem_gastar_tentativas():
+    api = ApiRoteiro([SESSAO_EXPIRADA], autenticacao_ok=False)
+    motor = _processar(api)
+
+    assert api.chamadas == 1
+    assert motor.total_falhas == 1
+    assert motor.detalhes_falhas[0]["transitoria"]
+    assert motor.retentativas == {"agendadas": 1, "recuperadas": 0, "sem_sucesso": 1}
+
+
+def test_transitoria_esgota_as_tentativas():
+    api = ApiRoteiro([TRANSITORIA] * 5)
+    motor = _processar(api)
+
+    assert api.chamadas == 3
+    assert motor.detalhes_falhas[0]["tentativas"] == 3
+    assert motor.retentativas == {"agendadas": 2, "recuperadas": 0, "sem_sucesso": 1}
+
+
+def test_permanente_nao_e_reenviada():
+    api = ApiRoteiro([PERMANENTE])
+    motor = _processar(api)
+
+    assert api.chamadas == 1
+    assert motor.retentativas["agendadas"] == 0
+
+
+def test_falha_ao_gravar_idiproc_nao_recria_a_op():
+    api = ApiRoteiro()
+    motor = _processar(api, BancoFalso(grava_idiproc=False))
+
+    assert api.chamadas == 1
+    assert motor.detalhes_falhas[0]["categoria"] == modulo_motor.FALHA_BANCO
+    assert motor.retentativas["agendadas"] == 0
+
+
+class SessaoResposta:
+    def __init__(self, status_http: int, corpo: dict):
+        self.status_http = status_http
+        self.corpo = corpo
+
+    def post(self, url, timeout=None, **kwargs):
+        resposta = requests.Response()
+        resposta.status_code = self.status_http
+        resposta._content = json.dumps(self.corpo).encode()
+        return resposta
+
+
+@pytest.mark.parametrize("status_http, corpo", [
+    (200, {"status": "3", "statusMessage": "Sessão expirada"}),
+    (401, {"statusMessage": "Não autorizado"}),
+])
+def test_sessao_recusada_invalida_o_token(status_http, corpo):
+    api = SankhyaAPI({"nome": "teste", "client_token": "x", "mge_session": "y"})
+    api.bearer_token, api.token_obtido_em = "token", modulo_motor.time.monotonic()
+    api.session = SessaoResposta(status_http, corpo)
+
+    with coletar_falhas() as falhas:
+        api._executar_chamada_api("LancamentoOrdemProducaoSP.getNovoLancamentoOP", {})
+
+    assert falhas == [TRANSITORIA]
+    assert not api.token_valido()
@@ -0,0 +1,47 @@
+"""
+Telemetria ao vivo: a vazão conta apenas OPs criadas e o ETA considera os
+planejamentos ainda sem resultado final.
+"""
+
+import time
+
+import pytest
+
+from telemetria import TelemetriaExecucao
+
+
+def _publicar_apos(telemetria: TelemetriaExecucao, segundos: float):
+    publicados = []
+    telemetria._ler_latencias()
+    telemetria._publicar(publicados.append, time.monotonic() - segundos, 0)
+    return publicados[-1]
+
+
+def test_vazao_conta_apenas_ops_criadas_e_eta_usa_pendentes():
+    telemetria = TelemetriaExecucao()
+    telemetria.definir_total(10)
+    # 4 OPs criadas e 2 falhas finais; 3 tentativas que voltaram para a fila.
+    for criada in (True, True, False, True, False, True):
+        telemetria.op_iniciada()
+        telemetria.op_concluida()
+        telemetria.registro_finalizado(criada)
+    for _ in range(3):
+        telemetria.op_iniciada()
+        telemetria.op_concluida()
+
+    dados = _publicar_apos(telemetria, 60)
+
+    assert dados["ops_por_minuto"] == pytest.approx(4, rel=0.01)
+    assert (dados["processados"], dados["ops_criadas"], dados["total"]) == (6, 4, 10)
+    assert dados["eta_s"] == pytest.approx(60, abs=1)
+
+
+def test_sem_ops_criadas_eta_desconhecido():
+    telemetria = TelemetriaExecucao()
+    telemetria.definir_total(5)
+    telemetria.registro_finalizado(False)
+
+    dados = _publicar_apos(telemetria, 60)
+
+    assert dados["ops_por_minuto"] == 0
+    assert dados["eta_s"] is None
@@ -0,0 +1,123 @@
+"""
+Modo vigia: abertura e fechamento das rodadas e geração do lote depois do
+silêncio, inclusive com a OracleDatabase real sobre uma conexão com autobegin.
+"""
+
+from typing import List
+
+from database import OracleDatabase
+from modelos import Planejamento
+from motor import MotorAutomacao
+from tests.dubles import ConexaoAutobegin
+from vigia import VigiaPlanejamentos
+
+
+class ApiFalsa:
+    nome = "falsa"
+
+    def __init__(self):
+        self.proximo = 1000
+
+    def token_valido(self):
+        return True
+
+    def autenticar(self):
+        return True
+
+    def sondar(self):
+        return True
+
+    def criar_ordem_producao(self, dados):
+        self.proximo += 1
+        return True, self.proximo, "ok"
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _registro(nuplan: int, rodada: int, braco: int = 1, data: str = "2025-07-20") -> Planejamento:
+    return Planejamento(nuplan, 500, 1.0, rodada, data, braco)
+
+
+def _banco_com_autobegin(paginas: List[List[tuple]]) -> OracleDatabase:
+    """
+    OracleDatabase real sobre o dublê: cada sondagem devolve a próxima página.
+    """
+    def sondagem(_parametros):
+        return paginas.pop(0) if paginas else []
+
+    db = OracleDatabase()
+    db.connection = ConexaoAutobegin({
+        "NUPLAN > :nuplan_apos": sondagem,
+        "UPDATE AD_PLAN SET IDIPROC": 1,
+        "NROLOTE FROM TPRIPROC": lambda parametros: [(i, 900) for i in parametros["idiproc_list"]],
+        "UPDATE AD_PLAN SET NROLOTE": lambda parametros: len(parametros["nuplan_list"]),
+    })
+    return db
+
+
+def _vigia(db, relogio: Relogio) -> VigiaPlanejamentos:
+    motor = MotorAutomacao(db, ApiFalsa(), concorrencia=1, origem="vigia")
+    vigia = VigiaPlanejamentos(motor, "2025-07-20", relogio=relogio)
+    vigia.fechamento_rodada = 120
+    return vigia
+
+
+def test_rodada_fica_aberta_ate_o_silencio():
+    db = _banco_com_autobegin([])
+    relogio = Relogio()
+    vigia = _vigia(db, relogio)
+
+    assert vigia._processar([_registro(1, 1), _registro(2, 1), _registro(3, 2)])
+    assert set(vigia.abertas) == {("2025-07-20", 1, 1), ("2025-07-20", 1, 2)}
+
+    relogio.agora = 100
+    assert vigia._processar([_registro(4, 2)])
+    relogio.agora = 150
+    vigia._fechar_rodadas_silenciosas()
+    # A rodada 1 está em silêncio há 150 s; a rodada 2 recebeu um registro há 50 s.
+    assert set(vigia.abertas) == {("2025-07-20", 1, 2)}
+    assert vigia.rodadas_fechadas == 1
+
+    relogio.agora = 220
+    vigia._fechar_rodadas_silenciosas()
+    assert not vigia.abertas
+    assert vigia.rodadas_fechadas == 2
+
+
+def test_rodada_fechada_gera_lote_depois_de_sondagem_vazia():
+    db = _banco_com_autobegin([])
+    relogio = Relogio()
+    vigia = _vigia(db, relogio)
+    assert vigia._processar([_registro(1, 1), _registro(2, 1)])
+
+    # Silêncio: a sondagem não encontra nada e deixaria a transação da leitura aberta.
+    assert vigia._buscar(vigia.marca) == []
+    relogio.agora = 200
+    vigia._fechar_rodadas_silenciosas()
+
+    assert db.connection.confirmado("STP_GERAR_RODADA_VASAP_EXT")
+    assert db.connection.confirmado("UPDATE AD_PLAN SET NROLOTE")
+    assert vigia.rodadas_fechadas == 1
+
+
+def test_executar_fecha_as_rodadas_ao_ficar_ocioso():
+    paginas = [[(1, 500, 1.0, 1, "2025-07-20", 1), (2, 500, 1.0, 2, "2025-07-20", 1)]]
+    db = _banco_com_autobegin(paginas)
+    vigia = _vigia(db, Relogio())
+    vigia.intervalo = vigia.intervalo_maximo = 0.001
+    vigia.ocioso_maximo = 5
+    vigia.fechamento_rodada = 3
+    # O relógio avança um segundo por sondagem: as rodadas fecham pelo silêncio e o vigia encerra ocioso.
+    vigia._relogio = lambda: vigia.sondagens
+
+    assert vigia.executar() == "ociosa"
+    assert vigia.marca == 2
+    assert vigia.rodadas_fechadas == 2
+    assert not vigia.abertas
+    assert sum("STP_GERAR_RODADA_VASAP_EXT" in sql for sql in db.connection.confirmados) == 2